@@ -0,0 +1,116 @@
+"""
+Load test for the Insurellm chat app in rag_from_scratch.py. It launches the app with the given concurrency limit,
+or uses one that is already running, and drives N chat sessions at once through the Gradio client. Each session
+asks its questions in turn as one conversation, starting at a different place in the question set. Reports
+throughput and p50/p95/p99 of the time to first answer token and of the whole turn.
+
+With --offline every model call goes to the local stand-in and the knowledge base is ingested into a scratch
+directory first, so the numbers show how the app schedules concurrent users rather than how fast the models are.
+The semantic answer cache is switched off unless --answer-cache is given, so every turn does the full RAG call.
+
+Run from the scripts folder:
+  python -m benchmarks.chat_load --offline --sessions 16 --concurrency 1
+  python -m benchmarks.chat_load --offline --sessions 16 --concurrency 16
+  python -m benchmarks.chat_load --url http://127.0.0.1:7860 --sessions 16
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from benchmarks.rerankers import QUESTIONS_PATH, load_questions
+from benchmarks.retrieval_eval import Recorder, load_pro
+
+
+def run_session(url, questions):
+    """Ask the questions as one conversation; returns (seconds to first token, seconds for the turn) per turn"""
+    from gradio_client import Client
+
+    client = Client(url, verbose=False)
+    turns = []
+    for question in questions:
+        start = time.perf_counter()
+        first_token = None
+        job = client.submit(question, api_name="/chat")
+        for _, history, _ in job:
+            if first_token is None and history and history[-1]["role"] == "assistant" and history[-1]["content"]:
+                first_token = time.perf_counter() - start
+        job.result()
+        turns.append((first_token, time.perf_counter() - start))
+    return turns
+
+
+def drive(url, questions, sessions, turns):
+    """Run the sessions at once; returns the turn timings, the number of failed sessions and the wall time"""
+    scripts = [[questions[(s * turns + t) % len(questions)]["question"] for t in range(turns)] for s in range(sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [pool.submit(run_session, url, script) for script in scripts]
+    timings = []
+    failures = 0
+    for future in futures:
+        try:
+            timings += future.result()
+        except Exception as e:
+            failures += 1
+            print(f"Session failed: {e}")
+    return timings, failures, time.perf_counter() - start
+
+
+def launch_and_drive(args):
+    from rag_from_scratch import CONCURRENCY_LIMIT, build_ui
+
+    args.concurrency = args.concurrency or CONCURRENCY_LIMIT
+    scratch = Path(tempfile.mkdtemp()) / "pro" if args.offline else None
+    answer = load_pro(Recorder(), scratch)
+    if not args.answer_cache:
+        answer.answer_cache.threshold = float("inf")
+    ui = build_ui(answer.stream_answer, args.concurrency)
+    _, url, _ = ui.launch(prevent_thread_lock=True, quiet=True)
+    try:
+        return drive(url, load_questions(args.questions), args.sessions, args.turns)
+    finally:
+        ui.close()
+
+
+def report(timings, failures, seconds, args):
+    concurrency = "of the running app" if args.url else args.concurrency
+    print(f"\n{args.sessions} sessions x {args.turns} turns at concurrency {concurrency}")
+    print(f"{len(timings)} turns in {seconds:.1f}s: {len(timings) / seconds:.2f} turns/sec, {failures} sessions failed\n")
+    if not timings:
+        return
+    first_tokens = [first for first, _ in timings if first is not None]
+    print(f"{'':<14} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, seconds in [("first token", first_tokens), ("turn", [turn for _, turn in timings])]:
+        if seconds:
+            print(f"{label:<14} " + " ".join(f"{np.percentile(seconds, p):>7.2f}s" for p in (50, 95, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=3, help="questions asked in each session")
+    parser.add_argument("--concurrency", type=int, help="the app's concurrency limit, CONCURRENCY_LIMIT by default")
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    parser.add_argument("--url", help="drive an app that is already running instead of launching one")
+    parser.add_argument("--offline", action="store_true", help="use the local stand-in for every model call")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the semantic answer cache on")
+    args = parser.parse_args()
+
+    if args.url:
+        results = drive(args.url, load_questions(args.questions), args.sessions, args.turns)
+    elif args.offline:
+        from benchmarks.fake_openai import FakeOpenAI
+
+        with FakeOpenAI(latency_ms=20, chat_latency_ms=500, tokens_per_second=100) as fake:
+            os.environ.update(OPENAI_API_KEY="fake", OPENAI_BASE_URL=fake.base_url, OPENAI_API_BASE=fake.base_url)
+            results = launch_and_drive(args)
+    else:
+        results = launch_and_drive(args)
+    report(*results, args)
+
+
+if __name__ == "__main__":
+    main()
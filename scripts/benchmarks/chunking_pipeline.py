@@ -0,0 +1,176 @@
+"""
+Compare the asyncio chunking pipeline against the multiprocessing.Pool it replaced, both talking to a
+local mock LLM server. Each mode runs in a fresh interpreter, reporting wall time and the peak RSS of
+its whole process tree.
+It then runs chunking and embedding together as ingestion does, with and without the early flushes of
+embed_stream, reporting when chunking finished, when the first vectors were stored and how many chunks had
+been embedded by the time chunking finished: the overlap between the two stages.
+
+Run from the scripts folder:  python -m benchmarks.chunking_pipeline
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+import psutil
+from benchmarks.fake_openai import FakeOpenAI
+
+
+def load_documents(count):
+    """The knowledge base documents, repeated with a unique suffix until there are enough"""
+    from pro_implementation import ingest
+
+    documents = ingest.fetch_documents()
+    copies = []
+    for i in range(count):
+        doc = documents[i % len(documents)]
+        copies.append({**doc, "text": f"{doc['text']}\n\nCopy {i}"})
+    return copies
+
+
+def run_pool(documents, workers):
+    from pro_implementation.ingest import process_document
+
+    with Pool(processes=workers) as pool:
+        return sum(len(chunks.chunks) for chunks in pool.imap_unordered(process_document, documents))
+
+
+def configure(ingest, concurrency):
+    ingest.CONCURRENCY = concurrency
+    ingest.REQUESTS_PER_MINUTE = ingest.TOKENS_PER_MINUTE = 10**9
+    ingest.CHUNK_CACHE_PATH = Path(tempfile.mkdtemp()) / "chunk_cache.db"
+
+
+def run_async(documents, concurrency):
+    from pro_implementation import ingest
+
+    configure(ingest, concurrency)
+    return len(ingest.create_chunks(documents))
+
+
+class Timeline:
+    """Stands in for the collection, noting when each batch of vectors is stored"""
+
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, ids, **kwargs):
+        self.upserts.append((time.perf_counter(), len(ids)))
+
+
+def run_stream(documents, concurrency, early_flush):
+    """Chunk and embed the documents as ingestion does; returns when chunking finished and the stored batches"""
+    from pro_implementation import ingest
+
+    configure(ingest, concurrency)
+    if not early_flush:
+        ingest.embed_stream = partial(ingest.embed_stream, flush_inputs=None, idle_ms=None)
+    chunk_documents = ingest.chunk_documents
+    chunked = None
+
+    async def timed(documents, queue):
+        nonlocal chunked
+        await chunk_documents(documents, queue)
+        chunked = time.perf_counter()
+
+    ingest.chunk_documents = timed
+    timeline = Timeline()
+    asyncio.run(ingest.ingest_documents(ingest.iterate(documents), timeline, {"documents": {}}))
+    return chunked, timeline.upserts
+
+
+def measure(mode, count, concurrency):
+    """Runs inside the child interpreter; prints one JSON line with the results"""
+    process = psutil.Process()
+    peak = 0
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.is_set():
+            tree = [process] + process.children(recursive=True)
+            total = 0
+            for p in tree:
+                try:
+                    total += p.memory_info().rss
+                except psutil.NoSuchProcess:
+                    pass
+            peak = max(peak, total)
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    documents = load_documents(count)
+    result = {"mode": mode}
+    if mode == "pool":
+        chunks = run_pool(documents, concurrency)
+    elif mode == "async":
+        chunks = run_async(documents, concurrency)
+    else:
+        chunked, upserts = run_stream(documents, concurrency, early_flush=mode == "stream")
+        chunks = sum(size for _, size in upserts)
+        result.update(
+            chunked=chunked - start,
+            first_vectors=upserts[0][0] - start,
+            overlapped=sum(size for at, size in upserts if at <= chunked) / chunks,
+        )
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    print(json.dumps({**result, "seconds": elapsed, "peak_rss_mb": peak / 2**20, "chunks": chunks}))
+
+
+def run_child(mode, args, concurrency, env):
+    command = [sys.executable, "-m", "benchmarks.chunking_pipeline", "--child", mode,
+               "--documents", str(args.documents), "--concurrency", concurrency]
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=60)
+    parser.add_argument("--concurrency", default="3,8")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--embed-latency-ms", type=float, default=150)
+    parser.add_argument("--child", choices=["pool", "async", "stream", "full-batches"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child, args.documents, int(args.concurrency))
+        return
+
+    with FakeOpenAI(
+        latency_ms=args.embed_latency_ms, chat_latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second
+    ) as fake:
+        env = {**os.environ, "FAKE_OPENAI_URL": fake.base_url}
+        print(f"\n{args.documents} documents, {args.latency_ms}ms latency, {args.tokens_per_second} tokens/sec\n")
+        print("mode  | concurrency | wall time | peak RSS")
+        for concurrency in args.concurrency.split(","):
+            for mode in ["pool", "async"]:
+                result = run_child(mode, args, concurrency, env)
+                print(f"{mode:<5} | {concurrency:>11} | {result['seconds']:>8.2f}s | {result['peak_rss_mb']:>6.0f} MB")
+
+        print(f"\nChunking and embedding together, {args.embed_latency_ms}ms per embeddings request\n")
+        print("mode         | concurrency | wall time | chunked at | first vectors | embedded while chunking")
+        for concurrency in args.concurrency.split(","):
+            for mode in ["full-batches", "stream"]:
+                result = run_child(mode, args, concurrency, env)
+                print(
+                    f"{mode:<12} | {concurrency:>11} | {result['seconds']:>8.2f}s | {result['chunked']:>9.2f}s | "
+                    f"{result['first_vectors']:>12.2f}s | {result['overlapped']:>23.0%}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the streaming document loader against reading every file into one list, the way fetch_documents
+used to, on a synthetic knowledge base made by copying the real one until it has --files files.
+For each mode it reports:
+- files/s and MB/s
+- how long until the first batch is ready, which is when chunking can start
+- the peak memory held by the loaded documents, measured in a second, traced pass
+
+The files are freshly written, so they are read from the page cache rather than from disk.
+
+Run from the scripts folder:  python -m benchmarks.document_loader --files 20000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from doc_loader import MMAP_THRESHOLD, DocumentLoader
+
+KNOWLEDGE_BASE_PATH = Path(__file__).parent.parent / "knowledge-base"
+
+
+def make_corpus(root, count, large):
+    """count copies of the knowledge base files spread over its folders, plus `large` files above MMAP_THRESHOLD"""
+    sources = sorted(KNOWLEDGE_BASE_PATH.rglob("*.md"))
+    for i in range(count):
+        source = sources[i % len(sources)]
+        folder = root / source.parent.name / f"{i // 1000:03d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"{i}-{source.name}").write_text(f"{source.read_text(encoding='utf-8')}\n\nCopy {i}", encoding="utf-8")
+    for i in range(large):
+        text = KNOWLEDGE_BASE_PATH.joinpath("company", "about.md").read_text(encoding="utf-8")
+        (root / "company" / f"large-{i}.md").write_text(text * (MMAP_THRESHOLD // len(text) + 1), encoding="utf-8")
+
+
+def read_all(root):
+    """The previous fetch_documents: one file at a time, into one list, handed over as a single batch"""
+    documents = []
+    for folder in root.iterdir():
+        for file in folder.rglob("*.md"):
+            with open(file, "r", encoding="utf-8") as f:
+                documents.append({"type": folder.name, "source": file.as_posix(), "text": f.read()})
+    yield documents
+
+
+def stream(root, threads, batch_size):
+    return DocumentLoader(root, threads=threads, batch_size=batch_size).batches()
+
+
+def run(batches):
+    """Consume the batches as a pipeline would, dropping each when done; returns files, bytes, first batch, total"""
+    start = time.perf_counter()
+    first = None
+    files = size = 0
+    for batch in batches:
+        first = first or time.perf_counter() - start
+        files += len(batch)
+        size += sum(len(document["text"]) for document in batch)
+    return files, size, first or 0.0, time.perf_counter() - start
+
+
+def peak_memory(make_batches):
+    tracemalloc.start()
+    run(make_batches())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--large", type=int, default=4, help="extra files large enough to be memory-mapped")
+    parser.add_argument("--threads", default="1,4,8,16")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp())
+    try:
+        make_corpus(root, args.files, args.large)
+        modes = {"one list, sequential": lambda: read_all(root)}
+        for threads in [int(t) for t in args.threads.split(",")]:
+            modes[f"streaming, {threads} threads"] = lambda threads=threads: stream(root, threads, args.batch_size)
+
+        print(f"\n{args.files + args.large:,} files, batches of {args.batch_size}\n")
+        print(f"{'mode':<24} {'files/s':>9} {'MB/s':>7} {'first batch':>12} {'peak memory':>12}")
+        for name, make_batches in modes.items():
+            files, size, first, total = run(make_batches())
+            peak = peak_memory(make_batches)
+            print(
+                f"{name:<24} {files / total:>9,.0f} {size / 2**20 / total:>7.1f} "
+                f"{first * 1000:>9.1f} ms {peak / 2**20:>9.1f} MB"
+            )
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
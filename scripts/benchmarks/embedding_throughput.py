@@ -0,0 +1,63 @@
+"""
+Benchmark the batching embedder against a local fake embeddings endpoint.
+Reports chunks/sec for each combination of batch size and concurrency.
+
+Run from the scripts folder:  python -m benchmarks.embedding_throughput
+"""
+import argparse
+import time
+from pathlib import Path
+from openai import OpenAI
+from chromadb import EphemeralClient
+from benchmarks.fake_openai import FakeOpenAI
+from pro_implementation.embedder import embed_into_collection
+
+KNOWLEDGE_BASE_PATH = Path(__file__).parent.parent / "knowledge-base"
+
+
+def make_texts(count, size=500):
+    """Slice the knowledge base into chunk-sized texts, repeating it until there are enough"""
+    corpus = "\n\n".join(file.read_text(encoding="utf-8") for file in sorted(KNOWLEDGE_BASE_PATH.rglob("*.md")))
+    pieces = [corpus[i : i + size] for i in range(0, len(corpus), size)]
+    return [f"{i}: {pieces[i % len(pieces)]}" for i in range(count)]
+
+
+def run(client, texts, batch_size, concurrency):
+    collection = EphemeralClient().get_or_create_collection(f"bench-{batch_size}-{concurrency}")
+    ids = [str(i) for i in range(len(texts))]
+    metas = [{"source": "benchmark"} for _ in texts]
+    start = time.perf_counter()
+    embed_into_collection(
+        collection, ids, texts, metas, client=client, model="text-embedding-3-large",
+        max_inputs=batch_size, concurrency=concurrency,
+    )
+    elapsed = time.perf_counter() - start
+    assert collection.count() == len(texts)
+    return len(texts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--batch-sizes", default="16,64,256,1024")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    texts = make_texts(args.chunks)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    with FakeOpenAI(dimensions=args.dimensions, latency_ms=args.latency_ms) as fake:
+        client = OpenAI(base_url=fake.base_url, api_key="fake", max_retries=0)
+
+        print(f"\n{len(texts)} chunks, {args.dimensions} dimensions, {args.latency_ms}ms base latency\n")
+        print("batch size | " + " | ".join(f"concurrency {c:>2}" for c in levels))
+        for batch_size in batch_sizes:
+            rates = [run(client, texts, batch_size, concurrency) for concurrency in levels]
+            print(f"{batch_size:>10} | " + " | ".join(f"{rate:>9,.0f} ch/s" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,465 @@
+"""
+A local stand-in for the OpenAI API, so throughput and latency can be measured without live keys or real rate
+limits. It serves embeddings, chat completions (streamed, structured or calling a tool), the responses API
+used by the agents SDK, image generation and text to speech:
+- vectors are deterministic per input text, images are a flat PNG coloured by the prompt, speech is silence as
+  MP3, WAV or PCM (other response formats are answered with a 400)
+- structured outputs and tool arguments are filled in from the JSON schema using words from the prompt, spread
+  over all of it so that, say, chunks of a document quote the document rather than the instructions before it
+- latency is a base cost drawn from a fixed, uniform, lognormal or exponential distribution, plus a cost per token
+- a share of requests can fail with a 500 or a 429, and a requests-per-minute limit answers 429 beyond it
+
+Run it on its own and point the scripts at it with FAKE_OPENAI_URL (see stand_in.py):
+  python -m benchmarks.fake_openai --port 8000 --distribution lognormal --rate-limit-rate 0.02
+  FAKE_OPENAI_URL=http://127.0.0.1:8000/v1 python rag_from_scratch.py
+"""
+import argparse
+import base64
+import hashlib
+import io
+import itertools
+import json
+import random
+import struct
+import threading
+import time
+import wave
+import zlib
+from collections import Counter, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DISTRIBUTIONS = ["fixed", "uniform", "lognormal", "exponential"]
+# Speech runs at about 150 words a minute
+SPEECH_WORDS_PER_SECOND = 2.5
+SPEECH_SAMPLE_RATE = 24000
+# The speech response formats served, and their content types
+SPEECH_FORMATS = {"mp3": "audio/mpeg", "wav": "audio/wav", "pcm": "audio/pcm"}
+# A silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz mono, all-zero side info and main data
+MP3_FRAME = b"\xff\xfb\x90\xc4" + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def text_of(content):
+    """The text of a message's content, which may be None, a string or a list of parts"""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def fake_embedding(text, dimensions):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def fake_instance(schema, defs, words, items=3):
+    """Build a value matching the JSON schema, taking strings from the words in turn"""
+    if "$ref" in schema:
+        return fake_instance(defs[schema["$ref"].split("/")[-1]], defs, words, items)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: fake_instance(prop, defs, words, items) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        if schema.get("items", {}).get("type") == "integer":
+            return list(range(1, items + 1))
+        return [fake_instance(schema.get("items", {}), defs, words, items) for _ in range(items)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 0.5
+    if kind == "boolean":
+        return True
+    return " ".join(next(words) for _ in range(12))
+
+
+def count_strings(schema, defs, items=3):
+    """How many strings fake_instance will fill in for the schema"""
+    if "$ref" in schema:
+        return count_strings(defs[schema["$ref"].split("/")[-1]], defs, items)
+    kind = schema.get("type")
+    if kind == "object":
+        return sum(count_strings(prop, defs, items) for prop in schema.get("properties", {}).values())
+    if kind == "array":
+        return 0 if schema.get("items", {}).get("type") == "integer" else items * count_strings(schema.get("items", {}), defs, items)
+    return 0 if kind in ("integer", "number", "boolean") else 1
+
+
+def spread(text, strings, per_string=12):
+    """
+    Words for fake_instance: each of the `strings` strings gets per_string consecutive words starting at evenly
+    spaced points of the text, and then the text repeats
+    """
+    words = text.split() or ["lorem"]
+    step = max(per_string, len(words) // max(strings, 1))
+    for i in range(strings):
+        for j in range(per_string):
+            yield words[(i * step + j) % len(words)]
+    yield from itertools.cycle(words)
+
+
+def fake_structured(schema, prompt):
+    """A value matching the JSON schema, its strings spread over the prompt"""
+    defs = schema.get("$defs", {})
+    return fake_instance(schema, defs, spread(prompt, count_strings(schema, defs)))
+
+
+def fake_png(prompt, width, height):
+    """A PNG of one flat colour picked from the prompt"""
+    colour = hashlib.sha256(prompt.encode("utf-8")).digest()[:3]
+    pixels = zlib.compress((b"\x00" + colour * width) * height, 1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+
+def fake_speech(text, response_format="mp3"):
+    """Silence as long as the text would take to say, as MP3, or 16-bit mono WAV or raw PCM"""
+    seconds = len(text.split()) / SPEECH_WORDS_PER_SECOND
+    if response_format == "mp3":
+        return MP3_FRAME * max(1, round(seconds / MP3_FRAME_SECONDS))
+    if response_format == "pcm":
+        return b"\x00\x00" * int(seconds * SPEECH_SAMPLE_RATE)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SPEECH_SAMPLE_RATE)
+        f.writeframes(b"\x00\x00" * int(seconds * SPEECH_SAMPLE_RATE))
+    return buffer.getvalue()
+
+
+class FakeOpenAI:
+    """
+    Serve the OpenAI endpoints above on localhost in a background thread.
+    Embeddings requests over the real per-request limits are rejected with a 400, as the API does.
+    """
+
+    def __init__(
+        self,
+        dimensions=256,
+        latency_ms=50,
+        ms_per_1k_tokens=5,
+        max_inputs=2048,
+        max_tokens=300_000,
+        chat_latency_ms=300,
+        tokens_per_second=200,
+        image_latency_ms=2000,
+        speech_latency_ms=500,
+        distribution="fixed",
+        jitter=0.5,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        requests_per_minute=None,
+        retry_after_s=1,
+        seed=0,
+        port=0,
+    ):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.chat_latency_ms = chat_latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.image_latency_ms = image_latency_ms
+        self.speech_latency_ms = speech_latency_ms
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.retry_after_s = retry_after_s
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.requests = 0
+        self.statuses = Counter()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sleep(self, ms):
+        """Sleep for a latency drawn from the configured distribution, with a mean of ms"""
+        with self.lock:
+            if self.distribution == "uniform":
+                ms *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+            elif self.distribution == "lognormal":
+                ms *= self.rng.lognormvariate(-self.jitter**2 / 2, self.jitter)
+            elif self.distribution == "exponential":
+                ms = self.rng.expovariate(1 / ms) if ms else 0
+        time.sleep(ms / 1000)
+
+    def injected_error(self):
+        """A 429 when over requests_per_minute, else a 429 or 500 drawn at rate_limit_rate and error_rate"""
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            limited = self.requests_per_minute is not None and len(self.recent) >= self.requests_per_minute
+            if not limited:
+                self.recent.append(now)
+            roll = self.rng.random()
+        if limited or roll < self.rate_limit_rate:
+            return 429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500, {"error": {"message": "The server had an error processing your request", "type": "server_error"}}
+        return None
+
+    def embeddings(self, body):
+        """Inputs may be strings or, as LangChain sends them, lists of token ids, each of which counts as one token"""
+        inputs = body["input"]
+        if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        texts = [" ".join(map(str, i)) if isinstance(i, list) else i for i in inputs]
+        tokens = sum(len(i) if isinstance(i, list) else estimate_tokens(i) for i in inputs)
+        if len(texts) > self.max_inputs or tokens > self.max_tokens:
+            return 400, {"error": {"message": f"Too many inputs or tokens: {len(texts)} inputs, {tokens} tokens", "type": "invalid_request_error"}}
+        self.sleep(self.latency_ms)
+        time.sleep(self.ms_per_1k_tokens * tokens / 1e6)
+        dimensions = body.get("dimensions") or self.dimensions
+        data = []
+        for index, text in enumerate(texts):
+            vector = fake_embedding(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        usage = {"prompt_tokens": tokens, "total_tokens": tokens}
+        return 200, {"object": "list", "data": data, "model": body["model"], "usage": usage}
+
+    def tool_call(self, tools, prompt):
+        """Call the first function tool, with arguments filled in from its parameters schema"""
+        function = next(t["function"] for t in tools if t.get("type") == "function")
+        arguments = fake_structured(function.get("parameters", {}), prompt)
+        return {
+            "id": f"call_fake_{self.requests}",
+            "type": "function",
+            "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+        }
+
+    def chat_completions(self, body):
+        messages = body["messages"]
+        prompt = text_of(messages[-1].get("content"))
+        response_format = body.get("response_format") or {}
+        message = {"role": "assistant", "content": None}
+        if body.get("tools") and messages[-1]["role"] == "user":
+            message["tool_calls"] = [self.tool_call(body["tools"], prompt)]
+            content = message["tool_calls"][0]["function"]["arguments"]
+        elif response_format.get("type") == "json_schema":
+            content = message["content"] = json.dumps(fake_structured(response_format["json_schema"]["schema"], prompt))
+        else:
+            content = message["content"] = " ".join(itertools.islice(spread(prompt, 0), 50))
+        finish_reason = "tool_calls" if "tool_calls" in message else "stop"
+        prompt_tokens = sum(estimate_tokens(text_of(m.get("content"))) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        if body.get("stream"):
+            return 200, self.stream_chat(body, message, finish_reason)
+        self.sleep(self.chat_latency_ms)
+        time.sleep(completion_tokens / self.tokens_per_second)
+        return 200, {
+            "id": f"chatcmpl-fake-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def stream_chat(self, body, message, finish_reason):
+        """Yield chat.completion.chunk payloads, one word at a time at tokens_per_second"""
+        self.sleep(self.chat_latency_ms)
+        base = {"id": f"chatcmpl-fake-{self.requests}", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"]}
+        for index, call in enumerate(message.get("tool_calls", [])):
+            yield {**base, "choices": [{"index": 0, "delta": {"tool_calls": [{**call, "index": index}]}, "finish_reason": None}]}
+        for word in message["content"].split(" ") if message["content"] else []:
+            yield {**base, "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            time.sleep(1 / self.tokens_per_second)
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
+
+    def responses(self, body):
+        """The responses API, as the agents SDK calls it: a single output message, not streamed"""
+        if body.get("stream"):
+            return 400, {"error": {"message": "Streaming responses are not supported by the stand-in", "type": "invalid_request_error"}}
+        items = body["input"] if isinstance(body["input"], list) else [{"role": "user", "content": body["input"]}]
+        prompt = text_of(next((i.get("content") for i in reversed(items) if i.get("content")), ""))
+        text_format = (body.get("text") or {}).get("format") or {}
+        if text_format.get("type") == "json_schema":
+            content = json.dumps(fake_structured(text_format["schema"], prompt))
+        else:
+            content = " ".join(itertools.islice(spread(prompt, 0), 50))
+        input_tokens = sum(estimate_tokens(text_of(i.get("content"))) for i in items) + estimate_tokens(body.get("instructions") or "")
+        output_tokens = estimate_tokens(content)
+        self.sleep(self.chat_latency_ms)
+        time.sleep(output_tokens / self.tokens_per_second)
+        return 200, {
+            "id": f"resp_fake_{self.requests}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body["model"],
+            "output": [
+                {
+                    "type": "message",
+                    "id": f"msg_fake_{self.requests}",
+                    "status": "completed",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": content, "annotations": []}],
+                }
+            ],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    def images(self, body):
+        width, height = (int(n) for n in (body.get("size") or "1024x1024").split("x"))
+        self.sleep(self.image_latency_ms)
+        data = []
+        for _ in range(body.get("n") or 1):
+            image = base64.b64encode(fake_png(body["prompt"], width, height)).decode("ascii")
+            if body.get("response_format") == "b64_json":
+                data.append({"b64_json": image, "revised_prompt": body["prompt"]})
+            else:
+                data.append({"url": f"data:image/png;base64,{image}", "revised_prompt": body["prompt"]})
+        return 200, {"created": int(time.time()), "data": data}
+
+    def speech(self, body):
+        """Silence in the response_format asked for, mp3 by default as with the API; a 400 for other formats"""
+        response_format = body.get("response_format") or "mp3"
+        if response_format not in SPEECH_FORMATS:
+            return 400, {"error": {"message": f"The stand-in does not produce {response_format} audio", "type": "invalid_request_error"}}
+        self.sleep(self.speech_latency_ms)
+        return 200, (SPEECH_FORMATS[response_format], fake_speech(body["input"], response_format))
+
+    def _handler(self):
+        fake = self
+        routes = {
+            "/embeddings": fake.embeddings,
+            "/chat/completions": fake.chat_completions,
+            "/responses": fake.responses,
+            "/images/generations": fake.images,
+            "/audio/speech": fake.speech,
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake.lock:
+                    fake.requests += 1
+                route = next((r for r in routes if self.path.endswith(r)), None)
+                if route is None:
+                    status, payload = 404, {"error": {"message": f"Unknown path {self.path}"}}
+                else:
+                    status, payload = fake.injected_error() or routes[route](body)
+                fake.statuses[route, status] += 1
+                if isinstance(payload, tuple):
+                    content_type, data = payload
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                if not isinstance(payload, dict):
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for event in payload:
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+                reply = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(reply)))
+                if status == 429:
+                    self.send_header("Retry-After", f"{fake.retry_after_s:g}")
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--dimensions", type=int, default=3072, help="for embeddings requests without dimensions")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean base latency of embeddings requests")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=5, help="added to embeddings requests per 1k input tokens")
+    parser.add_argument("--chat-latency-ms", type=float, default=300, help="mean time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--image-latency-ms", type=float, default=2000)
+    parser.add_argument("--speech-latency-ms", type=float, default=500)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--jitter", type=float, default=0.5, help="spread of the uniform and lognormal distributions")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument("--requests-per-minute", type=int, help="answer 429 beyond this many requests a minute")
+    parser.add_argument("--retry-after", type=float, default=1, help="seconds sent in the Retry-After of a 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with FakeOpenAI(
+        dimensions=args.dimensions,
+        latency_ms=args.latency_ms,
+        ms_per_1k_tokens=args.ms_per_1k_tokens,
+        chat_latency_ms=args.chat_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        image_latency_ms=args.image_latency_ms,
+        speech_latency_ms=args.speech_latency_ms,
+        distribution=args.distribution,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        requests_per_minute=args.requests_per_minute,
+        retry_after_s=args.retry_after,
+        seed=args.seed,
+        port=args.port,
+    ) as fake:
+        print(f"Serving the OpenAI stand-in; point the scripts at it with\n  export FAKE_OPENAI_URL={fake.base_url}")
+        try:
+            fake.thread.join()
+        except KeyboardInterrupt:
+            pass
+    print(f"\n{fake.requests} requests")
+    for (route, status), count in sorted(fake.statuses.items(), key=str):
+        print(f"  {route} {status}: {count}")
+
+
+if __name__ == "__main__":
+    main()
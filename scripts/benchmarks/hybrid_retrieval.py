@@ -0,0 +1,52 @@
+"""
+Does hybrid BM25 + dense retrieval let us skip the LLM query rewrite without losing recall?
+Compares dense and hybrid retrieval, each with and without the rewrite, on a fixed question set:
+recall@FINAL_K of the fused candidates before reranking, and mean retrieval latency including the rewrite.
+
+Run from the scripts folder, after ingestion:  python -m benchmarks.hybrid_retrieval
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+from pro_implementation import answer
+from benchmarks.rerankers import QUESTIONS_PATH, load_questions, recall
+
+CONFIGURATIONS = {
+    "dense": (False, False),
+    "dense + rewrite": (False, True),
+    "hybrid": (True, False),
+    "hybrid + rewrite": (True, True),
+}
+
+
+def candidates(question, hybrid, rewrite):
+    answer.HYBRID = hybrid
+    questions = [question, answer.rewrite_query(question)] if rewrite else [question]
+    return answer.fuse_chunks(*answer.retrieve_many(questions, with_embeddings=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    args = parser.parse_args()
+
+    if answer.sparse_index() is None:
+        raise SystemExit(f"No BM25 index at {answer.BM25_PATH}; run python -m pro_implementation.ingest first")
+    questions = load_questions(args.questions)
+    k = answer.FINAL_K
+    print(f"\n{len(questions)} questions, k={k}\n")
+    print(f"{'retrieval':<16} | recall@{k} | mean latency")
+    for name, (hybrid, rewrite) in CONFIGURATIONS.items():
+        latencies = []
+        recalls = []
+        for q in questions:
+            start = time.perf_counter()
+            chunks = candidates(q["question"], hybrid, rewrite)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(recall(chunks, q["expected_sources"], k))
+        print(f"{name:<16} | {statistics.mean(recalls):>9.2f} | {statistics.mean(latencies) * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
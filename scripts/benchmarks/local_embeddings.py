@@ -0,0 +1,94 @@
+"""
+Compare the local embedding backend with the OpenAI embeddings API:
+- document throughput in chunks/sec, embedding and upserting a chunk set as ingestion does, for each local
+  runtime and thread count
+- query latency, embedding the question set one question at a time as the app does
+
+With --offline the API side is the local stand-in in fake_openai.py, with --latency-ms per request.
+The local backend needs sentence-transformers, and optimum with onnxruntime for the onnx runtimes.
+
+Run from the scripts folder:
+  python -m benchmarks.local_embeddings --offline
+  python -m benchmarks.local_embeddings --runtimes torch,onnx,onnx/model_quint8_avx2.onnx --threads 1,2,4
+"""
+import argparse
+import os
+import statistics
+import time
+from openai import OpenAI
+from chromadb import EphemeralClient
+from embedding_backends import LOCAL_MODEL, OPENAI_MODEL, LocalEmbedder, LocalEmbeddingsClient
+from benchmarks.embedding_throughput import make_texts
+from benchmarks.rerankers import load_questions
+from pro_implementation.embedder import CONCURRENCY, embed_into_collection
+
+
+def make_embedder(runtime, threads, batch_size):
+    """A runtime of "torch" or "onnx", or the path of an ONNX export, which implies the onnx runtime"""
+    if runtime in ("torch", "onnx"):
+        return LocalEmbedder(LOCAL_MODEL, runtime=runtime, threads=threads, batch_size=batch_size)
+    return LocalEmbedder(LOCAL_MODEL, runtime="onnx", onnx_file=runtime, threads=threads, batch_size=batch_size)
+
+
+def throughput(client, model, texts, concurrency):
+    collection = EphemeralClient().get_or_create_collection(f"bench-{time.perf_counter_ns()}")
+    ids = [str(i) for i in range(len(texts))]
+    metas = [{"source": "benchmark"} for _ in texts]
+    start = time.perf_counter()
+    embed_into_collection(collection, ids, texts, metas, client=client, model=model, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    assert collection.count() == len(texts)
+    return len(texts) / elapsed
+
+
+def query_latency(client, model, questions):
+    """p50 and p95 milliseconds to embed one question"""
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        client.embeddings.create(model=model, input=[question])
+        timings.append((time.perf_counter() - start) * 1000)
+    cuts = statistics.quantiles(timings, n=20)
+    return cuts[9], cuts[18]
+
+
+def compare(args, api):
+    texts = make_texts(args.chunks)
+    questions = [q["question"] for q in load_questions()]
+    print(f"\n{len(texts)} chunks, {len(questions)} questions\n")
+    print(f"{'backend':<44} {'chunks/s':>9} {'query p50':>10} {'query p95':>10}")
+
+    def show(label, client, model, concurrency):
+        rate = throughput(client, model, texts, concurrency)
+        p50, p95 = query_latency(client, model, questions)
+        print(f"{label:<44} {rate:>9,.0f} {p50:>7.1f} ms {p95:>7.1f} ms")
+
+    show(f"openai {OPENAI_MODEL}", api, OPENAI_MODEL, CONCURRENCY)
+    for runtime in args.runtimes.split(","):
+        for threads in [int(t) for t in args.threads.split(",")]:
+            embedder = make_embedder(runtime, threads, args.batch_size)
+            embedder.load()
+            show(f"local {runtime}, {threads} threads", LocalEmbeddingsClient(embedder), LOCAL_MODEL, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--runtimes", default="torch,onnx", help="torch, onnx, or the path of an ONNX export")
+    parser.add_argument("--threads", default=f"1,{os.cpu_count()}")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--offline", action="store_true", help="measure the API side against the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    if args.offline:
+        from benchmarks.fake_openai import FakeOpenAI
+
+        with FakeOpenAI(latency_ms=args.latency_ms) as fake:
+            compare(args, OpenAI(base_url=fake.base_url, api_key="fake", max_retries=0))
+    else:
+        compare(args, OpenAI())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare the reranker backends on a fixed question set: latency per question and recall@FINAL_K,
+the share of each question's expected source files that appear among the top FINAL_K chunks.
+Candidates are retrieved once per question and shared by every backend.
+
+Run from the scripts folder, after ingestion:  python -m benchmarks.rerankers
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from pro_implementation import answer
+from pro_implementation.rerankers import NoReranker, LLMReranker, CrossEncoderReranker, CosineReranker
+
+QUESTIONS_PATH = Path(__file__).parent / "questions.jsonl"
+
+
+def load_questions(path=QUESTIONS_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def source_key(chunk):
+    return chunk.metadata["source"].split("knowledge-base/")[-1]
+
+
+def recall(chunks, expected, k):
+    found = {source_key(chunk) for chunk in chunks[:k]}
+    return len(found & set(expected)) / len(expected)
+
+
+def candidates(question):
+    rewritten = answer.rewrite_query(question)
+    original, rewrites = answer.fetch_context_unranked_many([question, rewritten], with_embeddings=True)
+    return answer.fuse_chunks(original, rewrites)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    parser.add_argument("--backends", default="none,cosine,cross-encoder,llm")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    pools = [candidates(q["question"]) for q in questions]
+    backends = {
+        "none": NoReranker,
+        "cosine": lambda: CosineReranker(lambda question: answer.embed_queries([question])[0]),
+        "cross-encoder": CrossEncoderReranker,
+        "llm": lambda: LLMReranker(answer.MODEL),
+    }
+
+    k = answer.FINAL_K
+    print(f"\n{len(questions)} questions, {statistics.mean(len(p) for p in pools):.0f} candidates each, k={k}\n")
+    print(f"{'backend':<14} | recall@{k} | mean latency | p95 latency")
+    for name in args.backends.split(","):
+        reranker = backends[name]()
+        latencies = []
+        recalls = []
+        for q, pool in zip(questions, pools):
+            start = time.perf_counter()
+            ranked = reranker.rerank(q["question"], pool)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(recall(ranked, q["expected_sources"], k))
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(
+            f"{name:<14} | {statistics.mean(recalls):>9.2f} | {statistics.mean(latencies) * 1000:>9.1f} ms"
+            f" | {p95 * 1000:>8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Offline quality and latency suite for fetch_context and answer_question, for both implementations.
+Every question in the question set is answered once. The suite reports:
+- recall@k: the share of a question's expected source files found in the top k chunks
+- MRR: the reciprocal rank of the first chunk from an expected source
+- p50/p95/p99 latency for each pipeline stage
+- token counts of the retrieved context and of the answer
+
+The results are diffed against a stored baseline, and any regression beyond the tolerances exits non-zero, as
+does a missing baseline unless --update-baseline is given.
+
+With --offline the LLM and embedding calls go to the deterministic local stand-in in fake_openai.py. The
+knowledge base is then ingested into a scratch directory first, so the numbers measure the pipeline
+rather than the models. Baselines are kept per mode.
+
+Run from the scripts folder:
+  python -m benchmarks.retrieval_eval --offline                    # compare against the offline baseline
+  python -m benchmarks.retrieval_eval --offline --update-baseline  # accept the current results
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from functools import wraps
+from pathlib import Path
+import numpy as np
+from stand_in import use_stand_in
+from benchmarks.rerankers import QUESTIONS_PATH, load_questions, source_key
+
+BASELINES_PATH = Path(__file__).parent / "baselines"
+RECALL_KS = [1, 3, 5, 10]
+TOKEN_MODEL = "gpt-4.1-nano"
+
+
+class Recorder:
+    """Times every call to the wrapped module functions, by stage name"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, module, name):
+        fn = getattr(module, name)
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[name].append(time.perf_counter() - start)
+
+        setattr(module, name, timed)
+
+    def percentiles(self):
+        return {
+            stage: {f"p{p}": float(np.percentile(seconds, p)) * 1000 for p in (50, 95, 99)}
+            for stage, seconds in self.samples.items()
+        }
+
+
+def load_pro(recorder, scratch=None):
+    from pro_implementation import answer, ingest
+    from pro_implementation.context import rag_context
+
+    if scratch:
+        scratch.mkdir(parents=True, exist_ok=True)
+        db = scratch / "preprocessed_db"
+        rag_context.db_name, rag_context.numpy_index_path = str(db), db / "numpy_index"
+        for module in (answer, ingest):
+            module.DB_NAME, module.MANIFEST_PATH, module.BM25_PATH = str(db), db / "manifest.json", db / "bm25.npz"
+        ingest.CHUNK_CACHE_PATH = scratch / "chunk_cache.db"
+        ingest.EMBEDDING_CACHE_PATH = scratch / "embedding_cache.db"
+        ingest.run_ingestion(incremental=False)
+    for name in ["rewrite_query", "retrieve_many", "rerank", "fetch_context", "generate", "answer_question"]:
+        recorder.wrap(answer, name)
+    return answer
+
+
+def load_langchain(recorder, scratch=None):
+    from implementation import answer, ingest
+    from implementation.context import langchain_context
+
+    if scratch:
+        langchain_context.db_name = str(scratch / "vector_db")
+        langchain_context.bm25_path = scratch / "vector_db" / "bm25.npz"
+        langchain_context.embedding_cache_path = scratch / "embedding_cache.db"
+        ingest.run_ingestion()
+    for name in ["fetch_sparse", "fetch_context", "answer_question"]:
+        recorder.wrap(answer, name)
+    return answer
+
+
+IMPLEMENTATIONS = {"pro": load_pro, "langchain": load_langchain}
+
+
+def reciprocal_rank(chunks, expected):
+    for rank, chunk in enumerate(chunks, start=1):
+        if source_key(chunk) in expected:
+            return 1 / rank
+    return 0.0
+
+
+def evaluate(module, recorder, questions, answers):
+    from pro_implementation.context_packer import count_tokens
+
+    recalls = defaultdict(list)
+    reciprocal_ranks = []
+    context_tokens = []
+    answer_tokens = []
+    for q in questions:
+        if answers:
+            reply, chunks = module.answer_question(q["question"], [])
+            answer_tokens.append(count_tokens(reply, TOKEN_MODEL))
+        else:
+            chunks = module.fetch_context(q["question"])
+        expected = set(q["expected_sources"])
+        for k in RECALL_KS:
+            recalls[k].append(len({source_key(c) for c in chunks[:k]} & expected) / len(expected))
+        reciprocal_ranks.append(reciprocal_rank(chunks, expected))
+        context_tokens.append(sum(count_tokens(c.page_content, TOKEN_MODEL) for c in chunks))
+    quality = {f"recall@{k}": float(np.mean(values)) for k, values in recalls.items()}
+    quality["mrr"] = float(np.mean(reciprocal_ranks))
+    tokens = {"context": float(np.mean(context_tokens))}
+    if answer_tokens:
+        tokens["answer"] = float(np.mean(answer_tokens))
+    return {"quality": quality, "latency_ms": recorder.percentiles(), "tokens": tokens}
+
+
+def question_set_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+
+def compare(results, baseline, recall_tolerance, latency_tolerance, token_tolerance):
+    """Print each metric against the baseline and return the list of regressions"""
+    regressions = []
+
+    def check(label, now, before, worse):
+        flag = "REGRESSION" if worse else ""
+        print(f"  {label:<36} {before:>10.3f} -> {now:>10.3f}  {flag}")
+        if worse:
+            regressions.append(f"{label}: {before:.3f} -> {now:.3f}")
+
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"\n{name}: not in the baseline")
+            continue
+        print(f"\n{name}: baseline -> current")
+        for metric, now in current["quality"].items():
+            before = previous["quality"].get(metric, now)
+            check(f"{name} {metric}", now, before, now < before - recall_tolerance)
+        for stage, percentiles in current["latency_ms"].items():
+            for p in ["p50", "p95"]:
+                before = previous["latency_ms"].get(stage, {}).get(p, percentiles[p])
+                check(f"{name} {stage} {p} ms", percentiles[p], before, percentiles[p] > before * (1 + latency_tolerance))
+        for kind, now in current["tokens"].items():
+            before = previous["tokens"].get(kind, now)
+            check(f"{name} {kind} tokens", now, before, now > before * (1 + token_tolerance))
+    return regressions
+
+
+def print_results(results):
+    for name, result in results.items():
+        quality = " | ".join(f"{metric} {value:.2f}" for metric, value in result["quality"].items())
+        tokens = " | ".join(f"{kind} {value:.0f}" for kind, value in result["tokens"].items())
+        print(f"\n{name}\n  {quality}\n  tokens: {tokens}")
+        for stage, percentiles in result["latency_ms"].items():
+            print(f"  {stage:<16} " + "  ".join(f"{p} {ms:>8.1f} ms" for p, ms in percentiles.items()))
+
+
+def run(args):
+    results = {}
+    scratch = Path(tempfile.mkdtemp()) if args.offline else None
+    for name in args.implementations.split(","):
+        recorder = Recorder()
+        module = IMPLEMENTATIONS[name](recorder, scratch / name if scratch else None)
+        recorder.samples.clear()
+        results[name] = evaluate(module, recorder, load_questions(args.questions), not args.skip_answers)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    parser.add_argument("--implementations", default="pro,langchain")
+    parser.add_argument("--offline", action="store_true", help="use the local stand-in for every model call")
+    parser.add_argument("--skip-answers", action="store_true", help="only run fetch_context")
+    parser.add_argument("--baseline", type=Path, help="defaults to baselines/offline.json or baselines/live.json")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02)
+    parser.add_argument("--latency-tolerance", type=float, default=0.25)
+    parser.add_argument("--token-tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or BASELINES_PATH / f"{'offline' if args.offline else 'live'}.json"
+    if args.offline:
+        from benchmarks.fake_openai import FakeOpenAI
+
+        with FakeOpenAI(latency_ms=5, chat_latency_ms=20, tokens_per_second=2000) as fake:
+            # Through stand_in.py, so the modules' load_dotenv cannot restore a real key and the embedding
+            # cache is bypassed rather than filled with the stand-in's vectors
+            os.environ["FAKE_OPENAI_URL"] = fake.base_url
+            use_stand_in()
+            results = run(args)
+    else:
+        results = run(args)
+    print_results(results)
+
+    question_set = question_set_hash(args.questions)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({"question_set": question_set, "results": results}, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {baseline_path}")
+        return
+    if not baseline_path.exists():
+        sys.exit(f"\nNo baseline at {baseline_path}; run with --update-baseline to create one")
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["question_set"] != question_set:
+        sys.exit("\nThe question set has changed since the baseline was recorded; re-run with --update-baseline")
+
+    regressions = compare(
+        results, baseline["results"], args.recall_tolerance, args.latency_tolerance, args.token_tolerance
+    )
+    if regressions:
+        print("\n" + "!" * 60)
+        print(f"{len(regressions)} REGRESSIONS against {baseline_path}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        print("!" * 60)
+        sys.exit(1)
+    print(f"\nNo regressions against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
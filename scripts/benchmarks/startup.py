@@ -0,0 +1,79 @@
+"""
+Import time and startup time for each entry script and the modules behind it, each in a fresh interpreter.
+Import time comes from `python -X importtime`, with the slowest packages it pulled in; startup adds the
+first use of the vectorstore, which is when the database is actually opened.
+
+Run from the scripts folder:  python -m benchmarks.startup
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = {
+    "rag_from_scratch": "from pro_implementation import answer; answer.vectorstore().count()",
+    "pro_implementation.answer": "from pro_implementation import answer; answer.vectorstore().count()",
+    "pro_implementation.ingest": "from pro_implementation import ingest",
+    "langchain_RAG_vectorized_db_with_history": (
+        "from implementation.context import langchain_context; langchain_context.vectorstore._collection.count()"
+    ),
+    "implementation.answer": (
+        "from implementation.context import langchain_context; langchain_context.vectorstore._collection.count()"
+    ),
+    "implementation.ingest": "from implementation import ingest",
+}
+
+
+def parse_importtime(stderr, module):
+    """The target's cumulative import time in microseconds, and the packages it imported directly, slowest first"""
+    total = 0
+    children = []
+    direct = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                total, direct = int(cumulative), sorted(children, reverse=True)
+            children = []
+    return total, direct
+
+
+def run(code, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = {**os.environ, "LITELLM_LOCAL_MODEL_COST_MAP": "True"}
+    start = time.perf_counter()
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = statistics.median(run("pass")[0] for _ in range(args.repeat))
+    print(f"\nInterpreter startup alone: {baseline:.2f}s; times below are medians of {args.repeat} runs\n")
+    for module, first_use in TARGETS.items():
+        try:
+            run(f"import {module}")
+        except subprocess.CalledProcessError as e:
+            print(f"{module}\n  could not be imported: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        imports = [parse_importtime(run(f"import {module}", importtime=True)[1], module) for _ in range(args.repeat)]
+        total = statistics.median(total for total, _ in imports)
+        startup = statistics.median(run(f"import {module}; {first_use}")[0] for _ in range(args.repeat))
+        slowest = ", ".join(f"{name} {micros / 1e6:.2f}s" for micros, name in imports[-1][1][: args.top])
+        print(f"{module}\n  import {total / 1e6:.2f}s | startup to first vectorstore use {startup:.2f}s")
+        print(f"  slowest imports: {slowest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Compare the in-process NumPy index against a Chroma PersistentClient collection on synthetic vectors.
+For each corpus size both stores are built once, then each is opened in a fresh interpreter to measure
+cold start (open plus the first query), single-query latency, batched-query latency and RSS.
+
+Run from the scripts folder:  python -m benchmarks.vector_index --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import psutil
+
+BUILD_BATCH = 5000
+# Batch seeds are their start offsets, so this one never collides with the corpus
+QUERY_SEED = 2**31
+
+
+def synthetic_vectors(start, count, dimensions):
+    """Unit vectors, reproducible per batch so both stores hold exactly the same data"""
+    vectors = np.random.default_rng(start).standard_normal((count, dimensions), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def batches(size, dimensions):
+    for start in range(0, size, BUILD_BATCH):
+        count = min(BUILD_BATCH, size - start)
+        ids = [str(i) for i in range(start, start + count)]
+        documents = [f"Synthetic chunk {i}" for i in range(start, start + count)]
+        metadatas = [{"source": f"doc{i // 10}.md", "type": "synthetic"} for i in range(start, start + count)]
+        yield ids, synthetic_vectors(start, count, dimensions), documents, metadatas
+
+
+def build(backend, path, size, dimensions):
+    if backend == "numpy":
+        from pro_implementation.vector_index import NumpyCollection
+
+        collection = NumpyCollection(path)
+        for ids, vectors, documents, metadatas in batches(size, dimensions):
+            collection.add(ids=ids, embeddings=vectors, documents=documents, metadatas=metadatas)
+        collection.flush()
+    else:
+        from chromadb import PersistentClient
+
+        collection = PersistentClient(path=str(path)).get_or_create_collection("docs")
+        for ids, vectors, documents, metadatas in batches(size, dimensions):
+            collection.add(ids=ids, embeddings=vectors.tolist(), documents=documents, metadatas=metadatas)
+
+
+def open_collection(backend, path):
+    if backend == "numpy":
+        from pro_implementation.vector_index import NumpyCollection
+
+        return NumpyCollection(path)
+    from chromadb import PersistentClient
+
+    return PersistentClient(path=str(path)).get_collection("docs")
+
+
+def measure(backend, path, dimensions, queries, k):
+    """Runs inside the child interpreter; prints one JSON line with the results"""
+    include = ["documents", "metadatas", "distances"]
+    vectors = synthetic_vectors(QUERY_SEED, queries, dimensions).tolist()
+
+    start = time.perf_counter()
+    collection = open_collection(backend, path)
+    collection.query(query_embeddings=vectors[:1], n_results=k, include=include)
+    cold_start = time.perf_counter() - start
+
+    latencies = []
+    for vector in vectors:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[vector], n_results=k, include=include)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    collection.query(query_embeddings=vectors, n_results=k, include=include)
+    batched = (time.perf_counter() - start) / queries
+
+    print(json.dumps({
+        "cold_start": cold_start,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "batched_ms": 1000 * batched,
+        "rss_mb": psutil.Process().memory_info().rss / 2**20,
+    }))
+
+
+def child(*arguments):
+    command = [sys.executable, "-m", "benchmarks.vector_index", *map(str, arguments)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return output.strip().splitlines()[-1] if output.strip() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=20)
+    parser.add_argument("--backends", default="chroma,numpy")
+    parser.add_argument("--child", choices=["build", "measure"], help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "build":
+        build(args.backend, Path(args.path), args.size, args.dimensions)
+        return
+    if args.child == "measure":
+        measure(args.backend, Path(args.path), args.dimensions, args.queries, args.k)
+        return
+
+    print(f"\n{args.dimensions} dimensions, {args.queries} queries, k={args.k}\n")
+    print("backend |      size |  build | cold start | p50 query | p95 query | batched/query |   RSS")
+    with tempfile.TemporaryDirectory() as root:
+        for size in map(int, args.sizes.split(",")):
+            for backend in args.backends.split(","):
+                path = Path(root) / f"{backend}-{size}"
+                start = time.perf_counter()
+                child("--child", "build", "--backend", backend, "--path", path, "--size", size,
+                      "--dimensions", args.dimensions)
+                built = time.perf_counter() - start
+                result = json.loads(child("--child", "measure", "--backend", backend, "--path", path,
+                                          "--dimensions", args.dimensions, "--queries", args.queries, "-k", args.k))
+                print(
+                    f"{backend:<7} | {size:>9,} | {built:>5.0f}s | {result['cold_start']:>9.2f}s | "
+                    f"{result['p50_ms']:>7.2f}ms | {result['p95_ms']:>7.2f}ms | {result['batched_ms']:>11.2f}ms | "
+                    f"{result['rss_mb']:>4.0f} MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Recall versus memory versus latency for the compact storage modes of the numpy vector index, on our own
+knowledge base. The full-precision chunk embeddings are read from the ingested vectorstore and re-stored
+under each combination of Matryoshka truncation, dtype and rescoring. Queries are the benchmark questions
+plus the headlines of a sample of chunks.
+
+recall@k is the overlap with exact float32 search at full dimensions; source recall@k is the share of the
+benchmark questions' expected source files found. Memory is the vector data scanned on every query.
+
+Run from the scripts folder, after ingestion with EMBEDDING_DIMENSIONS = None:  python -m benchmarks.vector_storage
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from pro_implementation import answer
+from pro_implementation.vector_index import NumpyCollection, Storage
+from benchmarks.rerankers import QUESTIONS_PATH, load_questions, recall
+
+
+def configurations(dimensions, dtypes, rescores, full):
+    for size in sorted({min(size, full) for size in dimensions}, reverse=True):
+        for dtype in dtypes:
+            for rescore in rescores:
+                if rescore and size >= full and dtype == "float32":
+                    continue
+                yield Storage(dimensions=None if size >= full else size, dtype=dtype, rescore=rescore)
+
+
+def disk_bytes(path):
+    return sum(file.stat().st_size for file in Path(path).iterdir())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    parser.add_argument("--headline-queries", type=int, default=200)
+    parser.add_argument("--dimensions", default="3072,1536,1024,512,256")
+    parser.add_argument("--dtypes", default="float32,float16,int8")
+    parser.add_argument("--rescore", default="0,4")
+    parser.add_argument("-k", type=int, default=answer.FINAL_K)
+    args = parser.parse_args()
+
+    stored = answer.vectorstore().get(include=["documents", "metadatas", "embeddings"])
+    vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+    questions = load_questions(args.questions)
+    headlines = [document.split("\n", 1)[0] for document in stored["documents"]]
+    headlines = random.Random(0).sample(headlines, min(args.headline_queries, len(headlines)))
+    queries = np.asarray(answer.create_embeddings([q["question"] for q in questions] + headlines), dtype=np.float32)
+    if queries.shape[1] != vectors.shape[1]:
+        raise SystemExit("Query and stored dimensions differ; ingest with EMBEDDING_DIMENSIONS = None first")
+
+    k = args.k
+    exact = np.argsort(np.einsum("ij,ij->i", vectors, vectors)[None, :] - 2 * queries @ vectors.T, axis=1)[:, :k]
+    full = vectors.shape[1]
+    print(f"\n{len(vectors)} chunks of {full} dimensions, {len(queries)} queries, k={k}\n")
+    print("dimensions | dtype   | rescore | recall@k | source recall@k | memory    | disk      | cold load | latency")
+
+    with tempfile.TemporaryDirectory() as root:
+        for i, storage in enumerate(
+            configurations(
+                [int(d) for d in args.dimensions.split(",")],
+                args.dtypes.split(","),
+                [int(r) for r in args.rescore.split(",")],
+                full,
+            )
+        ):
+            path = Path(root) / str(i)
+            index = NumpyCollection(path, storage)
+            index.add(ids=stored["ids"], embeddings=vectors, documents=stored["documents"], metadatas=stored["metadatas"])
+            index.flush()
+
+            start = time.perf_counter()
+            index = NumpyCollection(path)
+            index.search(queries[:1], k)
+            cold = time.perf_counter() - start
+
+            latencies = []
+            found = []
+            for query in queries:
+                start = time.perf_counter()
+                indices, _ = index.search(query[None, :], k)
+                latencies.append(time.perf_counter() - start)
+                found.append(indices[0])
+            overlap = statistics.mean(len(set(f) & set(e)) / k for f, e in zip(found, exact))
+            sources = statistics.mean(
+                recall([answer.Result(page_content="", metadata=stored["metadatas"][j]) for j in f], q["expected_sources"], k)
+                for f, q in zip(found, questions)
+            )
+            print(
+                f"{storage.dimensions or full:>10} | {storage.dtype:<7} | {storage.rescore or '-':>7} | {overlap:>8.3f} | "
+                f"{sources:>15.2f} | {index.nbytes() / 2**20:>6.2f} MB | {disk_bytes(path) / 2**20:>6.2f} MB | "
+                f"{cold * 1000:>6.1f} ms | {statistics.mean(latencies) * 1000:>5.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import re
+from pathlib import Path
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = set(
+    "a an and are as at be by do does for from has have how i in is it its of on or our that the their "
+    "this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+def best(scores, k):
+    """The positions of the k highest non-zero scores, highest first"""
+    k = min(k, int(np.count_nonzero(scores)))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class BM25Index:
+    """
+    A sparse BM25 index over chunk texts, for the exact-match lookups (product names, surnames) that
+    dense retrieval handles poorly. The postings are stored in CSR form: for the term at position t in
+    `terms`, its chunks are postings[offsets[t]:offsets[t + 1]] with the matching term frequencies.
+    The whole index is a handful of arrays saved together in one compressed .npz file.
+    Chunk ids begin with their document's path in the knowledge base, so a search can be limited to folders.
+    """
+
+    def __init__(self, ids, terms, offsets, postings, frequencies, lengths):
+        self.ids = ids
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.vocabulary = {term: i for i, term in enumerate(terms.tolist())}
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+        self.masks = {}
+
+    @classmethod
+    def build(cls, ids, texts):
+        counts = {}
+        lengths = []
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for token in tokens:
+                chunk_counts = counts.setdefault(token, {})
+                chunk_counts[position] = chunk_counts.get(position, 0) + 1
+        terms = sorted(counts)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(counts[term]) for term in terms])
+        postings = np.fromiter((p for term in terms for p in counts[term]), dtype=np.int32, count=offsets[-1])
+        frequencies = np.fromiter(
+            (min(f, 65535) for term in terms for f in counts[term].values()), dtype=np.uint16, count=offsets[-1]
+        )
+        return cls(np.array(ids), np.array(terms), offsets, postings, frequencies, np.array(lengths, dtype=np.uint32))
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                ids=self.ids,
+                terms=self.terms,
+                offsets=self.offsets,
+                postings=self.postings,
+                frequencies=self.frequencies,
+                lengths=self.lengths,
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(*(data[name] for name in ["ids", "terms", "offsets", "postings", "frequencies", "lengths"]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def prefix_mask(self, prefixes):
+        """Which chunks have an id starting with one of the prefixes, cached per set of prefixes"""
+        if prefixes not in self.masks:
+            self.masks[prefixes] = np.logical_or.reduce([np.char.startswith(self.ids, p) for p in prefixes])
+        return self.masks[prefixes]
+
+    def search(self, query, k, prefixes=None, unrouted_k=0):
+        """
+        The ids of the top k chunks by BM25 score, best first, with their scores; chunks scoring 0 are left out.
+        Given a tuple of id prefixes, such as ("employees/",), only the chunks with one of them are searched,
+        joined by the top unrouted_k chunks of the whole index.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if (t := self.vocabulary.get(term)) is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            chunks = self.postings[start:end]
+            frequencies = self.frequencies[start:end].astype(np.float32)
+            idf = np.log(1 + (len(self.ids) - len(chunks) + 0.5) / (len(chunks) + 0.5))
+            norm = K1 * (1 - B + B * self.lengths[chunks] / self.average_length)
+            scores[chunks] += idf * frequencies * (K1 + 1) / (frequencies + norm)
+        if not prefixes:
+            top = best(scores, k)
+        else:
+            top = best(np.where(self.prefix_mask(prefixes), scores, 0), k)
+            if unrouted_k:
+                top = np.union1d(top, best(scores, unrouted_k))
+                top = top[np.argsort(-scores[top], kind="stable")]
+        return self.ids[top].tolist(), scores[top].tolist()
+
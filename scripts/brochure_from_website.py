@@ -3,6 +3,7 @@ import requests
 import os
 from dotenv import load_dotenv
 from openai import OpenAI
+from stand_in import client_args
 import gradio as gr
 
 headers = {
@@ -93,13 +94,13 @@ if google_api_key:
 else:
     print("Google API Key not set")
 
-openai = OpenAI()
+openai = OpenAI(**client_args())
 
 anthropic_url = "https://api.anthropic.com/v1/"
 gemini_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
 
-anthropic = OpenAI(api_key=anthropic_api_key, base_url=anthropic_url)
-gemini = OpenAI(api_key=google_api_key, base_url=gemini_url)
+anthropic = OpenAI(**client_args(anthropic_api_key, anthropic_url))
+gemini = OpenAI(**client_args(google_api_key, gemini_url))
 
 #-------------
 
@@ -4,6 +4,7 @@ import json
 from dotenv import load_dotenv
 from IPython.display import Markdown, display, update_display
 from openai import OpenAI
+from stand_in import client_args
 from bs4 import BeautifulSoup
 import requests
 
@@ -87,7 +88,7 @@ else:
     print("There might be a problem with your API key? Please visit the troubleshooting notebook!")
 
 MODEL = 'gpt-5-nano'
-openai = OpenAI()
+openai = OpenAI(**client_args())
 
 links = fetch_website_links("https://edwarddonner.com")
 # links = fetch_website_links("https://eliacharfeig.com")
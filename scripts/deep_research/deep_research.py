@@ -1,8 +1,20 @@
+import sys
+from pathlib import Path
 import gradio as gr
+from agents import set_default_openai_client, set_tracing_disabled
 from dotenv import load_dotenv
+from openai import AsyncOpenAI
 from research_manager import ResearchManager
 
+# The app runs from its own folder; stand_in.py is in the scripts folder above it
+sys.path.append(str(Path(__file__).parent.parent))
+from stand_in import client_args, use_stand_in
+
 load_dotenv(override=True)
+# With FAKE_OPENAI_URL set, the agents go to the local stand-in, which has no trace ingestion
+if use_stand_in():
+    set_default_openai_client(AsyncOpenAI(**client_args()), use_for_tracing=False)
+    set_tracing_disabled(True)
 
 
 async def run(query: str):
@@ -0,0 +1,69 @@
+"""
+Routes a question to the doc types it is about, the knowledge-base folders such as employees or contracts, so
+retrieval can search only those partitions of the index. The classifier is a set of keyword rules:
+- a question goes to a doc type when it uses one of the type's KEYWORDS
+- or when it uses a distinctive word from one of the type's document titles, such as a surname from
+  employees/ or a product name from products/ or contracts/
+A question that matches no doc type, or every doc type, is not routed and searches the whole index.
+Routing is a hint rather than a filter: retrieval joins the routed partitions with the nearest few chunks of
+the whole index, so a misrouted question still finds its sources.
+"""
+import re
+from collections import Counter, defaultdict
+from pathlib import PurePosixPath
+from bm25 import tokenize
+
+# The company's own name routes to its overview documents as well, which is a small partition to add.
+# Interrogatives and role words ("who", "role", "team", "position") are not keywords: they are as common in
+# questions about products, clients and the company as in questions about employees.
+KEYWORDS = {
+    "company": "insurellm company founded founder founders history mission vision values culture headquarters office offices careers",
+    "employees": "employee employees staff salary salaries compensation hired",
+    "products": "product products feature features pricing price prices tier tiers cost costs plan plans subscription",
+    "contracts": "contract contracts agreement agreements signed client clients customer customers renewal terms sla",
+}
+# Titles only route for doc types with this many documents, where they name people, products or clients
+# rather than sections such as company/about.md
+MIN_TITLES = 5
+# Title words in more than this share of a doc type's titles ("contract", "insurance") are too common to route on
+MAX_TITLE_SHARE = 0.2
+
+
+def words(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class DocTypeRouter:
+    def __init__(self, vocabulary, doc_types):
+        self.vocabulary = vocabulary
+        self.doc_types = doc_types
+
+    @classmethod
+    def from_sources(cls, sources):
+        """Build the rules for the documents at `sources`, paths relative to the knowledge base"""
+        titles = defaultdict(list)
+        for source in sources:
+            path = PurePosixPath(source)
+            titles[path.parts[0]].append(set(tokenize(path.stem)))
+        vocabulary = defaultdict(set)
+        for doc_type, keywords in KEYWORDS.items():
+            if doc_type in titles:
+                for word in keywords.split():
+                    vocabulary[word].add(doc_type)
+        for doc_type, title_words in titles.items():
+            if len(title_words) < MIN_TITLES:
+                continue
+            counts = Counter(word for title in title_words for word in title)
+            for word, count in counts.items():
+                if count <= MAX_TITLE_SHARE * len(title_words):
+                    vocabulary[word].add(doc_type)
+        return cls(dict(vocabulary), sorted(titles))
+
+    def route(self, question):
+        """The doc types the question is about, or None to search them all"""
+        routes = set()
+        for word in words(question):
+            routes |= self.vocabulary.get(word, set())
+        if not routes or len(routes) == len(self.doc_types):
+            return None
+        return sorted(routes)
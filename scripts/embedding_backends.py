@@ -0,0 +1,131 @@
+"""
+The embedding backend shared by every RAG script: OpenAI's text-embedding-3-large through the API, or a
+sentence-transformers model run on this machine's CPU, for working offline and for embedding queries without
+a network round trip. Switching backends changes the vectors, so the ingest scripts rebuild their
+vectorstores when the backend, model or dimensions no longer match what was stored.
+
+Compare throughput and query latency of the two, from the scripts folder:  python -m benchmarks.local_embeddings
+"""
+import threading
+from functools import cache
+from types import SimpleNamespace
+
+# "openai", or "local" for LOCAL_MODEL on the CPU
+EMBEDDING_BACKEND = "openai"
+OPENAI_MODEL = "text-embedding-3-large"
+LOCAL_MODEL = "all-MiniLM-L6-v2"
+# "torch", or "onnx" to run the model with ONNX Runtime, which is usually faster on CPU
+LOCAL_RUNTIME = "torch"
+# With the onnx runtime, one of the model's published exports, e.g. the int8 "onnx/model_quint8_avx2.onnx"
+ONNX_FILE = None
+# Intra-op threads for the model; None leaves the runtime's default of one per core
+LOCAL_THREADS = None
+LOCAL_BATCH_SIZE = 64
+
+
+def embedding_model(backend=EMBEDDING_BACKEND):
+    """
+    The backend's model name, as recorded in manifests and cache keys. The local runtime is part of it,
+    since a quantized export gives slightly different vectors.
+    """
+    if backend != "local":
+        return OPENAI_MODEL
+    if LOCAL_RUNTIME == "torch":
+        return LOCAL_MODEL
+    return f"{LOCAL_MODEL}:{ONNX_FILE or LOCAL_RUNTIME}"
+
+
+def embedding_config(dimensions=None, backend=EMBEDDING_BACKEND):
+    """
+    The settings that change the vectors, recorded with a vectorstore; a store whose recorded config differs
+    must be rebuilt. Full-size embeddings leave the dimensions out, as Chroma metadata cannot hold None.
+    """
+    config = {"embedding_backend": backend, "embedding_model": embedding_model(backend)}
+    if dimensions:
+        config["embedding_dimensions"] = dimensions
+    return config
+
+
+class LocalEmbedder:
+    """
+    A sentence-transformers model on the CPU, loaded on first use. encode() sorts the texts by length before
+    cutting them into batches, so each batch is padded to texts of similar length rather than to the longest
+    text of the call, and hands the vectors back in the original order.
+    Calls are serialized: the model already spreads each batch over `threads` cores, so concurrent calls
+    would only contend for them.
+    """
+
+    def __init__(
+        self,
+        model=LOCAL_MODEL,
+        runtime=LOCAL_RUNTIME,
+        onnx_file=ONNX_FILE,
+        threads=LOCAL_THREADS,
+        batch_size=LOCAL_BATCH_SIZE,
+    ):
+        self.model_name = model
+        self.runtime = runtime
+        self.onnx_file = onnx_file
+        self.threads = threads
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self._model = None
+
+    def load(self):
+        with self.lock:
+            if self._model is None:
+                self._model = self.open_model()
+            return self._model
+
+    def open_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.runtime != "onnx":
+            if self.threads:
+                import torch
+
+                torch.set_num_threads(self.threads)
+            return SentenceTransformer(self.model_name, device="cpu")
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if self.onnx_file:
+            model_kwargs["file_name"] = self.onnx_file
+        if self.threads:
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            model_kwargs["session_options"] = options
+        return SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    def embed(self, texts, dimensions=None):
+        """Normalized embeddings for the texts, cut to `dimensions` if given"""
+        model = self.load()
+        with self.lock:
+            vectors = model.encode(
+                texts, batch_size=self.batch_size, normalize_embeddings=True, truncate_dim=dimensions
+            )
+        return vectors.tolist()
+
+
+@cache
+def local_embedder():
+    """The LocalEmbedder shared by everything in the process, so the model is loaded once"""
+    return LocalEmbedder()
+
+
+class LocalEmbeddingsClient:
+    """
+    Answers client.embeddings.create() like the OpenAI client, from a LocalEmbedder, so code written against
+    the API embeds locally unchanged. The model argument is ignored.
+    """
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.embeddings = self
+
+    def create(self, model, input, dimensions=None, **kwargs):
+        texts = [input] if isinstance(input, str) else list(input)
+        vectors = self.embedder.embed(texts, dimensions)
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=vector, index=i) for i, vector in enumerate(vectors)], usage=None
+        )
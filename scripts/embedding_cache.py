@@ -0,0 +1,133 @@
+"""
+The embedding cache shared by both ingest pipelines, in embedding_cache.db next to this file.
+While the local OpenAI stand-in is switched on (FAKE_OPENAI_URL is set), open_cache() returns None and
+documents are embedded without a cache, so the stand-in's vectors never end up served in place of the real model's.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+
+
+# Shared by both ingest pipelines, so a chunk embedded by one is never paid for again by the other
+EMBEDDING_CACHE_PATH = Path(__file__).parent / "embedding_cache.db"
+# About 85k text-embedding-3-large vectors at full size
+MAX_BYTES = 2**30
+# SQLite allows a limited number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+
+def open_cache(path=EMBEDDING_CACHE_PATH):
+    """
+    The cache at path, or None while the local OpenAI stand-in is switched on, whose vectors must never be
+    served in place of the real model's
+    """
+    if os.getenv("FAKE_OPENAI_URL"):
+        return None
+    return EmbeddingCache(path)
+
+
+class EmbeddingCache:
+    """
+    A content-addressed SQLite cache of document embeddings, keyed on a hash of the model, the dimensions and
+    the text, with each vector stored as packed float32. Re-chunking mostly produces byte-identical chunks,
+    so only the chunks that actually changed are sent to the API.
+    Beyond max_bytes of vectors, the least recently used entries are evicted.
+    One connection is kept open for the cache's lifetime and shared by the threads that use it; close() it when done.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=MAX_BYTES):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key BLOB PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+
+    @staticmethod
+    def key(model, dimensions, text):
+        return hashlib.sha256(f"{model}\n{dimensions}\n{text}".encode("utf-8")).digest()
+
+    def get_many(self, model, dimensions, texts):
+        """The cached vector for each text, or None where there is none"""
+        keys = [self.key(model, dimensions, text) for text in texts]
+        found = {}
+        with self.lock, self.conn:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start : start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self.conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch))
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?", [(time.time(), key) for key in found]
+            )
+            self.hits += sum(key in found for key in keys)
+            self.misses += sum(key not in found for key in keys)
+        return [array("f", found[key]).tolist() if key in found else None for key in keys]
+
+    def put_many(self, model, dimensions, texts, vectors):
+        now = time.time()
+        rows = [
+            (self.key(model, dimensions, text), model, array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+
+    def embed(self, model, dimensions, texts, fetch):
+        """The vectors for the texts, calling fetch(texts) only for those not cached, and caching what it returns"""
+        vectors = self.get_many(model, dimensions, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fetched = fetch([texts[i] for i in missing])
+            self.put_many(model, dimensions, [texts[i] for i in missing], fetched)
+            for i, vector in zip(missing, fetched):
+                vectors[i] = vector
+        return vectors
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_bytes of vectors; returns how many were dropped"""
+        with self.lock, self.conn:
+            return self.conn.execute(
+                """
+                DELETE FROM embeddings WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(LENGTH(vector)) OVER (ORDER BY last_used DESC) AS total FROM embeddings
+                    ) WHERE total > ?
+                )
+                """,
+                (self.max_bytes,),
+            ).rowcount
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def nbytes(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return (
+            f"Embedding cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+            f"{len(self)} entries, {self.nbytes() / 2**20:.1f} MB"
+        )
@@ -6,6 +6,7 @@ from io import BytesIO
 import gradio as gr
 from dotenv import load_dotenv
 from openai import OpenAI
+from stand_in import client_args
 from PIL import Image
 
 MODEL = "gpt-4.1-mini"
@@ -182,7 +183,7 @@ def main() -> int:
     else:
         print("OpenAI API Key not set")
 
-    client = OpenAI()
+    client = OpenAI(**client_args())
     init_db_and_seed()
 
     ui = build_ui(client)
@@ -2,9 +2,10 @@ import sys
 import time
 import os
 from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
+from typing import Optional
 from dotenv import load_dotenv
 from openai import OpenAI
+from stand_in import client_args, use_stand_in
 
 
 @dataclass(frozen=True)
@@ -64,6 +65,11 @@ def print_key_status(keys: ApiKeys) -> None:
 
 
 def build_clients(keys: ApiKeys) -> ClientBundle:
+    # With FAKE_OPENAI_URL set, every provider goes to the local stand-in (see stand_in.py)
+    if use_stand_in():
+        stand_in = OpenAI(**client_args())
+        return ClientBundle(openai=stand_in, anthropic=stand_in, gemini=stand_in, grok=stand_in)
+
     openai_client = OpenAI(api_key=keys.openai) if keys.openai else OpenAI()
 
     anthropic = (
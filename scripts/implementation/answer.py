@@ -1,21 +1,26 @@
-from pathlib import Path
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import SystemMessage, HumanMessage, convert_to_messages
 from langchain_core.documents import Document
 
 from dotenv import load_dotenv
+from implementation.context import langchain_context
+from stand_in import use_stand_in
+from tracing import propagate, span, traced
 
 
 load_dotenv(override=True)
+# Points every OpenAI client at the local stand-in when FAKE_OPENAI_URL is set; a no-op otherwise
+use_stand_in()
 
 MODEL = "gpt-4.1-nano"
-DB_NAME = str(Path(__file__).parent.parent / "vector_db")
-
-# embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
 RETRIEVAL_K = 10
+RRF_K = 60
+# Search only the doc-type partitions (knowledge-base folders) a question is routed to, see doc_router.py
+ROUTE_BY_DOC_TYPE = True
+# A question routed to several partitions gets RETRIEVAL_K split between them, but at least this many from each
+PARTITION_MIN_K = 3
+# A routed question also takes this many documents from the whole vectorstore, in case it was misrouted
+UNROUTED_K = 3
 
 SYSTEM_PROMPT = """
 You are a knowledgeable, friendly assistant representing the company Insurellm.
@@ -26,16 +31,87 @@ Context:
 {context}
 """
 
-vectorstore = Chroma(persist_directory=DB_NAME, embedding_function=embeddings)
-retriever = vectorstore.as_retriever()
-llm = ChatOpenAI(temperature=0, model_name=MODEL)
+pool = ThreadPoolExecutor(max_workers=2)
+partition_pool = ThreadPoolExecutor(max_workers=4)
+
+
+def route(question: str) -> list[str] | None:
+    """
+    The doc types the question is routed to, or None to search the whole vectorstore.
+    """
+    router = langchain_context.router if ROUTE_BY_DOC_TYPE else None
+    return router.route(question) if router else None
+
+
+@traced("bm25")
+def fetch_sparse(question: str, routes: list[str] | None = None) -> list[Document]:
+    """
+    Retrieve documents for a question by BM25, for exact matches on names that dense search can miss.
+    """
+    bm25 = langchain_context.bm25
+    if bm25 is None:
+        return []
+    ids = bm25.search(question, RETRIEVAL_K, routes and tuple(f"{doc_type}/" for doc_type in routes), UNROUTED_K)[0]
+    if not ids:
+        return []
+    stored = langchain_context.vectorstore.get(ids=ids)
+    documents = {
+        id: Document(page_content=text, metadata=metadata)
+        for id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+    }
+    return [documents[id] for id in ids if id in documents]
+
+
+def fetch_dense(question: str, routes: list[str] | None = None) -> list[Document]:
+    """
+    Retrieve documents for a question by similarity, from the whole vectorstore or, given routes, from each
+    of those doc types and for UNROUTED_K from the whole vectorstore, concurrently, with the question embedded
+    once and the results merged nearest first.
+    """
+    if routes is None:
+        with span("retriever.invoke"):
+            return langchain_context.retriever.invoke(question, k=RETRIEVAL_K)
+    embedding = langchain_context.embeddings.embed_query(question)
+    k = max(PARTITION_MIN_K, -(-RETRIEVAL_K // len(routes)))
+
+    def search(doc_type):
+        with span("retriever.invoke", partition=doc_type or "all"):
+            return langchain_context.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                embedding,
+                k=UNROUTED_K if doc_type is None else k,
+                filter=None if doc_type is None else {"doc_type": doc_type},
+            )
+
+    futures = [partition_pool.submit(propagate(search), doc_type) for doc_type in routes + [None]]
+    scored = [pair for future in futures for pair in future.result()]
+    nearest = {doc.page_content: doc for doc, distance in sorted(scored, key=lambda pair: pair[1])}
+    return list(nearest.values())
+
+
+def fuse(*rankings: list[Document]) -> list[Document]:
+    """
+    Reciprocal rank fusion: each document scores 1 / (RRF_K + rank) in every list it appears in.
+    """
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1 / (RRF_K + rank)
+            documents.setdefault(doc.page_content, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[content] for content in ranked[:RETRIEVAL_K]]
 
 
+@traced("fetch_context")
 def fetch_context(question: str) -> list[Document]:
     """
-    Retrieve relevant context documents for a question.
+    Retrieve relevant context documents for a question, running dense and BM25 retrieval concurrently,
+    both favouring the doc types the question is routed to.
     """
-    return retriever.invoke(question, k=RETRIEVAL_K)
+    routes = route(question)
+    sparse = pool.submit(propagate(fetch_sparse), question, routes)
+    dense = fetch_dense(question, routes)
+    return fuse(dense, sparse.result())
 
 
 def combined_question(question: str, history: list[dict] = []) -> str:
@@ -46,6 +122,7 @@ def combined_question(question: str, history: list[dict] = []) -> str:
     return prior + "\n" + question
 
 
+@traced("answer_question")
 def answer_question(question: str, history: list[dict] = []) -> tuple[str, list[Document]]:
     """
     Answer the given question with RAG; return the answer and the context documents.
@@ -57,5 +134,8 @@ def answer_question(question: str, history: list[dict] = []) -> tuple[str, list[
     messages = [SystemMessage(content=system_prompt)]
     messages.extend(convert_to_messages(history))
     messages.append(HumanMessage(content=question))
-    response = llm.invoke(messages)
+    with span("completion") as generation:
+        response = langchain_context.chat_model(MODEL).invoke(messages)
+        if usage := response.usage_metadata:
+            generation.set(prompt_tokens=usage["input_tokens"], completion_tokens=usage["output_tokens"])
     return response.content, docs
@@ -0,0 +1,20 @@
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrap a LangChain embeddings model so document embeddings are served from the shared embedding cache,
+    and only texts it does not hold yet are sent to the model. Queries always go straight to the model.
+    """
+
+    def __init__(self, embeddings, cache, model, dimensions=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts):
+        return self.cache.embed(self.model, self.dimensions, texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,131 @@
+import threading
+from pathlib import Path
+import embedding_backends
+from embedding_backends import EMBEDDING_BACKEND
+from embedding_cache import EMBEDDING_CACHE_PATH, open_cache
+
+
+DB_NAME = str(Path(__file__).parent.parent / "vector_db")
+BM25_PATH = Path(DB_NAME) / "bm25.npz"
+EMBEDDING_MODEL = embedding_backends.embedding_model()
+# text-embedding-3 models can return shorter embeddings, e.g. 1024
+EMBEDDING_DIMENSIONS = None
+
+
+class LangChainContext:
+    """
+    The LangChain objects shared by ingestion and answering: the embeddings, the Chroma vectorstore and its
+    retriever, the chat models, the BM25 index and the doc-type router. Each is created on first use rather than at import,
+    so importing the modules is cheap and the vectorstore is opened only once.
+    Document embeddings go through the embedding cache shared with the pro ingest, whose connection stays open
+    for the life of the context.
+    """
+
+    def __init__(self, db_name=DB_NAME, bm25_path=BM25_PATH, embedding_cache_path=EMBEDDING_CACHE_PATH):
+        self.db_name = db_name
+        self.bm25_path = Path(bm25_path)
+        self.embedding_cache_path = embedding_cache_path
+        self.lock = threading.RLock()
+        self.embedding_cache = None
+        self._embeddings = None
+        self._vectorstore = None
+        self._bm25 = None
+        self._router = None
+        self._chat_models = {}
+
+    @property
+    def embeddings(self):
+        with self.lock:
+            if self._embeddings is None:
+                from implementation.cached_embeddings import CachedEmbeddings
+
+                if EMBEDDING_BACKEND == "local":
+                    from implementation.local_embeddings import LocalEmbeddings
+
+                    self._embeddings = LocalEmbeddings(embedding_backends.local_embedder(), EMBEDDING_DIMENSIONS)
+                else:
+                    from langchain_openai import OpenAIEmbeddings
+
+                    self._embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS)
+                self.embedding_cache = open_cache(self.embedding_cache_path)
+                if self.embedding_cache is not None:
+                    self._embeddings = CachedEmbeddings(
+                        self._embeddings, self.embedding_cache, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+                    )
+            return self._embeddings
+
+    @property
+    def vectorstore(self):
+        with self.lock:
+            if self._vectorstore is None:
+                from langchain_chroma import Chroma
+
+                # New collections record their embedding config, so ingestion can tell when it no longer matches
+                self._vectorstore = Chroma(
+                    persist_directory=self.db_name,
+                    embedding_function=self.embeddings,
+                    collection_metadata=embedding_backends.embedding_config(EMBEDDING_DIMENSIONS),
+                )
+            return self._vectorstore
+
+    @property
+    def retriever(self):
+        return self.vectorstore.as_retriever()
+
+    def stored_embedding_config(self):
+        """
+        The embedding config the vectors in the store were made with, to compare with embedding_config().
+        Older stores recorded only the model, or nothing when they were all text-embedding-3-large.
+        """
+        metadata = self.vectorstore._collection.metadata or {}
+        config = {key: value for key, value in metadata.items() if key.startswith("embedding_")}
+        config.setdefault("embedding_model", embedding_backends.OPENAI_MODEL)
+        if config["embedding_model"] == embedding_backends.OPENAI_MODEL:
+            config.setdefault("embedding_backend", "openai")
+        else:
+            config.setdefault("embedding_backend", "local")
+        return config
+
+    def reset_vectorstore(self):
+        """Delete the collection and return a new, empty vectorstore"""
+        with self.lock:
+            self.vectorstore.delete_collection()
+            self._vectorstore = None
+            return self.vectorstore
+
+    def chat_model(self, model):
+        with self.lock:
+            if model not in self._chat_models:
+                from langchain_openai import ChatOpenAI
+
+                self._chat_models[model] = ChatOpenAI(temperature=0, model_name=model)
+            return self._chat_models[model]
+
+    @property
+    def bm25(self):
+        """The BM25 index written by ingestion, or None if there is none yet"""
+        with self.lock:
+            if self._bm25 is None and self.bm25_path.exists():
+                from bm25 import BM25Index
+
+                self._bm25 = BM25Index.load(self.bm25_path)
+            return self._bm25
+
+    def save_bm25(self, index):
+        with self.lock:
+            index.save(self.bm25_path)
+            self._bm25 = index
+            self._router = None
+
+    @property
+    def router(self):
+        """The doc-type router over the ingested documents, whose paths begin the BM25 chunk IDs; None before ingestion"""
+        with self.lock:
+            if self._router is None and self.bm25 is not None:
+                from doc_router import DocTypeRouter
+
+                self._router = DocTypeRouter.from_sources({id.rsplit(":", 2)[0] for id in self.bm25.ids.tolist()})
+            return self._router
+
+
+langchain_context = LangChainContext()
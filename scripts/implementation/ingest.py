@@ -1,55 +1,87 @@
-import os
-import glob
+import argparse
+import hashlib
 from pathlib import Path
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import OpenAIEmbeddings
+from bm25 import BM25Index
+from doc_loader import DocumentLoader
+from embedding_backends import embedding_config
+from stand_in import use_stand_in
+from implementation.context import EMBEDDING_DIMENSIONS, langchain_context
 
 
 from dotenv import load_dotenv
 
 MODEL = "gpt-4.1-nano"
 
-DB_NAME = str(Path(__file__).parent.parent / "vector_db")
 KNOWLEDGE_BASE = str(Path(__file__).parent.parent / "knowledge-base")
 
-# embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
 load_dotenv(override=True)
+# Points every OpenAI client at the local stand-in when FAKE_OPENAI_URL is set; a no-op otherwise
+use_stand_in()
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
 
+def fetch_documents(loader):
+    """The knowledge base as LangChain documents tagged with their doc_type, in the loader's batches"""
+    from langchain_core.documents import Document
 
-def fetch_documents():
-    folders = glob.glob(str(Path(KNOWLEDGE_BASE) / "*"))
-    documents = []
-    for folder in folders:
-        doc_type = os.path.basename(folder)
-        loader = DirectoryLoader(
-            folder, glob="**/*.md", loader_cls=TextLoader, loader_kwargs={"encoding": "utf-8"}
-        )
-        folder_docs = loader.load()
-        for doc in folder_docs:
-            doc.metadata["doc_type"] = doc_type
-            documents.append(doc)
-    return documents
+    for batch in loader.batches():
+        yield [
+            Document(page_content=document["text"], metadata={"source": document["source"], "doc_type": document["type"]})
+            for document in batch
+        ]
 
 
 def create_chunks(documents):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=200)
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    # start_index records each chunk's character offset in its document, which goes into its ID
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=200, add_start_index=True)
     chunks = text_splitter.split_documents(documents)
     return chunks
 
 
-def create_embeddings(chunks):
-    if os.path.exists(DB_NAME):
-        Chroma(persist_directory=DB_NAME, embedding_function=embeddings).delete_collection()
-
-    vectorstore = Chroma.from_documents(
-        documents=chunks, embedding=embeddings, persist_directory=DB_NAME
-    )
+def chunk_id(chunk):
+    """
+    A deterministic ID from the chunk's source path, offset and content, so re-ingesting an unchanged chunk
+    gives the same ID and an edited one a new ID
+    """
+    source = Path(chunk.metadata["source"]).resolve().relative_to(Path(KNOWLEDGE_BASE).resolve()).as_posix()
+    digest = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:16]
+    return f"{source}:{chunk.metadata['start_index']}:{digest}"
+
+
+def create_embeddings(batches, incremental=True):
+    """
+    Bring the vectorstore in line with the chunks, which arrive in batches: in incremental mode only chunks whose
+    ID is new are embedded, as each batch arrives, and once all have arrived chunks whose ID is gone are deleted,
+    so nothing is embedded when the knowledge base is unchanged.
+    Otherwise, or when the stored vectors come from another embedding backend, model or dimensions, the collection
+    is rebuilt from scratch.
+    """
+    vectorstore = langchain_context.vectorstore
+    if not incremental or langchain_context.stored_embedding_config() != embedding_config(EMBEDDING_DIMENSIONS):
+        vectorstore = langchain_context.reset_vectorstore()
+    stored = set(vectorstore.get(include=[])["ids"])
+    ids = []
+    texts = []
+    added = 0
+    for chunks in batches:
+        batch_ids = [chunk_id(chunk) for chunk in chunks]
+        new = [(id, chunk) for id, chunk in zip(batch_ids, chunks) if id not in stored]
+        if new:
+            vectorstore.add_documents(documents=[chunk for _, chunk in new], ids=[id for id, _ in new])
+            added += len(new)
+        ids.extend(batch_ids)
+        texts.extend(chunk.page_content for chunk in chunks)
+    stale = list(stored - set(ids))
+
+    if stale:
+        vectorstore.delete(ids=stale)
+    if added or stale or langchain_context.bm25 is None:
+        langchain_context.save_bm25(BM25Index.build(ids, texts))
+    print(f"{added:,} chunks added, {len(stale):,} deleted, {len(ids) - added:,} unchanged")
+    if added and langchain_context.embedding_cache is not None:
+        langchain_context.embedding_cache.evict()
+        print(langchain_context.embedding_cache.report())
 
     collection = vectorstore._collection
     count = collection.count()
@@ -59,12 +91,16 @@ def create_embeddings(chunks):
     print(f"There are {count:,} vectors with {dimensions:,} dimensions in the vector store")
     return vectorstore
 
-def run_ingestion():
-    documents = fetch_documents()
-    chunks = create_chunks(documents)
-    create_embeddings(chunks)
+def run_ingestion(incremental=True):
+    """Embedding starts on the first batch of documents while the rest of the knowledge base is still being read"""
+    loader = DocumentLoader(KNOWLEDGE_BASE)
+    create_embeddings((create_chunks(documents) for documents in fetch_documents(loader)), incremental)
+    print(loader.report())
     print("Ingestion complete")
 
 
 if __name__ == "__main__":
-    run_ingestion()
+    parser = argparse.ArgumentParser(description="Ingest the knowledge base into the vectorstore")
+    parser.add_argument("--full", action="store_true", help="rebuild the collection from scratch")
+    args = parser.parse_args()
+    run_ingestion(incremental=not args.full)
@@ -0,0 +1,15 @@
+from langchain_core.embeddings import Embeddings
+
+
+class LocalEmbeddings(Embeddings):
+    """The shared local sentence-transformers model as a LangChain embeddings model"""
+
+    def __init__(self, embedder, dimensions=None):
+        self.embedder = embedder
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts):
+        return self.embedder.embed(texts, self.dimensions)
+
+    def embed_query(self, text):
+        return self.embedder.embed([text], self.dimensions)[0]
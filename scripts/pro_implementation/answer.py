@@ -1,31 +1,78 @@
-from openai import OpenAI
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from chromadb import PersistentClient
-from litellm import completion
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from pathlib import Path
-from tenacity import retry, wait_exponential
+from bm25 import BM25Index
+from doc_router import DocTypeRouter
+import embedding_backends
+from stand_in import use_stand_in
+from tracing import current, propagate, record_usage, span, traced
+from pro_implementation.context import rag_context
+from pro_implementation.llm import completion, acompletion
+from pro_implementation.rate_limit import llm_retry
+from pro_implementation.query_cache import QueryEmbeddingCache
+from pro_implementation.answer_cache import SemanticAnswerCache
+from pro_implementation.rerankers import LLMReranker, CrossEncoderReranker, CosineReranker, NoReranker
+from pro_implementation.context_packer import (
+    HistorySummaries,
+    count_message_tokens,
+    make_summary_messages,
+    pack_chunks,
+)
 
 
 load_dotenv(override=True)
+# Points every OpenAI client at the local stand-in when FAKE_OPENAI_URL is set; a no-op otherwise
+use_stand_in()
 
 MODEL = "openai/gpt-4.1-nano"
 # MODEL = "groq/openai/gpt-oss-120b"
 DB_NAME = str(Path(__file__).parent.parent / "preprocessed_db")
+MANIFEST_PATH = Path(DB_NAME) / "manifest.json"
 KNOWLEDGE_BASE_PATH = Path(__file__).parent.parent / "knowledge-base"
 SUMMARIES_PATH = Path(__file__).parent.parent / "summaries"
+# Set to a file path to keep query embeddings across restarts
+QUERY_CACHE_PATH = None
+# How similar a new question must be to a cached one to reuse its answer
+ANSWER_CACHE_THRESHOLD = 0.95
+# "llm", "cross-encoder" (local, CPU), "cosine" (re-scores the fetched embeddings) or "none" (keeps the retrieval order)
+RERANKER = "llm"
+# "chroma", or "numpy" for the in-process index that ingestion writes when its VECTOR_BACKEND is "numpy"
+VECTOR_BACKEND = "chroma"
+BM25_PATH = Path(DB_NAME) / "bm25.npz"
+# Must match EMBEDDING_DIMENSIONS in ingest.py; the numpy backend reads its own storage settings from disk
+EMBEDDING_DIMENSIONS = None
+# Fuse BM25 results into each retrieval, and whether to also retrieve on an LLM rewrite of the question
+HYBRID = True
+REWRITE_QUERY = True
+# Search only the doc-type partitions (knowledge-base folders) a question is routed to, see doc_router.py
+ROUTE_BY_DOC_TYPE = True
+# A question routed to several partitions gets RETRIEVAL_K split between them, but at least this many from each
+PARTITION_MIN_K = 5
+# A routed question also takes this many chunks from the whole collection, in case it was misrouted
+UNROUTED_K = 5
 
 collection_name = "docs"
-embedding_model = "text-embedding-3-large"
-wait = wait_exponential(multiplier=1, min=10, max=240)
-
-openai = OpenAI()
-
-chroma = PersistentClient(path=DB_NAME)
-collection = chroma.get_or_create_collection(collection_name)
+embedding_model = embedding_backends.embedding_model()
 
+# Its SQLite connection stays open for the life of the process
+query_cache = QueryEmbeddingCache(path=QUERY_CACHE_PATH)
+answer_cache = SemanticAnswerCache(threshold=ANSWER_CACHE_THRESHOLD)
 RETRIEVAL_K = 20
+FUSED_K = 20
 FINAL_K = 10
+RRF_K = 60
+# Token budgets for the retrieved chunks and for the conversation history in the final prompt
+CONTEXT_BUDGET = 4000
+HISTORY_BUDGET = 2000
+
+history_summaries = HistorySummaries(HISTORY_BUDGET, MODEL)
 
 SYSTEM_PROMPT = """
 You are a knowledgeable, friendly assistant representing the company Insurellm.
@@ -42,43 +89,56 @@ With this context, please answer the user's question. Be accurate, relevant and
 class Result(BaseModel):
     page_content: str
     metadata: dict
+    embedding: list[float] | None = None
+    distance: float | None = None
 
 
-class RankOrder(BaseModel):
-    order: list[int] = Field(
-        description="The order of relevance of chunks, from most relevant to least relevant, by chunk id number"
-    )
+class StageTimer:
+    """Wall-clock time per pipeline stage for one request; stages that overlap are timed independently"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.metrics = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - start
+
+    def report(self):
+        stages = " | ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages.items())
+        metrics = "".join(
+            f" | {name} {value:.2f}" if isinstance(value, float) else f" | {name} {value}"
+            for name, value in self.metrics.items()
+        )
+        return f"Timings: {stages} | total {time.perf_counter() - self.started:.2f}s{metrics}"
+
 
+def vectorstore():
+    return rag_context.collection(VECTOR_BACKEND, collection_name)
 
-@retry(wait=wait)
+
+@traced("rerank")
 def rerank(question, chunks):
-    system_prompt = """
-You are a document re-ranker.
-You are provided with a question and a list of relevant chunks of text from a query of a knowledge base.
-The chunks are provided in the order they were retrieved; this should be approximately ordered by relevance, but you may be able to improve on that.
-You must rank order the provided chunks by relevance to the question, with the most relevant chunk first.
-Reply only with the list of ranked chunk ids, nothing else. Include all the chunk ids you are provided with, reranked.
-"""
-    user_prompt = f"The user has asked the following question:\n\n{question}\n\nOrder all the chunks of text by relevance to the question, from most relevant to least relevant. Include all the chunk ids you are provided with, reranked.\n\n"
-    user_prompt += "Here are the chunks:\n\n"
-    for index, chunk in enumerate(chunks):
-        user_prompt += f"# CHUNK ID: {index + 1}:\n\n{chunk.page_content}\n\n"
-    user_prompt += "Reply only with the list of ranked chunk ids, nothing else."
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
-    response = completion(model=MODEL, messages=messages, response_format=RankOrder)
-    reply = response.choices[0].message.content
-    order = RankOrder.model_validate_json(reply).order
-    return [chunks[i - 1] for i in order]
+    return get_reranker().rerank(question, chunks)
+
 
+@traced("rerank")
+async def arerank(question, chunks):
+    return await get_reranker().arerank(question, chunks)
 
-def make_rag_messages(question, history, chunks):
+
+def make_rag_messages(question, history, chunks, summary=None):
     context = "\n\n".join(
         f"Extract from {chunk.metadata['source']}:\n{chunk.page_content}" for chunk in chunks
     )
     system_prompt = SYSTEM_PROMPT.format(context=context)
+    if summary:
+        system_prompt += f"\nSummary of the earlier conversation with the user:\n{summary}\n"
     return (
         [{"role": "system", "content": system_prompt}]
         + history
@@ -86,9 +146,46 @@ def make_rag_messages(question, history, chunks):
     )
 
 
-@retry(wait=wait)
-def rewrite_query(question, history=[]):
-    """Rewrite the user's question to be a more specific question that is more likely to surface relevant content in the Knowledge Base."""
+def pack_rag_messages(question, history, chunks, summary=None, timer=None):
+    """
+    The RAG prompt within budget: chunks de-overlapped and packed into CONTEXT_BUDGET tokens in rank order,
+    and, given a summary of the older turns, only the recent turns of history kept verbatim.
+    Prompt token counts before and after packing are recorded in the timer.
+    """
+    recent = history_summaries.split(history)[1] if summary else history
+    messages = make_rag_messages(question, recent, pack_chunks(chunks, CONTEXT_BUDGET, MODEL), summary)
+    if timer is not None:
+        timer.metrics["prompt_tokens_before"] = count_message_tokens(make_rag_messages(question, history, chunks), MODEL)
+        timer.metrics["prompt_tokens_after"] = count_message_tokens(messages, MODEL)
+    return messages
+
+
+@traced("summarize_history")
+def summarize_history(history):
+    """The rolling summary of the turns that do not fit in HISTORY_BUDGET, or None when the whole history fits"""
+    older, _ = history_summaries.split(history)
+    if not older:
+        return None
+    if (summary := history_summaries.get(older)) is None:
+        previous, turns = history_summaries.previous(older)
+        summary = generate(make_summary_messages(previous, turns)).choices[0].message.content
+        history_summaries.put(older, summary)
+    return summary
+
+
+@traced("summarize_history")
+async def asummarize_history(history):
+    older, _ = history_summaries.split(history)
+    if not older:
+        return None
+    if (summary := history_summaries.get(older)) is None:
+        previous, turns = history_summaries.previous(older)
+        summary = (await agenerate(make_summary_messages(previous, turns))).choices[0].message.content
+        history_summaries.put(older, summary)
+    return summary
+
+
+def make_rewrite_messages(question, history):
     message = f"""
 You are in a conversation with a user, answering questions about the company Insurellm.
 You are about to look up information in a Knowledge Base to answer the user's question.
@@ -103,43 +200,425 @@ Respond only with a short, refined question that you will use to search the Know
 It should be a VERY short specific question most likely to surface content. Focus on the question details.
 IMPORTANT: Respond ONLY with the precise knowledgebase query, nothing else.
 """
-    response = completion(model=MODEL, messages=[{"role": "system", "content": message}])
+    return [{"role": "system", "content": message}]
+
+
+@traced("rewrite_query")
+@llm_retry(MODEL)
+def rewrite_query(question, history=[]):
+    """Rewrite the user's question to be a more specific question that is more likely to surface relevant content in the Knowledge Base."""
+    response = completion(model=MODEL, messages=make_rewrite_messages(question, history))
+    record_usage(response)
+    return response.choices[0].message.content
+
+
+@traced("rewrite_query")
+@llm_retry(MODEL)
+async def arewrite_query(question, history=[]):
+    response = await acompletion(model=MODEL, messages=make_rewrite_messages(question, history))
+    record_usage(response)
     return response.choices[0].message.content
 
 
-def merge_chunks(chunks, reranked):
-    merged = chunks[:]
-    existing = [chunk.page_content for chunk in chunks]
-    for chunk in reranked:
-        if chunk.page_content not in existing:
-            merged.append(chunk)
-    return merged
+def fuse_chunks(*rankings, limit=FUSED_K):
+    """
+    Reciprocal rank fusion of the retrieval legs: a chunk scores 1 / (RRF_K + rank) in each list it appears in,
+    so chunks found by both the original and the rewritten question rise to the top.
+    Duplicates are recognized by a hash of their content, and ties go to the smaller vector distance, chunks
+    found only by BM25 having none and coming last. Only the top `limit` are kept for the reranker.
+    """
+    fused = {}
+    for chunks in rankings:
+        for rank, chunk in enumerate(chunks, start=1):
+            key = hashlib.blake2b(chunk.page_content.encode("utf-8"), digest_size=16).digest()
+            score, best = fused.get(key, (0.0, chunk))
+            if chunk.distance is not None and (best.distance is None or chunk.distance < best.distance):
+                best = chunk
+            fused[key] = (score + 1 / (RRF_K + rank), best)
+    ranked = sorted(
+        fused.values(),
+        key=lambda pair: (-pair[0], float("inf") if pair[1].distance is None else pair[1].distance),
+    )
+    return [chunk for _, chunk in ranked[:limit]]
+
+
+@traced("embeddings")
+@llm_retry(embedding_model)
+def create_embeddings(texts):
+    extra = {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {}
+    response = rag_context.embeddings_client.embeddings.create(model=embedding_model, input=texts, **extra)
+    record_usage(response)
+    return [e.embedding for e in response.data]
+
+
+def embed_queries(questions, known=None, count=True):
+    """
+    Embed the questions, taking repeats from the query cache and sending the rest in a single request.
+    `known` maps questions already embedded for this request to their vectors, which skip the cache so a
+    question is only counted once in its hit rate; count=False looks up without counting at all.
+    """
+    known = known or {}
+    cache_model = f"{embedding_model}@{EMBEDDING_DIMENSIONS}" if EMBEDDING_DIMENSIONS else embedding_model
+    vectors = [known.get(question) or query_cache.get(question, cache_model, count) for question in questions]
+    missing = list(dict.fromkeys(q for q, vector in zip(questions, vectors) if vector is None))
+    if missing:
+        fetched = dict(zip(missing, create_embeddings(missing)))
+        for question, vector in fetched.items():
+            query_cache.put(question, cache_model, vector)
+        vectors = [vector or fetched[question] for question, vector in zip(questions, vectors)]
+    return vectors
+
+
+_router = (None, None)
+
+
+def router():
+    """The doc-type router over the ingested documents, rebuilt whenever the manifest changes; None before ingestion"""
+    global _router
+    try:
+        mtime = MANIFEST_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _router[0] != mtime:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            _router = (mtime, DocTypeRouter.from_sources(json.load(f)["documents"]))
+    return _router[1]
+
+
+def route_many(questions):
+    """The doc types each question is routed to, or None where it searches the whole collection"""
+    index = router() if ROUTE_BY_DOC_TYPE else None
+    if index is None:
+        return [None] * len(questions)
+    return [index.route(question) for question in questions]
+
+
+def partition_k(routes, doc_type=None):
+    """The chunks a question routed to `routes` takes from the partition for doc_type, None for the whole collection"""
+    if routes is None:
+        return RETRIEVAL_K
+    if doc_type is None:
+        return UNROUTED_K
+    return max(PARTITION_MIN_K, -(-RETRIEVAL_K // len(routes)))
+
+
+def nearest(chunks):
+    """A routed question's chunks from all its partitions, nearest first, each once"""
+    return list({chunk.page_content: chunk for chunk in sorted(chunks, key=lambda chunk: chunk.distance)}.values())
+
+
+def as_results(results, with_embeddings):
+    embeddings = results["embeddings"] if with_embeddings else [[None] * len(row) for row in results["documents"]]
+    return [
+        [
+            Result(
+                page_content=document,
+                metadata=metadata,
+                distance=distance,
+                embedding=None if vector is None else list(vector),
+            )
+            for document, metadata, distance, vector in zip(documents, metadatas, distances, vectors)
+        ]
+        for documents, metadatas, distances, vectors in zip(
+            results["documents"], results["metadatas"], results["distances"], embeddings
+        )
+    ]
+
+
+partition_pool = ThreadPoolExecutor(max_workers=4)
+
+
+def fetch_context_unranked_many(questions, with_embeddings=None, known=None):
+    """
+    Retrieve RETRIEVAL_K chunks for each question, with one embeddings request and one batched query.
+    A question routed to some doc types is searched in each of those partitions, for partition_k chunks from each,
+    and for UNROUTED_K in the whole collection, nearest first; the partitions are queried concurrently, each with
+    every question routed to it.
+    Chunk embeddings are fetched too when the reranker needs them; `known` is passed on to embed_queries.
+    """
+    if with_embeddings is None:
+        with_embeddings = get_reranker().needs_embeddings
+    queries = embed_queries(questions, known)
+    routes = route_many(questions)
+    include = ["documents", "metadatas", "distances"] + (["embeddings"] if with_embeddings else [])
+    partitions = defaultdict(list)
+    for i, route in enumerate(routes):
+        for doc_type in (route or []) + [None]:
+            partitions[doc_type].append(i)
+
+    def search(doc_type, members):
+        where = None if doc_type is None else {"type": doc_type}
+        k = max(partition_k(routes[i], doc_type) for i in members)
+        with span("collection.query", partition=doc_type or "all"):
+            results = vectorstore().query(
+                query_embeddings=[queries[i] for i in members], n_results=k, include=include, where=where
+            )
+        return doc_type, members, as_results(results, with_embeddings)
+
+    if len(partitions) == 1:
+        searches = [search(*next(iter(partitions.items())))]
+    else:
+        futures = [partition_pool.submit(propagate(search), *item) for item in partitions.items()]
+        searches = [future.result() for future in futures]
+    fetched = [[] for _ in questions]
+    for doc_type, members, rows in searches:
+        for i, chunks in zip(members, rows):
+            fetched[i].extend(chunks[: partition_k(routes[i], doc_type)])
+    return [nearest(chunks) if route else chunks for chunks, route in zip(fetched, routes)]
 
 
 def fetch_context_unranked(question):
-    query = openai.embeddings.create(model=embedding_model, input=[question]).data[0].embedding
-    results = collection.query(query_embeddings=[query], n_results=RETRIEVAL_K)
-    chunks = []
-    for result in zip(results["documents"][0], results["metadatas"][0]):
-        chunks.append(Result(page_content=result[0], metadata=result[1]))
-    return chunks
-
-
-def fetch_context(original_question):
-    rewritten_question = rewrite_query(original_question)
-    chunks1 = fetch_context_unranked(original_question)
-    chunks2 = fetch_context_unranked(rewritten_question)
-    chunks = merge_chunks(chunks1, chunks2)
+    return fetch_context_unranked_many([question])[0]
+
+
+_sparse_index = (None, None)
+
+
+def sparse_index():
+    """The BM25 index written by ingestion, reloaded whenever the file changes; None if there is none yet"""
+    global _sparse_index
+    try:
+        mtime = BM25_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _sparse_index[0] != mtime:
+        _sparse_index = (mtime, BM25Index.load(BM25_PATH))
+    return _sparse_index[1]
+
+
+@traced("bm25")
+def fetch_sparse_many(questions, with_embeddings=None):
+    """
+    Retrieve RETRIEVAL_K chunks for each question by BM25, looking the chunks up in the vectorstore.
+    A question routed to some doc types scores the chunks in them, plus the UNROUTED_K best of the whole index.
+    """
+    if with_embeddings is None:
+        with_embeddings = get_reranker().needs_embeddings
+    index = sparse_index()
+    if index is None:
+        return [[] for _ in questions]
+    ranked = [
+        index.search(question, RETRIEVAL_K, route and tuple(f"{doc_type}/" for doc_type in route), UNROUTED_K)[0]
+        for question, route in zip(questions, route_many(questions))
+    ]
+    ids = list(dict.fromkeys(id for row in ranked for id in row))
+    if not ids:
+        return [[] for _ in questions]
+    include = ["documents", "metadatas"] + (["embeddings"] if with_embeddings else [])
+    stored = vectorstore().get(ids=ids, include=include)
+    vectors = stored["embeddings"] if with_embeddings else [None] * len(stored["ids"])
+    chunks = {
+        id: Result(page_content=document, metadata=metadata, embedding=None if vector is None else list(vector))
+        for id, document, metadata, vector in zip(stored["ids"], stored["documents"], stored["metadatas"], vectors)
+    }
+    return [[chunks[id] for id in row if id in chunks] for row in ranked]
+
+
+sparse_pool = ThreadPoolExecutor(max_workers=2)
+
+
+@traced("retrieve")
+def retrieve_many(questions, with_embeddings=None, known=None):
+    """
+    All the retrieval legs for the questions, to be fused: the dense results for each question and,
+    when HYBRID, the BM25 results for each question, which run on another thread alongside the dense query.
+    """
+    if not HYBRID:
+        return fetch_context_unranked_many(questions, with_embeddings, known)
+    sparse = sparse_pool.submit(propagate(fetch_sparse_many), questions, with_embeddings)
+    dense = fetch_context_unranked_many(questions, with_embeddings, known)
+    return dense + sparse.result()
+
+
+@traced("fetch_context")
+def fetch_context(original_question, embedding=None):
+    """Pass the question's embedding if the caller already has it, so it is not looked up twice"""
+    questions = [original_question, rewrite_query(original_question)] if REWRITE_QUERY else [original_question]
+    known = {original_question: embedding} if embedding else None
+    chunks = fuse_chunks(*retrieve_many(questions, known=known))
     reranked = rerank(original_question, chunks)
     return reranked[:FINAL_K]
 
 
-@retry(wait=wait)
-def answer_question(question: str, history: list[dict] = []) -> tuple[str, list]:
+@traced("fetch_context")
+async def fetch_context_async(original_question, timer=None, embedding=None):
     """
-    Answer a question using RAG and return the answer and the retrieved context
+    The same retrieval as fetch_context, but the retrieval on the original question runs while the
+    query is being rewritten, so only the rewritten leg and the rerank remain on the critical path.
     """
-    chunks = fetch_context(question)
-    messages = make_rag_messages(question, history, chunks)
+    timer = timer or StageTimer()
+    known = {original_question: embedding} if embedding else None
+
+    async def rewrite():
+        with timer.stage("rewrite"):
+            return await arewrite_query(original_question)
+
+    async def retrieve(name, question):
+        with timer.stage(name):
+            return await asyncio.to_thread(retrieve_many, [question], None, known)
+
+    rewriting = asyncio.create_task(rewrite()) if REWRITE_QUERY else None
+    rankings = await retrieve("retrieve_original", original_question)
+    if rewriting is not None:
+        rankings += await retrieve("retrieve_rewritten", await rewriting)
+    chunks = fuse_chunks(*rankings)
+    with timer.stage("rerank"):
+        reranked = await arerank(original_question, chunks)
+    return reranked[:FINAL_K]
+
+
+def make_reranker(name):
+    if name == "cross-encoder":
+        return CrossEncoderReranker()
+    if name == "cosine":
+        # The question was embedded for retrieval just before, so this lookup is not counted again
+        return CosineReranker(lambda question: embed_queries([question], count=False)[0])
+    if name == "none":
+        return NoReranker()
+    return LLMReranker(MODEL)
+
+
+reranker = None
+
+
+def get_reranker():
+    """The RERANKER backend, created on first use; a cross-encoder loads its model then"""
+    global reranker
+    if reranker is None:
+        reranker = make_reranker(RERANKER)
+    return reranker
+
+
+@traced("completion")
+@llm_retry(MODEL)
+def generate(messages):
     response = completion(model=MODEL, messages=messages)
-    return response.choices[0].message.content, chunks
+    record_usage(response)
+    return response
+
+
+@traced("completion")
+@llm_retry(MODEL)
+async def agenerate(messages):
+    response = await acompletion(model=MODEL, messages=messages)
+    record_usage(response)
+    return response
+
+
+async def summarize_async(history, timer):
+    """Summarize the older history while retrieval runs"""
+    with timer.stage("summarize_history"):
+        return await asummarize_history(history)
+
+
+_kb_version = (None, None)
+
+
+def kb_version():
+    """A hash of the ingestion manifest, so cached answers are dropped whenever the knowledge base changes"""
+    global _kb_version
+    try:
+        mtime = MANIFEST_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return "unversioned"
+    if _kb_version[0] != mtime:
+        _kb_version = (mtime, hashlib.sha256(MANIFEST_PATH.read_bytes()).hexdigest())
+    return _kb_version[1]
+
+
+@traced("answer_question")
+def answer_question(question: str, history: list[dict] = []) -> tuple[str, list]:
+    """
+    Answer a question using RAG and return the answer and the retrieved context.
+    A paraphrase of a question already answered with the same history is served from the answer cache.
+    """
+    embedding = embed_queries([question])[0]
+    version = kb_version()
+    if cached := answer_cache.lookup(embedding, history, version):
+        current().set(answer_cache="hit")
+        return cached
+    chunks = fetch_context(question, embedding)
+    messages = pack_rag_messages(question, history, chunks, summarize_history(history))
+    response = generate(messages)
+    answer = response.choices[0].message.content
+    answer_cache.store(embedding, history, version, answer, chunks)
+    return answer, chunks
+
+
+@traced("answer_question")
+async def answer_question_async(question: str, history: list[dict] = []) -> tuple[str, list]:
+    """
+    Answer a question using RAG with the independent calls overlapped; prints the time spent in each stage
+    """
+    timer = StageTimer()
+    with timer.stage("answer_cache"):
+        embedding = (await asyncio.to_thread(embed_queries, [question]))[0]
+        version = kb_version()
+        cached = answer_cache.lookup(embedding, history, version)
+    if cached:
+        current().set(answer_cache="hit")
+        print(timer.report())
+        return cached
+    summarizing = asyncio.create_task(summarize_async(history, timer))
+    chunks = await fetch_context_async(question, timer, embedding)
+    messages = pack_rag_messages(question, history, chunks, await summarizing, timer)
+    with timer.stage("generate"):
+        response = await agenerate(messages)
+    answer = response.choices[0].message.content
+    answer_cache.store(embedding, history, version, answer, chunks)
+    current().set(**timer.metrics)
+    print(timer.report())
+    return answer, chunks
+
+
+@llm_retry(MODEL)
+async def agenerate_stream(messages):
+    return await acompletion(model=MODEL, messages=messages, stream=True)
+
+
+async def stream_answer(question: str, history: list[dict] = []):
+    """
+    Answer a question using RAG, streaming the result: yields ("context", chunks) as soon as reranking
+    finishes, then ("token", text) for each piece of the answer as it arrives from the model.
+    Prints the stage timings along with time to first token (ttft) and tokens/sec for the request.
+    """
+    with span("stream_answer") as request:
+        timer = StageTimer()
+        with timer.stage("answer_cache"):
+            embedding = (await asyncio.to_thread(embed_queries, [question]))[0]
+            version = kb_version()
+            cached = answer_cache.lookup(embedding, history, version)
+        if cached:
+            yield "context", cached[1]
+            yield "token", cached[0]
+            timer.metrics["ttft"] = time.perf_counter() - timer.started
+            request.set(answer_cache="hit", **timer.metrics)
+            print(timer.report())
+            return
+
+        summarizing = asyncio.create_task(summarize_async(history, timer))
+        chunks = await fetch_context_async(question, timer, embedding)
+        yield "context", chunks
+
+        messages = pack_rag_messages(question, history, chunks, await summarizing, timer)
+        answer = ""
+        tokens = 0
+        first_token = None
+        with timer.stage("generate"), span("completion", stream=True) as generation:
+            async for chunk in await agenerate_stream(messages):
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    timer.metrics["ttft"] = first_token - timer.started
+                # Each streamed delta carries roughly one token
+                tokens += 1
+                answer += delta
+                yield "token", delta
+            generation.set(prompt_tokens=timer.metrics["prompt_tokens_after"], completion_tokens=tokens)
+        if first_token is not None:
+            timer.metrics["tokens_per_sec"] = tokens / max(time.perf_counter() - first_token, 1e-6)
+        answer_cache.store(embedding, history, version, answer, chunks)
+        request.set(**timer.metrics)
+        print(timer.report())
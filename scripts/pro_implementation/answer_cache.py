@@ -0,0 +1,95 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+
+
+def history_fingerprint(history):
+    """A hash of the conversation so far; only the roles and contents matter, not any UI metadata"""
+    turns = [(message["role"], message["content"]) for message in history]
+    return hashlib.sha256(json.dumps(turns).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Entry:
+    vector: np.ndarray
+    fingerprint: str
+    kb_version: str
+    answer: str
+    chunks: list
+    size: int
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed on (question embedding, history fingerprint, knowledge base version).
+    A lookup hits when an entry with the same history and knowledge base version has a question whose
+    cosine similarity to the new one reaches the threshold, so paraphrases share an answer.
+    Least recently used entries are evicted beyond max_entries or max_bytes.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=1000, max_bytes=64 * 2**20):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.next_key = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, embedding, history, kb_version):
+        """Return (answer, chunks) for the most similar cached question above the threshold, or None"""
+        vector = self._normalize(embedding)
+        fingerprint = history_fingerprint(history)
+        with self.lock:
+            keys = [
+                key
+                for key, entry in self.entries.items()
+                if entry.fingerprint == fingerprint and entry.kb_version == kb_version
+            ]
+            if keys:
+                similarities = np.stack([self.entries[key].vector for key in keys]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.entries.move_to_end(keys[best])
+                    self.hits += 1
+                    entry = self.entries[keys[best]]
+                    return entry.answer, entry.chunks
+            self.misses += 1
+        return None
+
+    @staticmethod
+    def _without_embeddings(chunks):
+        """A reranker may have fetched each chunk's embedding; a cached answer never needs them, and they dwarf the text"""
+        return [c.model_copy(update={"embedding": None}) if getattr(c, "embedding", None) is not None else c for c in chunks]
+
+    def store(self, embedding, history, kb_version, answer, chunks):
+        vector = self._normalize(embedding)
+        chunks = self._without_embeddings(chunks)
+        size = vector.nbytes + sys.getsizeof(answer) + sum(sys.getsizeof(c.page_content) for c in chunks)
+        entry = Entry(vector, history_fingerprint(history), kb_version, answer, chunks, size)
+        with self.lock:
+            self.entries[self.next_key] = entry
+            self.next_key += 1
+            self.bytes += size
+            while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.size
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return (
+            f"Answer cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+            f"{len(self.entries)} entries, {self.bytes / 2**20:.1f} MB"
+        )
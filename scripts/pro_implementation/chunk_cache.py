@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+import time
+
+
+class ChunkCache:
+    """
+    A SQLite cache of the LLM's chunking of a document, keyed on the document text hash, the model
+    and the prompt hash, so that unchanged documents are never sent to the LLM twice.
+    Entries not used for max_age_days are evicted, then the least recently used beyond max_entries.
+    One connection is kept open for the cache's lifetime and shared by the threads that use it; close() it when done.
+    """
+
+    def __init__(self, path, max_entries=10_000, max_age_days=90):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    text_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    chunks TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (text_hash, model, prompt_hash)
+                )
+                """
+            )
+
+    def get(self, text_hash, model, prompt_hash):
+        """Return the cached chunks JSON, or None"""
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT chunks FROM chunks WHERE text_hash = ? AND model = ? AND prompt_hash = ?",
+                (text_hash, model, prompt_hash),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE chunks SET last_used = ? WHERE text_hash = ? AND model = ? AND prompt_hash = ?",
+                (time.time(), text_hash, model, prompt_hash),
+            )
+            self.hits += 1
+        return row[0]
+
+    def put(self, text_hash, model, prompt_hash, chunks):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                (text_hash, model, prompt_hash, chunks, now, now),
+            )
+
+    def evict(self):
+        """Drop the entries not used within max_age_days, then the least recently used entries over the size limit"""
+        cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+        with self.lock, self.conn:
+            expired = self.conn.execute("DELETE FROM chunks WHERE last_used < ?", (cutoff,)).rowcount
+            overflow = self.conn.execute(
+                """
+                DELETE FROM chunks WHERE rowid IN (
+                    SELECT rowid FROM chunks ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+        return expired + overflow
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return f"Chunk cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), {len(self)} entries"
@@ -0,0 +1,82 @@
+import threading
+from pathlib import Path
+from embedding_backends import EMBEDDING_BACKEND, LocalEmbeddingsClient, local_embedder
+
+
+DB_NAME = str(Path(__file__).parent.parent / "preprocessed_db")
+
+
+class RAGContext:
+    """
+    The expensive resources shared by ingestion, retrieval and the app: the OpenAI client, the embeddings
+    client, the Chroma client and the vectorstore collections. Each is created on first use rather than at import, so importing the
+    modules costs nothing, and every module holding the shared context opens the database only once.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self.numpy_index_path = Path(db_name) / "numpy_index"
+        self.lock = threading.RLock()
+        self._openai = None
+        self._chroma = None
+        self._collections = {}
+
+    @property
+    def openai(self):
+        with self.lock:
+            if self._openai is None:
+                from openai import OpenAI
+
+                self._openai = OpenAI()
+            return self._openai
+
+    @property
+    def embeddings_client(self):
+        """The OpenAI client, or with the local embedding backend the local model behind the same interface"""
+        if EMBEDDING_BACKEND == "local":
+            return LocalEmbeddingsClient(local_embedder())
+        return self.openai
+
+    @property
+    def chroma(self):
+        with self.lock:
+            if self._chroma is None:
+                from chromadb import PersistentClient
+
+                self._chroma = PersistentClient(path=self.db_name)
+            return self._chroma
+
+    def has_collection(self, backend="chroma", name="docs"):
+        if backend == "numpy":
+            return (self.numpy_index_path / "vectors.npy").exists()
+        return name in [c.name for c in self.chroma.list_collections()]
+
+    def collection(self, backend="chroma", name="docs", storage=None):
+        """
+        The vectorstore collection, opened once: a Chroma collection, or for backend "numpy" the index
+        at numpy_index_path, built with `storage` if it does not exist yet
+        """
+        with self.lock:
+            if (backend, name) not in self._collections:
+                if backend == "numpy":
+                    from pro_implementation.vector_index import NumpyCollection
+
+                    self._collections[backend, name] = NumpyCollection(self.numpy_index_path, storage)
+                else:
+                    self._collections[backend, name] = self.chroma.get_or_create_collection(name)
+            return self._collections[backend, name]
+
+    def reset_collection(self, backend="chroma", name="docs", storage=None):
+        """Drop the collection's contents and return it empty"""
+        with self.lock:
+            if backend == "numpy":
+                from pro_implementation.vector_index import delete_numpy_index
+
+                delete_numpy_index(self.numpy_index_path)
+            elif self.has_collection(backend, name):
+                self.chroma.delete_collection(name)
+            self._collections.pop((backend, name), None)
+            return self.collection(backend, name, storage)
+
+
+rag_context = RAGContext()
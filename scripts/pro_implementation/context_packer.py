@@ -0,0 +1,144 @@
+from collections import OrderedDict, defaultdict
+from functools import cache
+import tiktoken
+from pro_implementation.answer_cache import history_fingerprint
+
+
+MIN_OVERLAP_WORDS = 8
+
+
+@cache
+def encoding_for(model):
+    try:
+        return tiktoken.encoding_for_model(model.split("/")[-1])
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model):
+    return len(encoding_for(model).encode_ordinary(text))
+
+
+def count_message_tokens(messages, model):
+    # Each message costs a few tokens of framing on top of its content
+    return sum(count_tokens(message["content"] or "", model) + 4 for message in messages)
+
+
+def split_chunk(text):
+    """A chunk is headline, summary and original text separated by blank lines; returns (header, original text)"""
+    parts = text.split("\n\n", 2)
+    if len(parts) < 3:
+        return "", text
+    return "\n\n".join(parts[:2]), parts[2]
+
+
+def overlap(first, second):
+    """The number of words at the end of `first` that repeat at the start of `second`"""
+    for size in range(min(len(first), len(second)), MIN_OVERLAP_WORDS - 1, -1):
+        if first[-size:] == second[:size]:
+            return size
+    return 0
+
+
+def strip_overlap(chunks):
+    """
+    Chunking deliberately repeats about 25% of the text between neighbouring chunks of a document.
+    Once one chunk is in the prompt, drop the words it shares with each later chunk from the same source,
+    and drop a chunk altogether if nothing new is left.
+    """
+    seen = defaultdict(list)
+    stripped = []
+    for chunk in chunks:
+        header, body = split_chunk(chunk.page_content)
+        original = body.split(" ")
+        words = original
+        for previous in seen[chunk.metadata["source"]]:
+            words = words[overlap(previous, words):]
+            words = words[: len(words) - overlap(words, previous)]
+        seen[chunk.metadata["source"]].append(original)
+        if not words:
+            continue
+        if len(words) < len(original):
+            text = " ".join(words)
+            chunk = chunk.model_copy(update={"page_content": f"{header}\n\n{text}" if header else text})
+        stripped.append(chunk)
+    return stripped
+
+
+def pack_chunks(chunks, budget, model):
+    """De-overlap the chunks, then take them in rank order while they fit within the token budget"""
+    packed = []
+    used = 0
+    for chunk in strip_overlap(chunks):
+        tokens = count_tokens(chunk.page_content, model)
+        if used + tokens <= budget:
+            packed.append(chunk)
+            used += tokens
+    return packed
+
+
+class HistorySummaries:
+    """
+    Splits a conversation into older turns to be summarized and recent turns to keep verbatim, and caches
+    the rolling summary of each older prefix so that every new turn only summarizes what was added.
+    """
+
+    def __init__(self, budget, model, recent_turns=4, max_entries=1000):
+        self.budget = budget
+        self.model = model
+        self.recent_turns = recent_turns
+        self.max_entries = max_entries
+        self.summaries = OrderedDict()
+
+    def split(self, history):
+        """
+        Returns (older, recent); older is empty when the whole history fits within the budget.
+        Otherwise recent is the last recent_turns turns, fewer if they would not fit within the budget themselves,
+        and none if even the latest does not.
+        """
+        if count_message_tokens(history, self.model) <= self.budget:
+            return [], history
+        cut = len(history)
+        used = 0
+        while cut > max(len(history) - self.recent_turns, 0):
+            used += count_message_tokens(history[cut - 1 : cut], self.model)
+            if used > self.budget:
+                break
+            cut -= 1
+        return history[:cut], history[cut:]
+
+    def get(self, older):
+        key = history_fingerprint(older)
+        if key in self.summaries:
+            self.summaries.move_to_end(key)
+            return self.summaries[key]
+        return None
+
+    def put(self, older, summary):
+        self.summaries[history_fingerprint(older)] = summary
+        while len(self.summaries) > self.max_entries:
+            self.summaries.popitem(last=False)
+
+    def previous(self, older):
+        """The longest already-summarized prefix of the older turns: returns (summary or None, turns after it)"""
+        for cut in range(len(older) - 1, 0, -1):
+            if (summary := self.get(older[:cut])) is not None:
+                return summary, older[cut:]
+        return None, older
+
+
+def make_summary_messages(previous, turns):
+    conversation = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    so_far = f"Summary of the conversation so far:\n{previous}\n\n" if previous else ""
+    return [
+        {
+            "role": "user",
+            "content": f"""
+You keep a running summary of a conversation between a user and an assistant for the company Insurellm.
+{so_far}New turns of the conversation:
+{conversation}
+
+Reply with an updated summary in a few sentences, keeping names, numbers and any facts the user may refer back to.
+""",
+        }
+    ]
@@ -0,0 +1,165 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as wait_futures, FIRST_COMPLETED
+from functools import cache
+import tiktoken
+from tqdm import tqdm
+from pro_implementation.rate_limit import llm_retry
+
+
+# OpenAI accepts at most 2048 inputs and 300k tokens per embeddings request, and 8191 tokens per input
+MAX_BATCH_TOKENS = 100_000
+MAX_BATCH_INPUTS = 2048
+CONCURRENCY = 4
+# While streaming, a batch is also sent once it holds FLUSH_INPUTS inputs, or once no chunks have arrived for
+# FLUSH_IDLE_MS, so embedding overlaps chunking instead of waiting for a full token budget
+FLUSH_INPUTS = 256
+FLUSH_IDLE_MS = 250
+
+
+@cache
+def encoding():
+    # text-embedding-3-* and ada-002 all use the cl100k_base tokenizer
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(texts):
+    return [len(tokens) for tokens in encoding().encode_ordinary_batch(texts)]
+
+
+def make_batches(token_counts, max_tokens=MAX_BATCH_TOKENS, max_inputs=MAX_BATCH_INPUTS):
+    """
+    Pack consecutive inputs into batches that stay within the token and input-count budget.
+    Yields lists of indices; an input larger than the whole budget is sent on its own.
+    """
+    batch = []
+    batch_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def embed_batch(client, model, texts, dimensions=None, cache=None):
+    """
+    With dimensions, text-embedding-3 models return shortened, renormalized embeddings.
+    With an embedding cache, only the texts it does not hold yet are sent.
+    """
+    extra = {"dimensions": dimensions} if dimensions else {}
+
+    @llm_retry(model)
+    def create(texts):
+        return [e.embedding for e in client.embeddings.create(model=model, input=texts, **extra).data]
+
+    if cache is None:
+        return create(texts)
+    return cache.embed(model, dimensions, texts, create)
+
+
+def embed_into_collection(
+    collection,
+    ids,
+    texts,
+    metadatas,
+    client,
+    model,
+    max_tokens=MAX_BATCH_TOKENS,
+    max_inputs=MAX_BATCH_INPUTS,
+    concurrency=CONCURRENCY,
+    dimensions=None,
+    cache=None,
+):
+    """
+    Embed the texts in token-budgeted batches, with at most `concurrency` requests in flight,
+    and upsert each batch into the collection as soon as its embeddings arrive.
+    Only the vectors of in-flight batches are held in memory.
+    """
+    batches = make_batches(count_tokens(texts), max_tokens, max_inputs)
+    progress = tqdm(total=len(texts), desc="Embedding")
+    pending = {}
+
+    def store(future):
+        batch = pending.pop(future)
+        collection.upsert(
+            ids=[ids[i] for i in batch],
+            embeddings=future.result(),
+            documents=[texts[i] for i in batch],
+            metadatas=[metadatas[i] for i in batch],
+        )
+        progress.update(len(batch))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in batches:
+            if len(pending) >= concurrency:
+                done, _ = wait_futures(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store(future)
+            pending[pool.submit(embed_batch, client, model, [texts[i] for i in batch], dimensions, cache)] = batch
+        for future in as_completed(list(pending)):
+            store(future)
+    progress.close()
+
+
+async def embed_stream(
+    queue,
+    collection,
+    client,
+    model,
+    max_tokens=MAX_BATCH_TOKENS,
+    max_inputs=MAX_BATCH_INPUTS,
+    concurrency=CONCURRENCY,
+    dimensions=None,
+    cache=None,
+    flush_inputs=FLUSH_INPUTS,
+    idle_ms=FLUSH_IDLE_MS,
+):
+    """
+    Consume (ids, texts, metadatas) items from the queue until a None arrives, packing them into
+    token-budgeted batches and upserting each batch as soon as its embeddings arrive.
+    A batch goes out early once it holds flush_inputs inputs, or when the queue has been empty for idle_ms
+    (None to wait for a full batch), so a slow producer does not leave its chunks waiting.
+    At most `concurrency` batches are in flight; beyond that the queue is left to fill up,
+    which in turn holds back whoever is producing the chunks.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    tasks = []
+    ids, texts, metadatas, batch_tokens = [], [], [], 0
+
+    async def store(ids, texts, metadatas):
+        try:
+            vectors = await asyncio.to_thread(embed_batch, client, model, texts, dimensions, cache)
+            await asyncio.to_thread(collection.upsert, ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        finally:
+            slots.release()
+
+    async def flush():
+        nonlocal ids, texts, metadatas, batch_tokens
+        await slots.acquire()
+        tasks.append(asyncio.create_task(store(ids, texts, metadatas)))
+        ids, texts, metadatas, batch_tokens = [], [], [], 0
+
+    async def next_item():
+        if not texts or idle_ms is None:
+            return await queue.get()
+        try:
+            return await asyncio.wait_for(queue.get(), idle_ms / 1000)
+        except asyncio.TimeoutError:
+            await flush()
+            return await queue.get()
+
+    max_inputs = min(max_inputs, flush_inputs or max_inputs)
+    while (item := await next_item()) is not None:
+        for item_id, text, metadata, tokens in zip(*item, count_tokens(item[1])):
+            if texts and (batch_tokens + tokens > max_tokens or len(texts) >= max_inputs):
+                await flush()
+            ids.append(item_id)
+            texts.append(text)
+            metadatas.append(metadata)
+            batch_tokens += tokens
+    if texts:
+        await flush()
+    await asyncio.gather(*tasks)
@@ -1,30 +1,54 @@
+import argparse
+import asyncio
+import hashlib
+import inspect
+import json
+from dataclasses import asdict
 from pathlib import Path
-from openai import OpenAI
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from chromadb import PersistentClient
 from tqdm import tqdm
-from litellm import completion
-from multiprocessing import Pool
-from tenacity import retry, wait_exponential
+from bm25 import BM25Index
+from doc_loader import DocumentLoader
+import embedding_backends
+from embedding_cache import EMBEDDING_CACHE_PATH, open_cache
+from stand_in import use_stand_in
+from pro_implementation.context import rag_context
+from pro_implementation.embedder import embed_stream
+from pro_implementation.llm import completion, acompletion
+from pro_implementation.chunk_cache import ChunkCache
+from pro_implementation.rate_limit import RateLimiter, llm_retry, format_stats
+from pro_implementation.vector_index import Storage
 
 
 load_dotenv(override=True)
+# Points every OpenAI client at the local stand-in when FAKE_OPENAI_URL is set; a no-op otherwise
+use_stand_in()
 
 MODEL = "openai/gpt-4.1-nano"
 
 DB_NAME = str(Path(__file__).parent.parent / "preprocessed_db")
 collection_name = "docs"
-embedding_model = "text-embedding-3-large"
+embedding_model = embedding_backends.embedding_model()
 KNOWLEDGE_BASE_PATH = Path(__file__).parent.parent / "knowledge-base"
+MANIFEST_PATH = Path(DB_NAME) / "manifest.json"
+BM25_PATH = Path(DB_NAME) / "bm25.npz"
+# "chroma", or "numpy" for an in-process exhaustive index memory-mapped from preprocessed_db/numpy_index
+VECTOR_BACKEND = "chroma"
+# Ask for shorter embeddings (e.g. 1024 of text-embedding-3-large's 3072 dimensions); must match answer.py
+EMBEDDING_DIMENSIONS = None
+# How the numpy backend stores vectors, e.g. Storage(dimensions=512, dtype="int8", rescore=4)
+STORAGE = Storage()
+CHUNK_CACHE_PATH = Path(__file__).parent.parent / "chunk_cache.db"
 AVERAGE_CHUNK_SIZE = 100
-wait = wait_exponential(multiplier=1, min=10, max=240)
-
-
-WORKERS = 3
-
-openai = OpenAI()
 
+# If you get rate limit errors, lower the concurrency or the per-minute limits to match your account tier
+CONCURRENCY = 3
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+QUEUE_SIZE = 8
+# Documents read but not yet chunked; bounds memory while a large knowledge base streams in
+PENDING_DOCUMENTS = 32
 
 class Result(BaseModel):
     page_content: str
@@ -55,18 +79,31 @@ class Chunks(BaseModel):
 
 
 def fetch_documents():
-    """A homemade version of the LangChain DirectoryLoader"""
+    """A homemade version of the LangChain DirectoryLoader: every document in one list"""
+    loader = DocumentLoader(KNOWLEDGE_BASE_PATH)
+    documents = loader.documents()
+    print(loader.report())
+    return documents
 
-    documents = []
 
-    for folder in KNOWLEDGE_BASE_PATH.iterdir():
-        doc_type = folder.name
-        for file in folder.rglob("*.md"):
-            with open(file, "r", encoding="utf-8") as f:
-                documents.append({"type": doc_type, "source": file.as_posix(), "text": f.read()})
+async def changed_documents(loader, manifest, hashes):
+    """
+    The new or modified documents, as the loader reads them. Every document's hash is recorded in `hashes`
+    by key, so once the stream ends the documents that were removed are known too.
+    """
+    previous = manifest["documents"]
+    batches = loader.batches()
+    while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+        for document in batch:
+            key = document_key(document)
+            hashes[key] = document_hash(document)
+            if previous.get(key, {}).get("hash") != hashes[key]:
+                yield document
 
-    print(f"Loaded {len(documents)} documents")
-    return documents
+
+async def iterate(documents):
+    for document in documents:
+        yield document
 
 
 def make_prompt(document):
@@ -100,52 +137,249 @@ def make_messages(document):
     ]
 
 
-@retry(wait=wait)
+def prompt_hash():
+    """
+    Identifies everything besides the document and the model that shapes the LLM's chunking, for the chunk cache
+    key: make_prompt's code and the prompt it renders, the AVERAGE_CHUNK_SIZE it asks for and the Chunks schema
+    the reply must follow.
+    """
+    template = make_prompt({"type": "{type}", "source": "{source}", "text": "{text}"})
+    key = [inspect.getsource(make_prompt), template, AVERAGE_CHUNK_SIZE, Chunks.model_json_schema()]
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+@llm_retry(MODEL)
 def process_document(document):
     messages = make_messages(document)
     response = completion(model=MODEL, messages=messages, response_format=Chunks)
     reply = response.choices[0].message.content
-    doc_as_chunks = Chunks.model_validate_json(reply).chunks
-    return [chunk.as_result(document) for chunk in doc_as_chunks]
+    return Chunks.model_validate_json(reply)
 
 
-def create_chunks(documents):
+def estimate_tokens(document):
+    """A rough count of prompt plus completion tokens; the completion repeats the document with overlap and summaries"""
+    return (len(make_prompt(document)) + 2 * len(document["text"])) // 4
+
+
+@llm_retry(MODEL)
+async def aprocess_document(document, limiter):
+    await limiter.acquire(estimate_tokens(document))
+    messages = make_messages(document)
+    response = await acompletion(model=MODEL, messages=messages, response_format=Chunks)
+    reply = response.choices[0].message.content
+    return Chunks.model_validate_json(reply)
+
+
+async def chunk_documents(documents, queue):
     """
-    Create chunks using a number of workers in parallel.
-    If you get a rate limit error, set the WORKERS to 1.
+    Chunk the documents concurrently, putting (document, chunks) on the queue as each one completes.
+    The documents are an async iterator, consumed as they arrive, with at most PENDING_DOCUMENTS waiting.
+    At most CONCURRENCY LLM calls are in flight, within the requests and tokens per minute limits.
+    Documents whose chunking is already in the chunk cache skip the LLM entirely; the cache is read and written
+    on worker threads, so its disk I/O does not hold up the event loop.
     """
+    cache = ChunkCache(CHUNK_CACHE_PATH)
+    prompt = prompt_hash()
+    limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def chunk(document):
+        cached = await asyncio.to_thread(cache.get, document_hash(document), MODEL, prompt)
+        if cached is None:
+            async with semaphore:
+                doc_chunks = await aprocess_document(document, limiter)
+            await asyncio.to_thread(cache.put, document_hash(document), MODEL, prompt, doc_chunks.model_dump_json())
+        else:
+            doc_chunks = Chunks.model_validate_json(cached)
+        await queue.put((document, [chunk.as_result(document) for chunk in doc_chunks.chunks]))
+
+    progress = tqdm(desc="Chunking")
+    pending = set()
+
+    async def settle(return_when):
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        for task in done:
+            task.result()
+        progress.update(len(done))
+
+    try:
+        async for document in documents:
+            if len(pending) >= PENDING_DOCUMENTS:
+                await settle(asyncio.FIRST_COMPLETED)
+            pending.add(asyncio.create_task(chunk(document)))
+        if pending:
+            await settle(asyncio.ALL_COMPLETED)
+        progress.close()
+
+        await asyncio.to_thread(cache.evict)
+        print(cache.report())
+    finally:
+        cache.close()
+
+
+def create_chunks(documents):
+    """Create chunks for all the documents and return them in one list"""
+    queue = asyncio.Queue()
+    asyncio.run(chunk_documents(iterate(documents), queue))
     chunks = []
-    with Pool(processes=WORKERS) as pool:
-        for result in tqdm(pool.imap_unordered(process_document, documents), total=len(documents)):
-            chunks.extend(result)
+    while not queue.empty():
+        chunks.extend(queue.get_nowait()[1])
     return chunks
 
 
-def create_embeddings(chunks):
-    chroma = PersistentClient(path=DB_NAME)
-    if collection_name in [c.name for c in chroma.list_collections()]:
-        chroma.delete_collection(collection_name)
+def document_key(document):
+    """The document's path relative to the knowledge base, used as its stable identity"""
+    return Path(document["source"]).relative_to(KNOWLEDGE_BASE_PATH.as_posix()).as_posix()
 
-    texts = [chunk.page_content for chunk in chunks]
-    emb = openai.embeddings.create(model=embedding_model, input=texts).data
-    vectors = [e.embedding for e in emb]
 
-    collection = chroma.get_or_create_collection(collection_name)
+def document_hash(document):
+    return hashlib.sha256(document["text"].encode("utf-8")).hexdigest()
 
-    ids = [str(i) for i in range(len(chunks))]
-    metas = [chunk.metadata for chunk in chunks]
 
-    collection.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metas)
-    print(f"Vectorstore created with {collection.count()} documents")
+def chunk_id(key, position):
+    return f"{key}#{position}"
 
 
-def run_ingestion():
-    documents = fetch_documents()
-    chunks = create_chunks(documents)
-    create_embeddings(chunks)
+def load_manifest():
+    if not MANIFEST_PATH.exists():
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("model") != MODEL or manifest.get("embedding_model") != embedding_model:
+        return None
+    if manifest.get("storage") != storage_config():
+        return None
+    return manifest
+
+
+def storage_config():
+    """The settings that change the stored vectors; changing any of them forces a full rebuild"""
+    config = {"embedding_dimensions": EMBEDDING_DIMENSIONS}
+    if VECTOR_BACKEND == "numpy":
+        config.update(asdict(STORAGE))
+    return config
+
+
+def save_manifest(documents):
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    manifest = {"model": MODEL, "embedding_model": embedding_model, "storage": storage_config(), "documents": documents}
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def delete_document_chunks(collection, keys, manifest):
+    ids = [chunk_id(key, i) for key in keys for i in range(manifest["documents"][key]["chunks"])]
+    if ids:
+        collection.delete(ids=ids)
+
+
+def delete_stale_chunks(collection, counts, manifest):
+    """Delete the chunks of re-chunked documents beyond their new count; the rest were overwritten in place"""
+    ids = [
+        chunk_id(key, i)
+        for key, count in counts.items()
+        if key in manifest["documents"]
+        for i in range(count, manifest["documents"][key]["chunks"])
+    ]
+    if ids:
+        collection.delete(ids=ids)
+
+
+async def ingest_documents(documents, collection, manifest):
+    """
+    Stream the documents, an async iterator, through chunking and embedding: each document's chunks pass
+    through a bounded queue to the embedding stage as soon as they are ready, and are upserted over that
+    document's previous vectors. Only once every new chunk is stored are the old ones beyond the new count
+    deleted, so a failed run never leaves a document without its vectors.
+    Chunks whose text is already in the embedding cache are not sent to the embeddings API again.
+    Returns the number of chunks for each document key.
+    """
+    chunked = asyncio.Queue(maxsize=QUEUE_SIZE)
+    embeddable = asyncio.Queue(maxsize=QUEUE_SIZE)
+    counts = {}
+
+    async def produce():
+        await chunk_documents(documents, chunked)
+        await chunked.put(None)
+
+    async def relay():
+        while (item := await chunked.get()) is not None:
+            document, chunks = item
+            key = document_key(document)
+            counts[key] = len(chunks)
+            ids = [chunk_id(key, i) for i in range(len(chunks))]
+            await embeddable.put((ids, [c.page_content for c in chunks], [c.metadata for c in chunks]))
+        await embeddable.put(None)
+
+    cache = open_cache(EMBEDDING_CACHE_PATH)
+    try:
+        await asyncio.gather(
+            produce(),
+            relay(),
+            embed_stream(embeddable, collection, rag_context.embeddings_client, embedding_model, dimensions=EMBEDDING_DIMENSIONS, cache=cache),
+        )
+        await asyncio.to_thread(delete_stale_chunks, collection, counts, manifest)
+        if cache is not None:
+            cache.evict()
+            print(cache.report())
+    finally:
+        if cache is not None:
+            cache.close()
+    return counts
+
+
+def build_sparse_index(collection):
+    """Rebuild the BM25 index over every chunk in the vectorstore, so the two always hold the same chunks"""
+    stored = collection.get(include=["documents"])
+    BM25Index.build(stored["ids"], stored["documents"]).save(BM25_PATH)
+
+
+def run_ingestion(incremental=True):
+    """
+    Chunk and embed the knowledge base into the vectorstore.
+    In incremental mode only new or modified documents are re-chunked and re-embedded, and the vectors
+    of removed documents are deleted; otherwise the collection is rebuilt from scratch.
+    """
+    exists = rag_context.has_collection(VECTOR_BACKEND, collection_name)
+    manifest = load_manifest() if incremental and exists else None
+
+    if manifest is None:
+        collection = rag_context.reset_collection(VECTOR_BACKEND, collection_name, STORAGE)
+        manifest = {"documents": {}}
+    else:
+        collection = rag_context.collection(VECTOR_BACKEND, collection_name)
+
+    # Chunking and embedding start on the first changed document while the rest are still being read
+    loader = DocumentLoader(KNOWLEDGE_BASE_PATH)
+    hashes = {}
+    counts = asyncio.run(ingest_documents(changed_documents(loader, manifest, hashes), collection, manifest))
+    print(loader.report())
+    removed = [key for key in manifest["documents"] if key not in hashes]
+    if not counts and not removed:
+        if not BM25_PATH.exists():
+            build_sparse_index(collection)
+        print(f"Knowledge base unchanged; vectorstore has {collection.count()} documents")
+        return
+
+    print(f"{len(counts)} new or modified documents, {len(removed)} removed documents")
+    delete_document_chunks(collection, removed, manifest)
+    if VECTOR_BACKEND == "numpy":
+        collection.flush()
+
+    entries = {key: value for key, value in manifest["documents"].items() if key not in removed}
+    for key, count in counts.items():
+        entries[key] = {"hash": hashes[key], "chunks": count}
+    build_sparse_index(collection)
+    save_manifest(entries)
+
+    print(f"Vectorstore updated with {collection.count()} documents")
+    print(format_stats())
     print("Ingestion complete")
 
 
 if __name__ == "__main__":
-    run_ingestion()
-
+    parser = argparse.ArgumentParser(description="Ingest the knowledge base into the vectorstore")
+    parser.add_argument("--full", action="store_true", help="rebuild the collection from scratch")
+    args = parser.parse_args()
+    run_ingestion(incremental=not args.full)
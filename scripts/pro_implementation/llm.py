@@ -0,0 +1,16 @@
+"""
+litellm takes seconds to import, so it is imported on the first call rather than when the modules that
+use it are loaded.
+"""
+
+
+def completion(**kwargs):
+    from litellm import completion
+
+    return completion(**kwargs)
+
+
+async def acompletion(**kwargs):
+    from litellm import acompletion
+
+    return await acompletion(**kwargs)
@@ -0,0 +1,118 @@
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+def normalize(text):
+    """Case and whitespace differences should not cost an embeddings call"""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    An in-process LRU of query embeddings keyed on the normalized query text and the embedding model.
+    Entries expire after ttl seconds; beyond max_size the least recently used is dropped.
+    With a path, entries are also written to SQLite so they survive restarts and are shared between processes;
+    one connection is kept open for the cache's lifetime, so close() it when done.
+    """
+
+    def __init__(self, max_size=2048, ttl=24 * 60 * 60, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = str(path) if path else None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = None
+        # Disk lookups take their own lock, so in-memory hits never wait on SQLite
+        self.db_lock = threading.Lock()
+        if self.path:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            with self.db_lock, self.conn:
+                self.conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS query_embeddings (
+                        query TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        created REAL NOT NULL,
+                        PRIMARY KEY (query, model)
+                    )
+                    """
+                )
+                self.conn.execute("DELETE FROM query_embeddings WHERE created < ?", (time.time() - ttl,))
+
+    def get(self, text, model, count=True):
+        """The cached vector or None; count=False for a repeat lookup that should not move the hit rate"""
+        key = (normalize(text), model)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += count
+                return entry[0]
+            self.entries.pop(key, None)
+        entry = self._load(key, now)
+        with self.lock:
+            if entry is None:
+                self.misses += count
+                return None
+            self.hits += count
+            self._remember(key, entry)
+        return entry[0]
+
+    def put(self, text, model, vector):
+        key = (normalize(text), model)
+        entry = (vector, time.time())
+        with self.lock:
+            self._remember(key, entry)
+        if self.conn:
+            with self.db_lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], array("f", vector).tobytes(), entry[1]),
+                )
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def _load(self, key, now):
+        if not self.conn:
+            return None
+        with self.db_lock:
+            row = self.conn.execute(
+                "SELECT vector, created FROM query_embeddings WHERE query = ? AND model = ? AND created > ?",
+                (key[0], key[1], now - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        return array("f", row[0]).tolist(), row[1]
+
+    def close(self):
+        if self.conn:
+            with self.db_lock:
+                self.conn.close()
+                self.conn = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.entries),
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (
+            f"Query embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['size']} entries"
+        )
@@ -0,0 +1,242 @@
+import asyncio
+import email.utils
+import inspect
+import random
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+from tenacity import retry, retry_if_exception, stop_after_attempt
+from tracing import current
+
+
+MAX_ATTEMPTS = 5
+BASE_WAIT = 0.25
+MAX_WAIT = 8.0
+MAX_RETRY_AFTER = 60.0
+FAILURE_THRESHOLD = 5
+RESET_AFTER = 30.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously at rate_per_minute, holding at most one minute's worth.
+    acquire() waits until the requested amount is available, then takes it.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.available = rate_per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+
+
+class RateLimiter:
+    """Keep LLM calls within both a requests-per-minute and a tokens-per-minute budget"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the model while its circuit breaker is open"""
+
+
+def is_retryable(exception):
+    """Only transient failures are worth retrying; bad requests and unparseable replies fail straight away"""
+    from openai import APIConnectionError, APIStatusError, APITimeoutError, InternalServerError, RateLimitError
+
+    if isinstance(exception, (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)):
+        return True
+    return isinstance(exception, APIStatusError) and exception.status_code in RETRYABLE_STATUS
+
+
+def retry_after(exception):
+    """The server's requested delay in seconds, from Retry-After-Ms or Retry-After headers, if any"""
+    response = getattr(exception, "response", None)
+    headers = getattr(response, "headers", None) or getattr(exception, "litellm_response_headers", None) or {}
+    if value := headers.get("retry-after-ms"):
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    if value := headers.get("retry-after"):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def backoff(retry_state):
+    """Honor Retry-After when the server sends it, otherwise full-jitter exponential backoff in milliseconds"""
+    delay = retry_after(retry_state.outcome.exception())
+    if delay is not None:
+        return min(delay, MAX_RETRY_AFTER)
+    return random.uniform(0, min(MAX_WAIT, BASE_WAIT * 2 ** (retry_state.attempt_number - 1)))
+
+
+@dataclass
+class RetryStats:
+    calls: int = 0
+    retries: int = 0
+    waited: float = 0.0
+    failures: int = 0
+    rejected: int = 0
+
+
+class CircuitBreaker:
+    """
+    Opens after FAILURE_THRESHOLD consecutive calls that still failed with a retryable error once their retries
+    ran out, rejecting calls for RESET_AFTER seconds, then lets a single trial call through: success closes it
+    again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_after=RESET_AFTER):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened is None:
+                return True
+            if time.monotonic() - self.opened >= self.reset_after:
+                self.opened = time.monotonic()
+                return True
+            return False
+
+    def record(self, success):
+        with self.lock:
+            if success:
+                self.failures = 0
+                self.opened = None
+            else:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.opened = time.monotonic()
+
+
+breakers = {}
+stats = {}
+_lock = threading.Lock()
+
+
+def llm_retry(model, attempts=MAX_ATTEMPTS):
+    """
+    Decorate a sync or async function that calls `model`: retryable errors are retried up to `attempts`
+    times with backoff, and attempts, retries and time spent waiting are counted in stats[model].
+    Each call, retries included, goes through the model's circuit breaker once, and only counts against it
+    as a failure when its last attempt fails.
+    """
+    breaker = breakers.setdefault(model, CircuitBreaker())
+    counters = stats.setdefault(model, RetryStats())
+
+    def check():
+        if not breaker.allow():
+            with _lock:
+                counters.rejected += 1
+            raise CircuitOpenError(f"Circuit breaker for {model} is open after repeated failures")
+
+    def attempted():
+        with _lock:
+            counters.calls += 1
+
+    def failed(exception):
+        if is_retryable(exception):
+            breaker.record(success=False)
+            with _lock:
+                counters.failures += 1
+
+    def sleeping(retry_state):
+        with _lock:
+            counters.retries += 1
+            counters.waited += retry_state.next_action.sleep
+        current().add("retries")
+
+    def with_retries(fn):
+        return retry(
+            retry=retry_if_exception(is_retryable),
+            wait=backoff,
+            stop=stop_after_attempt(attempts),
+            before_sleep=sleeping,
+            reraise=True,
+        )(fn)
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @with_retries
+            async def attempt(*args, **kwargs):
+                attempted()
+                return await fn(*args, **kwargs)
+
+            @wraps(fn)
+            async def guarded(*args, **kwargs):
+                check()
+                try:
+                    result = await attempt(*args, **kwargs)
+                except Exception as e:
+                    failed(e)
+                    raise
+                breaker.record(success=True)
+                return result
+
+        else:
+
+            @with_retries
+            def attempt(*args, **kwargs):
+                attempted()
+                return fn(*args, **kwargs)
+
+            @wraps(fn)
+            def guarded(*args, **kwargs):
+                check()
+                try:
+                    result = attempt(*args, **kwargs)
+                except Exception as e:
+                    failed(e)
+                    raise
+                breaker.record(success=True)
+                return result
+
+        return guarded
+
+    return decorator
+
+
+def format_stats():
+    lines = []
+    for model, counters in stats.items():
+        lines.append(
+            f"{model}: {counters.calls} attempts, {counters.retries} retries, {counters.waited:.2f}s waiting, "
+            f"{counters.failures} failures, {counters.rejected} rejected by the circuit breaker"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,135 @@
+import asyncio
+import numpy as np
+from pydantic import BaseModel, Field
+from pro_implementation.llm import completion, acompletion
+from pro_implementation.rate_limit import llm_retry
+from tracing import record_usage
+
+
+class RankOrder(BaseModel):
+    order: list[int] = Field(
+        description="The order of relevance of chunks, from most relevant to least relevant, by chunk id number"
+    )
+
+
+def make_rerank_messages(question, chunks):
+    system_prompt = """
+You are a document re-ranker.
+You are provided with a question and a list of relevant chunks of text from a query of a knowledge base.
+The chunks are provided in the order they were retrieved; this should be approximately ordered by relevance, but you may be able to improve on that.
+You must rank order the provided chunks by relevance to the question, with the most relevant chunk first.
+Reply only with the list of ranked chunk ids, nothing else. Include all the chunk ids you are provided with, reranked.
+"""
+    user_prompt = f"The user has asked the following question:\n\n{question}\n\nOrder all the chunks of text by relevance to the question, from most relevant to least relevant. Include all the chunk ids you are provided with, reranked.\n\n"
+    user_prompt += "Here are the chunks:\n\n"
+    for index, chunk in enumerate(chunks):
+        user_prompt += f"# CHUNK ID: {index + 1}:\n\n{chunk.page_content}\n\n"
+    user_prompt += "Reply only with the list of ranked chunk ids, nothing else."
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def apply_order(order, chunks):
+    """
+    Reorder the chunks by the model's 1-based ids. Ids that are out of range or repeated are ignored,
+    and any chunk the model left out keeps its retrieval order after the ranked ones.
+    """
+    seen = set()
+    ranked = []
+    for i in order:
+        if 1 <= i <= len(chunks) and i not in seen:
+            seen.add(i)
+            ranked.append(chunks[i - 1])
+    return ranked + [chunk for i, chunk in enumerate(chunks, start=1) if i not in seen]
+
+
+class Reranker:
+    """Orders retrieved chunks by relevance to the question, most relevant first"""
+
+    needs_embeddings = False
+
+    def rerank(self, question, chunks):
+        raise NotImplementedError
+
+    async def arerank(self, question, chunks):
+        return await asyncio.to_thread(self.rerank, question, chunks)
+
+
+class NoReranker(Reranker):
+    """Keeps the retrieval order, as a baseline"""
+
+    def rerank(self, question, chunks):
+        return chunks
+
+    async def arerank(self, question, chunks):
+        return chunks
+
+
+class LLMReranker(Reranker):
+    """Asks the LLM for a structured RankOrder over all the chunks in one prompt"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def rerank(self, question, chunks):
+        @llm_retry(self.model)
+        def order():
+            response = completion(model=self.model, messages=make_rerank_messages(question, chunks), response_format=RankOrder)
+            record_usage(response)
+            return RankOrder.model_validate_json(response.choices[0].message.content).order
+
+        return apply_order(order(), chunks)
+
+    async def arerank(self, question, chunks):
+        @llm_retry(self.model)
+        async def order():
+            response = await acompletion(model=self.model, messages=make_rerank_messages(question, chunks), response_format=RankOrder)
+            record_usage(response)
+            return RankOrder.model_validate_json(response.choices[0].message.content).order
+
+        return apply_order(await order(), chunks)
+
+
+class CrossEncoderReranker(Reranker):
+    """Scores (question, chunk) pairs with a local sentence-transformers CrossEncoder on the CPU, in batches"""
+
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size=32):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def rerank(self, question, chunks):
+        if not chunks:
+            return []
+        pairs = [(question, chunk.page_content) for chunk in chunks]
+        scores = self.model.predict(pairs, batch_size=self.batch_size)
+        return [chunk for _, chunk in sorted(zip(scores, chunks), key=lambda pair: -pair[0])]
+
+
+class CosineReranker(Reranker):
+    """
+    Re-scores every candidate against the original question's embedding, using the chunk embeddings
+    that were fetched along with the chunks; no extra model calls when the query embedding is cached.
+    """
+
+    needs_embeddings = True
+
+    def __init__(self, embed):
+        self.embed = embed
+
+    def rerank(self, question, chunks):
+        if not chunks:
+            return chunks
+        if missing := sum(chunk.embedding is None for chunk in chunks):
+            # The chunks were fetched without their embeddings, so there is nothing to re-score
+            print(f"Cosine reranker: {missing} of {len(chunks)} chunks have no embedding, keeping the retrieval order")
+            return chunks
+        query = np.asarray(self.embed(question), dtype=np.float32)
+        vectors = np.asarray([chunk.embedding for chunk in chunks], dtype=np.float32)
+        # Vectors stored truncated are a prefix of the full embedding, so compare on that prefix
+        query = query[: vectors.shape[1]]
+        scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12)
+        return [chunks[i] for i in np.argsort(-scores, kind="stable")]
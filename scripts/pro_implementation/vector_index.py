@@ -0,0 +1,313 @@
+import json
+import os
+import shutil
+import threading
+from dataclasses import asdict, dataclass
+from itertools import compress
+from pathlib import Path
+import numpy as np
+
+# Rows dequantized at a time during a search, bounding the float32 working copy of a compact matrix
+BLOCK_ROWS = 65536
+
+
+@dataclass(frozen=True)
+class Storage:
+    """
+    How a NumpyCollection stores its vectors: truncated to the first `dimensions` components and
+    renormalized (text-embedding-3 embeddings are Matryoshka-trained, so their prefixes are usable
+    embeddings), as float32, float16 or int8 with a scale per vector. With rescore > 0 the full
+    float32 vectors are kept on disk too, and the top k * rescore candidates are re-ranked against them.
+    """
+
+    dimensions: int | None = None
+    dtype: str = "float32"
+    rescore: int = 0
+
+
+def truncate(vectors, dimensions):
+    if dimensions is None or dimensions >= vectors.shape[1]:
+        return vectors
+    vectors = vectors[:, :dimensions]
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def quantize(vectors, dtype):
+    """Returns (stored vectors, scales); scales is None unless the vectors are int8"""
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(dtype), None
+
+
+class NumpyCollection:
+    """
+    An in-process alternative to a Chroma collection for corpora small enough to search exhaustively.
+    The embeddings are one contiguous matrix in vectors.npy, memory-mapped on open, with their squared
+    norms in norms.npy and the ids, documents and metadata as columns in metadata.json, along with the
+    Storage the index was built with. The full float32 vectors for rescoring, when kept, are in full.npy.
+    It implements the parts of the Chroma collection API that ingestion and retrieval use, returning
+    squared L2 distances like Chroma's default space, and equality `where` filters on the metadata, for which
+    only the matching rows are scanned. Writes stay in memory until flush(); upserted batches and deletions
+    are only collected, and applied to the matrices in one pass before the next read, so ingesting n chunks in
+    batches copies the matrix once rather than once per batch.
+    A collection with no unflushed writes re-opens the index when another process has flushed it since, so a
+    running app searches the vectors of the latest ingest.
+    """
+
+    def __init__(self, path, storage=None):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.storage = storage or Storage()
+        self._load()
+
+    def _load(self):
+        self.dirty = False
+        self.full = self.scales = None
+        # Batches upserted and rows deleted since the matrices were last consolidated
+        self.pending = []
+        self.removed = set()
+        self.stamp = self._stamp()
+        if self.stamp is not None:
+            with open(self.path / "metadata.json", "r", encoding="utf-8") as f:
+                columns = json.load(f)
+            self.storage = Storage(**columns.get("storage", {}))
+            self._open()
+            self.ids = columns["ids"]
+            self.documents = columns["documents"]
+            self.metadatas = [
+                {key: values[i] for key, values in columns["metadatas"].items() if values[i] is not None}
+                for i in range(len(self.ids))
+            ]
+        else:
+            self.vectors = None
+            self.norms = np.empty(0, dtype=np.float32)
+            self.ids, self.documents, self.metadatas = [], [], []
+        self.positions = {id: i for i, id in enumerate(self.ids)}
+        self.partitions = {}
+
+    def _stamp(self):
+        """Identifies the flushed index on disk: metadata.json is replaced last on every flush"""
+        try:
+            stat = (self.path / "metadata.json").stat()
+        except FileNotFoundError:
+            return None
+        if not (self.path / "vectors.npy").exists():
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _refresh(self):
+        """Bring the matrices up to date before a read: re-open a newer index on disk, or apply pending writes"""
+        if not self.dirty and self._stamp() != self.stamp:
+            self._load()
+        self._consolidate()
+
+    def _open(self):
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.norms = np.load(self.path / "norms.npy", mmap_mode="r")
+        if (self.path / "scales.npy").exists():
+            self.scales = np.load(self.path / "scales.npy")
+        if (self.path / "full.npy").exists():
+            self.full = np.load(self.path / "full.npy", mmap_mode="r")
+
+    def count(self):
+        return len(self.positions)
+
+    def nbytes(self):
+        """Bytes of vector data searched on every query; the full vectors for rescoring are read only per candidate"""
+        arrays = [self.vectors, self.norms, self.scales]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def _dequantize(self, rows):
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        return vectors if self.scales is None else vectors * self.scales[rows, None]
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        full = np.asarray(embeddings, dtype=np.float32)
+        compact, scales = quantize(truncate(full, self.storage.dimensions), self.storage.dtype)
+        dequantized = compact.astype(np.float32) if scales is None else compact * scales[:, None]
+        norms = np.einsum("ij,ij->i", dequantized, dequantized)
+        with self.lock:
+            self._remove([id for id in ids if id in self.positions])
+            start = len(self.ids)
+            self.pending.append((compact, scales, full if self.storage.rescore else None, norms))
+            self.ids.extend(ids)
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas)
+            self.positions.update({id: start + i for i, id in enumerate(ids)})
+            self.partitions = {}
+            self.dirty = True
+
+    add = upsert
+
+    def delete(self, ids):
+        with self.lock:
+            self._remove([id for id in ids if id in self.positions])
+
+    def _remove(self, ids):
+        """Mark the rows of the ids deleted; they are dropped from the matrices by the next _consolidate"""
+        if not ids:
+            return
+        self.removed.update(self.positions.pop(id) for id in ids)
+        self.partitions = {}
+        self.dirty = True
+
+    def _consolidate(self):
+        """Append the pending batches to the matrices and drop the deleted rows, each with one copy"""
+        if self.pending:
+            batches = list(zip(*self.pending))
+            existing = self.vectors is not None and len(self.vectors) > 0
+
+            def extend(array, parts):
+                return np.concatenate(([array] if existing else []) + list(parts))
+
+            self.vectors = extend(self.vectors, batches[0])
+            if batches[1][0] is not None:
+                self.scales = extend(self.scales, batches[1])
+            if self.storage.rescore:
+                self.full = extend(self.full, batches[2])
+            self.norms = extend(self.norms, batches[3])
+            self.pending = []
+        if self.removed:
+            keep = np.ones(len(self.ids), dtype=bool)
+            keep[np.fromiter(self.removed, dtype=np.int64)] = False
+            self.vectors = self.vectors[keep]
+            self.norms = self.norms[keep]
+            if self.scales is not None:
+                self.scales = self.scales[keep]
+            if self.full is not None:
+                self.full = self.full[keep]
+            self.ids = list(compress(self.ids, keep))
+            self.documents = list(compress(self.documents, keep))
+            self.metadatas = list(compress(self.metadatas, keep))
+            self.positions = {id: i for i, id in enumerate(self.ids)}
+            self.removed = set()
+
+    def partition(self, where):
+        """The rows whose metadata matches an equality filter such as {"type": "employees"}, cached until a write"""
+        key = tuple(sorted(where.items()))
+        if key not in self.partitions:
+            self.partitions[key] = np.array(
+                [i for i, metadata in enumerate(self.metadatas) if all(metadata.get(k) == v for k, v in where.items())],
+                dtype=np.int64,
+            )
+        return self.partitions[key]
+
+    def _dots(self, queries, rows=None):
+        """
+        Dot products of the queries with every stored vector, or only those in `rows`,
+        converting BLOCK_ROWS at a time to float32
+        """
+        count = self.count() if rows is None else len(rows)
+        dots = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, BLOCK_ROWS):
+            block = self.vectors[start : start + BLOCK_ROWS] if rows is None else self.vectors[rows[start : start + BLOCK_ROWS]]
+            dots[:, start : start + BLOCK_ROWS] = queries @ block.astype(np.float32, copy=False).T
+        if self.scales is not None:
+            dots *= self.scales if rows is None else self.scales[rows]
+        return dots
+
+    def search(self, queries, k, rows=None):
+        """
+        Exhaustive search for a batch of queries in one pass over the matrix, or over just the given rows:
+        returns (indices, distances), each of shape (queries, k), nearest first.
+        With rescoring the candidates' distances are exact.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        count = self.count() if rows is None else len(rows)
+        k = min(k, count)
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty
+        compact = truncate(queries, self.storage.dimensions)
+        candidates = min(count, k * self.storage.rescore) if self.full is not None else k
+        norms = self.norms if rows is None else self.norms[rows]
+        distances = norms[None, :] - 2 * self._dots(compact, rows)
+        top = np.argpartition(distances, candidates - 1, axis=1)[:, :candidates]
+        distances = np.take_along_axis(distances, top, axis=1)
+        if rows is not None:
+            top = rows[top]
+        if self.full is not None:
+            vectors = np.asarray(self.full[top.ravel()]).reshape(*top.shape, -1)
+            distances = np.square(vectors - queries[:, None, :]).sum(axis=2)
+        else:
+            # The query norm is the same for every candidate, so it is only added to the winners
+            distances = distances + np.einsum("ij,ij->i", compact, compact)[:, None]
+        order = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(top, order, axis=1), np.maximum(np.take_along_axis(distances, order, axis=1), 0.0)
+
+    def _embeddings(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        return np.asarray(self.full[rows]) if self.full is not None else self._dequantize(rows)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances"), where=None):
+        with self.lock:
+            self._refresh()
+            rows = None if where is None else self.partition(where)
+            indices, distances = self.search(query_embeddings, n_results, rows)
+            results = {"ids": [[self.ids[i] for i in row] for row in indices]}
+            if "documents" in include:
+                results["documents"] = [[self.documents[i] for i in row] for row in indices]
+            if "metadatas" in include:
+                results["metadatas"] = [[self.metadatas[i] for i in row] for row in indices]
+            if "distances" in include:
+                results["distances"] = distances.tolist()
+            if "embeddings" in include:
+                results["embeddings"] = [self._embeddings(row) for row in indices]
+        return results
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        with self.lock:
+            self._refresh()
+            positions = range(len(self.ids)) if ids is None else [self.positions[id] for id in ids if id in self.positions]
+            results = {"ids": [self.ids[i] for i in positions]}
+            if "documents" in include:
+                results["documents"] = [self.documents[i] for i in positions]
+            if "metadatas" in include:
+                results["metadatas"] = [self.metadatas[i] for i in positions]
+            if "embeddings" in include:
+                results["embeddings"] = self._embeddings(list(positions)) if positions else []
+        return results
+
+    def flush(self):
+        """Write the index to disk and re-open the matrices memory-mapped"""
+        with self.lock:
+            if not self.dirty:
+                return
+            self._consolidate()
+            self.path.mkdir(parents=True, exist_ok=True)
+            keys = sorted({key for metadata in self.metadatas for key in metadata})
+            columns = {
+                "storage": asdict(self.storage),
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": {key: [metadata.get(key) for metadata in self.metadatas] for key in keys},
+            }
+            dtype = np.dtype(self.storage.dtype)
+            arrays = {
+                "vectors": np.empty((0, 0), dtype=dtype) if self.vectors is None else self.vectors,
+                "norms": self.norms,
+                "scales": self.scales,
+                "full": self.full,
+            }
+            for name, array in arrays.items():
+                if array is not None:
+                    np.save(self.path / f"{name}.tmp.npy", np.ascontiguousarray(array))
+            with open(self.path / "metadata.tmp.json", "w", encoding="utf-8") as f:
+                json.dump(columns, f)
+            for name, array in arrays.items():
+                if array is not None:
+                    os.replace(self.path / f"{name}.tmp.npy", self.path / f"{name}.npy")
+            os.replace(self.path / "metadata.tmp.json", self.path / "metadata.json")
+            self._open()
+            self.stamp = self._stamp()
+            self.dirty = False
+
+
+def numpy_index_exists(path):
+    return (Path(path) / "vectors.npy").exists()
+
+
+def delete_numpy_index(path):
+    shutil.rmtree(path, ignore_errors=True)
@@ -1,9 +1,25 @@
+import argparse
 import gradio as gr
 from dotenv import load_dotenv
 from pro_implementation.ingest import run_ingestion
+from stand_in import use_stand_in
 
 load_dotenv(override=True)
-answer_question = None
+# Points every OpenAI client at the local stand-in when FAKE_OPENAI_URL is set; a no-op otherwise
+use_stand_in()
+
+# How many chats are answered at once; with Gradio's default of 1, every user waits for the one before
+CONCURRENCY_LIMIT = 16
+CONTEXT_PLACEHOLDER = "*Retrieved context will appear here*"
+
+
+class ChatSession:
+    """One browser session's conversation, and the context retrieved for its latest question"""
+
+    def __init__(self):
+        self.history = []
+        self.context = CONTEXT_PLACEHOLDER
+
 
 def format_context(context):
     result = "<h2 style='color: #ff7800;'>Relevant Context</h2>\n\n"
@@ -13,55 +29,35 @@ def format_context(context):
     return result
 
 
-def chat(history):
-    global answer_question
-    last_message = history[-1]["content"]
-    prior = history[:-1]
-
-    answer, context = answer_question(last_message, prior)
-    history.append({"role": "assistant", "content": answer})
-    return history, format_context(context)
-
-
-def main():
-    from chromadb import PersistentClient
-    from pathlib import Path
+def build_ui(stream_answer, concurrency_limit=CONCURRENCY_LIMIT):
+    """The chat app, answering with stream_answer(question, history), an async generator like answer.stream_answer"""
 
-    DB_NAME = str(Path(__file__).parent / "preprocessed_db")
-    collection_name = "docs"
-
-    chroma = PersistentClient(path=DB_NAME)
-    existing_collections = {c.name for c in chroma.list_collections()}
-
-    should_ingest = True
-    if collection_name in existing_collections:
+    async def chat(message, session):
+        prior = list(session.history)
+        session.history += [{"role": "user", "content": message}, {"role": "assistant", "content": ""}]
+        session.context = "*Retrieving context...*"
+        yield "", session.history, session.context, session
         try:
-            collection = chroma.get_collection(collection_name)
-            if collection.count() > 0:
-                should_ingest = False
-        except Exception:
-            should_ingest = True
-
-    if should_ingest:
-        print("Starting knowledge base ingestion...")
-        run_ingestion()
-        print("Ingestion finished.")
-    else:
-        print("Existing vector DB found. Skipping ingestion.")
-
-    print("Launching UI...")
-
-    from pro_implementation.answer import answer_question as _answer_question
-    global answer_question
-    answer_question = _answer_question
-
-    def put_message_in_chatbot(message, history):
-        return "", history + [{"role": "user", "content": message}]
+            async for kind, value in stream_answer(message, prior):
+                if kind == "context":
+                    session.context = format_context(value)
+                else:
+                    session.history[-1]["content"] += value
+                yield "", session.history, session.context, session
+        except BaseException as e:
+            # A failed or cancelled turn is dropped, so later questions are not sent with an empty answer
+            session.history = prior
+            session.context = CONTEXT_PLACEHOLDER
+            if isinstance(e, Exception):
+                raise gr.Error(f"Could not answer: {e}") from e
+            raise
 
     theme = gr.themes.Soft(font=["Inter", "system-ui", "sans-serif"])
 
     with gr.Blocks(title="Insurellm Expert Assistant", theme=theme) as ui:
         gr.Markdown("# 🏢 Insurellm Expert Assistant\nAsk me anything about Insurellm!")
+        # Every browser session gets its own deep copy of the initial value
+        session = gr.State(ChatSession())
 
         with gr.Row():
             with gr.Column(scale=1):
@@ -78,22 +74,39 @@ def main():
 
             with gr.Column(scale=1):
                 context_markdown = gr.Markdown(
-                    value="*Retrieved context will appear here*",
+                    value=CONTEXT_PLACEHOLDER,
                     container=True,
                     height=600,
                 )
 
         message.submit(
-            put_message_in_chatbot,
-            inputs=[message, chatbot],
-            outputs=[message, chatbot],
-        ).then(
             chat,
-            inputs=chatbot,
-            outputs=[chatbot, context_markdown],
+            inputs=[message, session],
+            outputs=[message, chatbot, context_markdown, session],
+            api_name="chat",
+            concurrency_limit=concurrency_limit,
         )
 
-    ui.launch(inbrowser=True, show_error=True)
+    return ui.queue(default_concurrency_limit=concurrency_limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="The Insurellm chat app")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY_LIMIT, help="chats answered at once")
+    args = parser.parse_args()
+
+    from pro_implementation import answer
+
+    # The answer module's shared context opens the vectorstore here, and ingestion and retrieval reuse it
+    if answer.vectorstore().count() == 0:
+        print("Starting knowledge base ingestion...")
+        run_ingestion()
+        print("Ingestion finished.")
+    else:
+        print("Existing vector DB found. Skipping ingestion.")
+
+    print("Launching UI...")
+    build_ui(answer.stream_answer, args.concurrency).launch(inbrowser=True, show_error=True)
 
 
 if __name__ == "__main__":
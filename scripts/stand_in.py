@@ -0,0 +1,26 @@
+"""
+Switch every OpenAI client to the local OpenAI-compatible stand-in in benchmarks/fake_openai.py, for load and
+latency tests without live keys. Start it with `python -m benchmarks.fake_openai`, then set FAKE_OPENAI_URL to
+the URL it prints, in the environment or in .env.
+"""
+import os
+
+
+def use_stand_in():
+    """
+    The stand-in's base URL if FAKE_OPENAI_URL is set, else None. The OpenAI environment variables are pointed
+    at it too, so clients created without arguments (OpenAI(), litellm, LangChain, the agents SDK) use it.
+    Call after load_dotenv, which would otherwise put the real key back.
+    """
+    url = os.getenv("FAKE_OPENAI_URL")
+    if url:
+        os.environ.update(OPENAI_API_KEY="fake", OPENAI_BASE_URL=url, OPENAI_API_BASE=url)
+    return url
+
+
+def client_args(api_key=None, base_url=None):
+    """Keyword arguments for an OpenAI client: the ones given, or the stand-in's when it is switched on"""
+    url = use_stand_in()
+    if url:
+        return {"api_key": "fake", "base_url": url}
+    return {"api_key": api_key, "base_url": base_url}
@@ -3,6 +3,7 @@ import sys
 import time
 from dotenv import load_dotenv
 from openai import OpenAI
+from stand_in import client_args
 
 MODEL_GPT = "gpt-4o-mini"
 MODEL_LLAMA = "llama3.2"
@@ -100,13 +101,13 @@ def main() -> int:
     code_snippet = "yield from {book.get('author') for book in books if book.get('author')}"
 
     # OpenAI
-    openai_client = OpenAI(api_key=api_key)
+    openai_client = OpenAI(**client_args(api_key))
     run_explain_and_stream(openai_client, MODEL_GPT, code_snippet)
 
     print("\n----------------------\n----------------------\n")
 
     # Ollama (Llama 3.2)
-    ollama_client = OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+    ollama_client = OpenAI(**client_args("ollama", OLLAMA_BASE_URL))
     run_explain_and_stream(ollama_client, MODEL_LLAMA, code_snippet)
 
     return 0
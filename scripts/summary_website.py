@@ -2,6 +2,7 @@ import os
 import sys
 from dotenv import load_dotenv
 from openai import OpenAI
+from stand_in import client_args
 from bs4 import BeautifulSoup
 import requests
 
@@ -98,7 +99,7 @@ def main(argv: list[str] | None = None) -> int:
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0 Safari/537.36"
     }
 
-    client = OpenAI(api_key=api_key)
+    client = OpenAI(**client_args(api_key))
 
     display_summary(client, url, request_headers=request_headers)
     return 0
@@ -0,0 +1,30 @@
+import hashlib
+import importlib.util
+import os
+from pathlib import Path
+import pytest
+
+# The tests never call the API, but the scripts create their clients on import
+os.environ.setdefault("OPENAI_API_KEY", "test")
+# Without it, importing litellm downloads the model cost map
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+# litellm ships the tiktoken encodings, under the names tiktoken caches them by, so token counts need no download
+if "TIKTOKEN_CACHE_DIR" not in os.environ and (spec := importlib.util.find_spec("litellm")):
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(Path(spec.origin).parent / "litellm_core_utils" / "tokenizers")
+
+# Token counts use o200k_base for the chat models and cl100k_base for the embedding batches
+ENCODINGS = ["o200k_base", "cl100k_base"]
+
+
+def encoding_cached(name):
+    url = f"https://openaipublic.blob.core.windows.net/encodings/{name}.tiktoken"
+    cache = os.getenv("TIKTOKEN_CACHE_DIR")
+    return bool(cache) and (Path(cache) / hashlib.sha1(url.encode()).hexdigest()).exists()
+
+
+@pytest.fixture
+def tiktoken_encodings():
+    """Skip a test that counts tokens when tiktoken would have to download the encodings"""
+    missing = [name for name in ENCODINGS if not encoding_cached(name)]
+    if missing:
+        pytest.skip(f"tiktoken encodings not cached: {', '.join(missing)}")
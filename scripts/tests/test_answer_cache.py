@@ -0,0 +1,29 @@
+import sys
+from pydantic import BaseModel
+from pro_implementation.answer_cache import SemanticAnswerCache
+
+
+class Chunk(BaseModel):
+    page_content: str
+    metadata: dict
+    embedding: list[float] | None = None
+
+
+def test_paraphrase_hits_only_with_the_same_history_and_version():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store([1.0, 0.0], [], "v1", "answer", [])
+    assert cache.lookup([0.99, 0.05], [], "v1") == ("answer", [])
+    assert cache.lookup([0.99, 0.05], [{"role": "user", "content": "hi"}], "v1") is None
+    assert cache.lookup([0.99, 0.05], [], "v2") is None
+    assert cache.lookup([0.0, 1.0], [], "v1") is None
+
+
+def test_chunk_embeddings_are_not_cached():
+    cache = SemanticAnswerCache()
+    chunk = Chunk(page_content="text", metadata={"source": "a.md"}, embedding=[0.5] * 3072)
+    cache.store([1.0, 0.0], [], "v1", "answer", [chunk])
+    _, chunks = cache.lookup([1.0, 0.0], [], "v1")
+    assert chunks[0].embedding is None
+    assert chunks[0].page_content == "text"
+    assert chunk.embedding is not None
+    assert cache.bytes < sys.getsizeof(chunk.embedding)
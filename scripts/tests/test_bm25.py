@@ -0,0 +1,59 @@
+import numpy as np
+from bm25 import BM25Index, best
+
+IDS = ["employees/alex.md#0", "employees/sam.md#0", "products/carllm.md#0", "products/homellm.md#0"]
+TEXTS = [
+    "Alex Chen is a senior engineer, hired in 2020",
+    "Sam Lee leads the sales team in Austin",
+    "Carllm is auto insurance pricing for carriers, with three pricing tiers",
+    "Homellm is home insurance for carriers",
+]
+
+
+def test_best_skips_zero_scores():
+    scores = np.array([0.0, 2.0, 0.0, 3.0, 1.0], dtype=np.float32)
+    assert best(scores, 2).tolist() == [3, 1]
+    assert best(scores, 10).tolist() == [3, 1, 4]
+    assert best(np.zeros(3), 2).tolist() == []
+
+
+def test_postings_are_csr():
+    index = BM25Index.build(IDS, TEXTS)
+    t = index.vocabulary["carriers"]
+    chunks = index.postings[index.offsets[t] : index.offsets[t + 1]]
+    assert sorted(chunks.tolist()) == [2, 3]
+    t = index.vocabulary["pricing"]
+    assert index.frequencies[index.offsets[t] : index.offsets[t + 1]].tolist() == [2]
+    assert index.offsets[-1] == len(index.postings) == len(index.frequencies)
+
+
+def test_round_trip(tmp_path):
+    index = BM25Index.build(IDS, TEXTS)
+    index.save(tmp_path / "bm25.npz")
+    loaded = BM25Index.load(tmp_path / "bm25.npz")
+    assert len(loaded) == len(index)
+    for name in ["ids", "terms", "offsets", "postings", "frequencies", "lengths"]:
+        assert np.array_equal(getattr(loaded, name), getattr(index, name))
+    for query in ["carriers insurance", "Who is Alex Chen?", "sales in Austin", "nothing matches"]:
+        assert loaded.search(query, 3) == index.search(query, 3)
+
+
+def test_search_ranks_exact_matches_first():
+    ids, scores = BM25Index.build(IDS, TEXTS).search("Carllm pricing", 4)
+    assert ids == ["products/carllm.md#0"]
+    assert scores[0] > 0
+    assert BM25Index.build(IDS, TEXTS).search("nothing matches", 4) == ([], [])
+
+
+def test_prefixes_limit_the_search():
+    index = BM25Index.build(IDS, TEXTS)
+    assert index.search("home insurance in Austin", 4, prefixes=("employees/",))[0] == ["employees/sam.md#0"]
+    ids, _ = index.search("insurance carriers", 4, prefixes=("employees/", "products/home"))
+    assert ids == ["products/homellm.md#0"]
+
+
+def test_unrouted_k_joins_the_best_of_the_whole_index():
+    index = BM25Index.build(IDS, TEXTS)
+    ids, scores = index.search("home insurance in Austin", 4, prefixes=("employees/",), unrouted_k=1)
+    assert sorted(ids) == ["employees/sam.md#0", "products/homellm.md#0"]
+    assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pro_implementation.chunk_cache import ChunkCache
+
+
+def test_keyed_on_text_model_and_prompt(tmp_path):
+    cache = ChunkCache(tmp_path / "chunks.db")
+    cache.put("text", "model", "prompt", '{"chunks": []}')
+    assert cache.get("text", "model", "prompt") == '{"chunks": []}'
+    assert cache.get("other text", "model", "prompt") is None
+    assert cache.get("text", "other model", "prompt") is None
+    assert cache.get("text", "model", "edited prompt") is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_survives_reopening(tmp_path):
+    ChunkCache(tmp_path / "chunks.db").put("text", "model", "prompt", "[]")
+    assert ChunkCache(tmp_path / "chunks.db").get("text", "model", "prompt") == "[]"
+
+
+def test_evicts_least_recently_used_beyond_max_entries(tmp_path):
+    cache = ChunkCache(tmp_path / "chunks.db", max_entries=2)
+    for text in ["a", "b", "c"]:
+        cache.put(text, "model", "prompt", text)
+        time.sleep(0.01)
+    cache.get("a", "model", "prompt")
+    assert cache.evict() == 1
+    assert len(cache) == 2
+    assert cache.get("b", "model", "prompt") is None
+    assert cache.get("a", "model", "prompt") == "a"
+
+
+def test_evicts_expired_entries(tmp_path):
+    cache = ChunkCache(tmp_path / "chunks.db", max_age_days=0)
+    cache.put("a", "model", "prompt", "a")
+    time.sleep(0.01)
+    assert cache.evict() == 1
+    assert len(cache) == 0
+
+
+def test_entries_in_use_do_not_expire(tmp_path):
+    cache = ChunkCache(tmp_path / "chunks.db", max_age_days=1)
+    cache.put("old", "model", "prompt", "old")
+    cache.put("used", "model", "prompt", "used")
+    long_ago = time.time() - 2 * 24 * 60 * 60
+    with cache.conn:
+        cache.conn.execute("UPDATE chunks SET created = ?, last_used = ?", (long_ago, long_ago))
+    cache.get("used", "model", "prompt")
+    assert cache.evict() == 1
+    assert cache.get("used", "model", "prompt") == "used"
+
+
+def test_shared_by_threads_on_one_connection(tmp_path):
+    cache = ChunkCache(tmp_path / "chunks.db")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: cache.put(str(i), "model", "prompt", str(i)), range(100)))
+        found = list(pool.map(lambda i: cache.get(str(i), "model", "prompt"), range(100)))
+    assert found == [str(i) for i in range(100)]
+    assert cache.hits == 100
+    cache.close()
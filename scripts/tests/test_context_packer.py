@@ -0,0 +1,73 @@
+import pytest
+from pro_implementation.answer import Result
+from pro_implementation.context_packer import (
+    HistorySummaries,
+    count_message_tokens,
+    count_tokens,
+    overlap,
+    pack_chunks,
+    strip_overlap,
+)
+
+MODEL = "gpt-4.1-nano"
+
+pytestmark = pytest.mark.usefixtures("tiktoken_encodings")
+
+
+def chunk(source, body, header="Headline\n\nSummary"):
+    return Result(page_content=f"{header}\n\n{body}", metadata={"source": source})
+
+
+def words(start, end):
+    return " ".join(f"w{i}" for i in range(start, end))
+
+
+def test_overlap_needs_enough_repeated_words():
+    assert overlap(words(0, 20).split(), words(10, 30).split()) == 10
+    assert overlap(words(0, 20).split(), words(15, 30).split()) == 0
+
+
+def test_strip_overlap_within_a_source_only():
+    chunks = [chunk("a.md", words(0, 20)), chunk("a.md", words(10, 30)), chunk("b.md", words(10, 30))]
+    stripped = strip_overlap(chunks)
+    assert stripped[1].page_content == f"Headline\n\nSummary\n\n{words(20, 30)}"
+    assert stripped[2].page_content == chunks[2].page_content
+
+
+def test_strip_overlap_drops_chunks_with_nothing_new():
+    chunks = [chunk("a.md", words(0, 30)), chunk("a.md", words(20, 30))]
+    assert strip_overlap(chunks) == chunks[:1]
+
+
+def test_pack_chunks_keeps_rank_order_within_budget():
+    chunks = [chunk("a.md", words(0, 100)), chunk("b.md", words(0, 400)), chunk("c.md", words(0, 50))]
+    budget = count_tokens(chunks[0].page_content, MODEL) + count_tokens(chunks[2].page_content, MODEL)
+    assert pack_chunks(chunks, budget, MODEL) == [chunks[0], chunks[2]]
+
+
+def test_history_within_budget_is_kept_whole():
+    history = [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}]
+    assert HistorySummaries(1000, MODEL).split(history) == ([], history)
+
+
+def test_long_history_keeps_recent_turns_verbatim():
+    history = [{"role": "user", "content": words(0, 50)} for _ in range(10)]
+    older, recent = HistorySummaries(count_message_tokens(history, MODEL) - 1, MODEL, recent_turns=4).split(history)
+    assert (older, recent) == (history[:6], history[6:])
+
+
+def test_recent_turns_shrink_to_fit_the_budget():
+    history = [{"role": "user", "content": words(0, 50)} for _ in range(6)]
+    turn = count_message_tokens(history[:1], MODEL)
+    assert HistorySummaries(2 * turn, MODEL, recent_turns=4).split(history) == (history[:4], history[4:])
+    assert HistorySummaries(turn - 1, MODEL, recent_turns=4).split(history) == (history, [])
+    assert HistorySummaries(5 * turn, MODEL, recent_turns=10).split(history) == (history[:1], history[1:])
+
+
+def test_summaries_resume_from_the_longest_summarized_prefix():
+    history = [{"role": "user", "content": str(i)} for i in range(6)]
+    summaries = HistorySummaries(10, MODEL)
+    summaries.put(history[:2], "first two")
+    summaries.put(history[:4], "first four")
+    assert summaries.previous(history) == ("first four", history[4:])
+    assert summaries.previous(history[:2]) == (None, history[:2])
@@ -0,0 +1,33 @@
+from doc_loader import DocumentLoader, read_text
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(text.encode("utf-8"))
+
+
+def test_read_text_normalizes_line_endings(tmp_path):
+    write(tmp_path / "a.md", "one\r\ntwo\rthree\n")
+    assert read_text(tmp_path / "a.md") == ("one\ntwo\nthree\n", 15)
+
+
+def test_read_text_maps_large_files(tmp_path, monkeypatch):
+    monkeypatch.setattr("doc_loader.MMAP_THRESHOLD", 4)
+    write(tmp_path / "a.md", "héllo")
+    assert read_text(tmp_path / "a.md") == ("héllo", 6)
+
+
+def test_batches_in_walk_order_with_doc_types(tmp_path):
+    paths = [f"company/{i:02d}.md" for i in range(5)] + [f"products/sub/{i:02d}.md" for i in range(30)]
+    for path in paths:
+        write(tmp_path / path, path)
+    write(tmp_path / "products" / "notes.txt", "skipped")
+    write(tmp_path / "top-level.md", "skipped")
+    loader = DocumentLoader(tmp_path, threads=3, batch_size=8)
+    batches = list(loader.batches())
+    assert [len(batch) for batch in batches] == [8, 8, 8, 8, 3]
+    documents = [document for batch in batches for document in batch]
+    assert [document["text"] for document in documents] == paths
+    assert {document["type"] for document in documents[:5]} == {"company"}
+    assert documents[-1]["source"] == (tmp_path / paths[-1]).as_posix()
+    assert loader.files == 35
@@ -0,0 +1,49 @@
+from doc_router import DocTypeRouter
+
+SOURCES = [
+    "company/about.md",
+    "company/careers.md",
+    *[f"employees/{name}.md" for name in ["Alex Chen", "Sam Lee", "Priya Patel", "Jordan Blake", "Maria Gomez"]],
+    *[f"products/{name}.md" for name in ["Carllm", "Homellm", "Lifellm", "Healthllm", "Bizllm"]],
+    *[
+        f"contracts/Contract with {client} for {product}.md"
+        for client, product in [
+            ("Roadway Insurance", "Carllm"),
+            ("Pinnacle Insurance", "Homellm"),
+            ("Evergreen Life", "Lifellm"),
+            ("WellCare Insurance", "Healthllm"),
+            ("Summit Commercial", "Bizllm"),
+        ]
+    ],
+]
+
+
+def router():
+    return DocTypeRouter.from_sources(SOURCES)
+
+
+def test_routes_on_keywords_and_title_words():
+    assert router().route("What is the salary of Priya Patel?") == ["employees"]
+    assert router().route("When was the Roadway agreement signed?") == ["contracts"]
+    assert router().route("What does Carllm cost?") == ["contracts", "products"]
+
+
+def test_common_title_words_do_not_route():
+    # "contract", "with", "for" and "insurance" appear in too many contract titles to say anything
+    assert router().route("Insurance for a contract") == ["contracts"]
+    assert router().route("Tell me about insurance") is None
+
+
+def test_role_words_do_not_route():
+    assert router().route("Who leads the team for the Carllm product?") == ["contracts", "products"]
+    assert router().route("Which staff were hired in 2020?") == ["employees"]
+
+
+def test_unrouted_when_nothing_or_everything_matches():
+    assert router().route("Hello there") is None
+    assert router().route("Company employees, product pricing and client contracts") is None
+
+
+def test_small_doc_types_route_on_keywords_only():
+    assert router().route("What are the careers options?") == ["company"]
+    assert router().route("Tell me about the about page") is None
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from embedding_cache import EmbeddingCache, open_cache
+
+
+def test_key_covers_model_dimensions_and_text():
+    key = EmbeddingCache.key("model", None, "text")
+    assert key == EmbeddingCache.key("model", None, "text")
+    assert key != EmbeddingCache.key("other", None, "text")
+    assert key != EmbeddingCache.key("model", 256, "text")
+    assert key != EmbeddingCache.key("model", None, "text ")
+
+
+def test_only_fetches_misses(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db")
+    fetched = []
+
+    def fetch(texts):
+        fetched.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+    assert cache.embed("m", None, ["a", "bb"], fetch) == [[1.0], [2.0]]
+    assert cache.embed("m", None, ["bb", "ccc"], fetch) == [[2.0], [3.0]]
+    assert fetched == ["a", "bb", "ccc"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_evicts_least_recently_used_beyond_max_bytes(tmp_path):
+    # Each one-float vector is 4 bytes
+    cache = EmbeddingCache(tmp_path / "embeddings.db", max_bytes=8)
+    for text in ["a", "b", "c"]:
+        cache.put_many("m", None, [text], [[1.0]])
+        time.sleep(0.01)
+    cache.get_many("m", None, ["a"])
+    assert cache.evict() == 1
+    assert cache.get_many("m", None, ["a", "b", "c"]) == [[1.0], None, [1.0]]
+
+
+def test_off_for_the_stand_in(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_OPENAI_URL", "http://127.0.0.1:1/v1")
+    assert open_cache(tmp_path / "embeddings.db") is None
+    monkeypatch.delenv("FAKE_OPENAI_URL")
+    assert isinstance(open_cache(tmp_path / "embeddings.db"), EmbeddingCache)
+
+
+def test_shared_by_threads_on_one_connection(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db")
+    texts = [str(i) for i in range(100)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda text: cache.put_many("m", None, [text], [[float(text)]]), texts))
+        found = list(pool.map(lambda text: cache.get_many("m", None, [text])[0], texts))
+    assert found == [[float(text)] for text in texts]
+    assert len(cache) == 100
+    cache.close()
@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+from pro_implementation.answer import Result, fuse_chunks
+from implementation.answer import fuse
+
+
+def result(text, distance=None):
+    return Result(page_content=text, metadata={"source": f"{text}.md"}, distance=distance)
+
+
+def test_fusion_rewards_chunks_in_several_rankings():
+    dense = [result("a", 0.1), result("b", 0.2), result("c", 0.3)]
+    rewritten = [result("c", 0.25), result("d", 0.4)]
+    sparse = [result("c"), result("a")]
+    fused = fuse_chunks(dense, rewritten, sparse)
+    assert [chunk.page_content for chunk in fused] == ["c", "a", "b", "d"]
+
+
+def test_fusion_keeps_the_nearest_duplicate():
+    fused = fuse_chunks([result("a", 0.5)], [result("a", 0.2)], [result("a")])
+    assert len(fused) == 1
+    assert fused[0].distance == 0.2
+
+
+def test_fusion_breaks_ties_by_distance_and_limits():
+    fused = fuse_chunks([result("far", 0.9)], [result("near", 0.1)], [result("farther", 1.2)], limit=2)
+    assert [chunk.page_content for chunk in fused] == ["near", "far"]
+
+
+def test_langchain_fusion():
+    dense = [Document(page_content=text) for text in ["a", "b", "c"]]
+    sparse = [Document(page_content=text) for text in ["c", "d"]]
+    assert [doc.page_content for doc in fuse(dense, sparse)] == ["c", "a", "b", "d"]
+
+
+def test_bm25_only_chunks_lose_ties_to_dense_ones():
+    fused = fuse_chunks([result("sparse")], [result("far", 0.9)], [result("near", 0.1)])
+    assert [chunk.page_content for chunk in fused] == ["near", "far", "sparse"]
@@ -0,0 +1,23 @@
+from langchain_core.documents import Document
+from implementation.ingest import KNOWLEDGE_BASE, chunk_id, create_chunks
+
+TEXT = "Carllm is auto insurance for carriers. " * 40
+
+
+def chunks_of(text):
+    metadata = {"source": f"{KNOWLEDGE_BASE}/products/carllm.md", "doc_type": "products"}
+    return create_chunks([Document(page_content=text, metadata=metadata)])
+
+
+def test_chunk_ids_are_deterministic():
+    first = [chunk_id(chunk) for chunk in chunks_of(TEXT)]
+    assert first == [chunk_id(chunk) for chunk in chunks_of(TEXT)]
+    assert len(set(first)) == len(first) > 1
+    assert all(id.startswith("products/carllm.md:") for id in first)
+
+
+def test_edits_only_change_the_ids_of_edited_chunks():
+    before = [chunk_id(chunk) for chunk in chunks_of(TEXT)]
+    after = [chunk_id(chunk) for chunk in chunks_of(TEXT + "Now with roadside assistance.")]
+    assert after[0] == before[0]
+    assert after[-1] not in before
@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+from pro_implementation import ingest
+
+
+def document(key, text):
+    return {"type": key.split("/")[0], "source": (ingest.KNOWLEDGE_BASE_PATH / key).as_posix(), "text": text}
+
+
+def manifest_of(*documents, chunks=1):
+    return {"documents": {ingest.document_key(d): {"hash": ingest.document_hash(d), "chunks": chunks} for d in documents}}
+
+
+class Loader:
+    """Stands in for a DocumentLoader, yielding the given batches"""
+
+    def __init__(self, *batches):
+        self.given = batches
+
+    def batches(self):
+        return iter(self.given)
+
+
+def changed(manifest, *batches):
+    hashes = {}
+
+    async def collect():
+        return [document async for document in ingest.changed_documents(Loader(*batches), manifest, hashes)]
+
+    return [ingest.document_key(document) for document in asyncio.run(collect())], hashes
+
+
+def test_manifest_diffing():
+    kept = document("company/about.md", "About us")
+    manifest = manifest_of(kept, document("products/carllm.md", "Carllm"), document("contracts/removed.md", "Gone"))
+    edited = document("products/carllm.md", "Carllm, now with a new tier")
+    added = document("employees/new.md", "A new hire")
+    keys, hashes = changed(manifest, [kept, edited], [added])
+    assert keys == ["products/carllm.md", "employees/new.md"]
+    assert set(hashes) == {"company/about.md", "products/carllm.md", "employees/new.md"}
+    assert set(manifest["documents"]) - set(hashes) == {"contracts/removed.md"}
+
+
+def test_first_ingest_changes_everything():
+    documents = [document("company/about.md", "About us"), document("company/careers.md", "Careers")]
+    assert changed({"documents": {}}, documents)[0] == ["company/about.md", "company/careers.md"]
+
+
+def test_chunk_ids_are_deterministic():
+    about = document("company/about.md", "About us")
+    assert ingest.document_key(about) == "company/about.md"
+    assert ingest.document_hash(about) == ingest.document_hash(dict(about))
+    assert ingest.chunk_id("company/about.md", 3) == "company/about.md#3"
+
+
+def test_stale_chunk_ids_come_from_the_manifest():
+    class Collection:
+        def delete(self, ids):
+            self.deleted = ids
+
+    collection = Collection()
+    manifest = {"documents": {"company/about.md": {"hash": "", "chunks": 2}, "products/carllm.md": {"hash": "", "chunks": 1}}}
+    ingest.delete_document_chunks(collection, ["company/about.md", "products/carllm.md"], manifest)
+    assert collection.deleted == ["company/about.md#0", "company/about.md#1", "products/carllm.md#0"]
+
+
+def test_reingest_upserts_before_deleting_stale_chunks(monkeypatch):
+    class Collection:
+        def __init__(self):
+            self.calls = []
+
+        def upsert(self, ids, **kwargs):
+            self.calls.append(("upsert", ids))
+
+        def delete(self, ids):
+            self.calls.append(("delete", ids))
+
+    shrunk = document("company/about.md", "About us")
+    grown = document("products/carllm.md", "Carllm")
+    added = document("employees/new.md", "A new hire")
+    manifest = {"documents": {"company/about.md": {"hash": "", "chunks": 3}, "products/carllm.md": {"hash": "", "chunks": 1}}}
+
+    async def chunk_documents(documents, queue):
+        for d, count in [(shrunk, 1), (grown, 2), (added, 1)]:
+            await queue.put((d, [ingest.Result(page_content="text", metadata={}) for _ in range(count)]))
+
+    async def embed_stream(queue, collection, *args, **kwargs):
+        while (item := await queue.get()) is not None:
+            collection.upsert(ids=item[0])
+
+    monkeypatch.setattr(ingest, "chunk_documents", chunk_documents)
+    monkeypatch.setattr(ingest, "embed_stream", embed_stream)
+    monkeypatch.setattr(ingest, "open_cache", lambda path: None)
+    monkeypatch.setattr(ingest, "rag_context", SimpleNamespace(embeddings_client=None))
+    collection = Collection()
+    counts = asyncio.run(ingest.ingest_documents(None, collection, manifest))
+    assert counts == {"company/about.md": 1, "products/carllm.md": 2, "employees/new.md": 1}
+    assert collection.calls == [
+        ("upsert", ["company/about.md#0"]),
+        ("upsert", ["products/carllm.md#0", "products/carllm.md#1"]),
+        ("upsert", ["employees/new.md#0"]),
+        ("delete", ["company/about.md#1", "company/about.md#2"]),
+    ]
+
+
+def test_prompt_hash_covers_chunk_size_and_schema(monkeypatch):
+    key = ingest.prompt_hash()
+    assert ingest.prompt_hash() == key
+    monkeypatch.setattr(ingest, "AVERAGE_CHUNK_SIZE", ingest.AVERAGE_CHUNK_SIZE * 2)
+    assert ingest.prompt_hash() != key
+    monkeypatch.undo()
+
+    class Chunks(ingest.BaseModel):
+        chunks: list[str]
+
+    monkeypatch.setattr(ingest, "Chunks", Chunks)
+    assert ingest.prompt_hash() != key
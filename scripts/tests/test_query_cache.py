@@ -0,0 +1,57 @@
+from pro_implementation.query_cache import QueryEmbeddingCache, normalize
+
+
+def test_normalize_ignores_case_and_whitespace():
+    assert normalize("  Who is   the CEO?\n") == normalize("who is the ceo?") == "who is the ceo?"
+
+
+def test_keyed_on_normalized_text_and_model():
+    cache = QueryEmbeddingCache()
+    cache.put("Who is the CEO?", "model-a", [1.0, 2.0])
+    assert cache.get("who is  the ceo?", "model-a") == [1.0, 2.0]
+    assert cache.get("Who is the CEO?", "model-b") is None
+    assert cache.get("Who is the CTO?", "model-a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", "m", [1.0])
+    cache.put("b", "m", [2.0])
+    cache.get("a", "m")
+    cache.put("c", "m", [3.0])
+    assert cache.get("b", "m") is None
+    assert cache.get("a", "m") == [1.0]
+
+
+def test_expires_entries():
+    cache = QueryEmbeddingCache(ttl=0)
+    cache.put("a", "m", [1.0])
+    assert cache.get("a", "m") is None
+
+
+def test_persists_across_instances(tmp_path):
+    writer = QueryEmbeddingCache(path=tmp_path / "queries.db")
+    writer.put("Hello", "m", [0.5, 0.25])
+    writer.close()
+    reader = QueryEmbeddingCache(path=tmp_path / "queries.db")
+    assert reader.get("hello", "m") == [0.5, 0.25]
+    reader.close()
+
+
+def test_closed_cache_keeps_serving_from_memory(tmp_path):
+    cache = QueryEmbeddingCache(path=tmp_path / "queries.db")
+    cache.put("hello", "m", [1.0])
+    cache.close()
+    cache.put("world", "m", [2.0])
+    assert cache.get("hello", "m") == [1.0]
+    assert cache.get("world", "m") == [2.0]
+    assert cache.get("other", "m") is None
+
+
+def test_uncounted_lookups_leave_the_hit_rate_alone():
+    cache = QueryEmbeddingCache()
+    cache.put("q", "m", [1.0])
+    assert cache.get("q", "m", count=False) == [1.0]
+    assert cache.get("other", "m", count=False) is None
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
@@ -0,0 +1,88 @@
+import asyncio
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+from pro_implementation.rate_limit import CircuitBreaker, CircuitOpenError, breakers, llm_retry, retry_after, stats
+
+
+def error(kind, status, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "http://test"))
+    return kind("failed", response=response, body=None)
+
+
+def rate_limited():
+    # Retry-After-Ms of 0 keeps the backoff out of the test's run time
+    return error(RateLimitError, 429, {"retry-after-ms": "0"})
+
+
+def test_retry_after_headers():
+    assert retry_after(error(RateLimitError, 429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(error(RateLimitError, 429, {"retry-after": "2"})) == 2.0
+    assert retry_after(error(RateLimitError, 429)) is None
+
+
+def test_retries_transient_errors_until_success():
+    outcomes = [rate_limited(), rate_limited(), "done"]
+
+    @llm_retry("test-retries")
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert call() == "done"
+    assert (stats["test-retries"].calls, stats["test-retries"].retries, stats["test-retries"].failures) == (3, 2, 0)
+
+
+def test_bad_requests_are_not_retried():
+    @llm_retry("test-bad-request")
+    def call():
+        raise error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        call()
+    assert stats["test-bad-request"].calls == 1
+    assert stats["test-bad-request"].failures == 0
+
+
+def test_async_calls_are_retried():
+    outcomes = [rate_limited(), "done"]
+
+    @llm_retry("test-async")
+    async def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(call()) == "done"
+    assert stats["test-async"].retries == 1
+
+
+def test_breaker_opens_after_calls_that_exhausted_their_retries():
+    @llm_retry("test-breaker", attempts=2)
+    def call():
+        raise rate_limited()
+
+    breakers["test-breaker"].failure_threshold = 2
+    for _ in range(2):
+        with pytest.raises(RateLimitError):
+            call()
+    with pytest.raises(CircuitOpenError):
+        call()
+    counters = stats["test-breaker"]
+    # Each call counts once against the breaker, however many attempts it made
+    assert (counters.calls, counters.failures, counters.rejected) == (4, 2, 1)
+
+
+def test_breaker_lets_one_trial_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0)
+    breaker.record(success=False)
+    assert breaker.opened is not None
+    assert breaker.allow()
+    breaker.record(success=True)
+    assert breaker.opened is None and breaker.failures == 0
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=60)
+    breaker.record(success=False)
+    assert not breaker.allow()
@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+from pro_implementation import rerankers
+from pro_implementation.rerankers import CosineReranker, LLMReranker, NoReranker, apply_order, make_rerank_messages
+
+
+def chunk(text, embedding=None):
+    return SimpleNamespace(page_content=text, embedding=embedding)
+
+
+def test_apply_order_ignores_bad_ids_and_keeps_the_rest():
+    chunks = ["a", "b", "c", "d"]
+    assert apply_order([3, 1], chunks) == ["c", "a", "b", "d"]
+    assert apply_order([2, 2, 9, 0, -1, 4], chunks) == ["b", "d", "a", "c"]
+    assert apply_order([], chunks) == chunks
+
+
+def test_rerank_prompt_numbers_the_chunks_from_one():
+    messages = make_rerank_messages("Who?", [chunk("first"), chunk("second")])
+    assert "# CHUNK ID: 1:\n\nfirst" in messages[1]["content"]
+    assert "# CHUNK ID: 2:\n\nsecond" in messages[1]["content"]
+
+
+def test_llm_reranker_applies_the_model_order(monkeypatch):
+    def completion(model, messages, response_format):
+        message = SimpleNamespace(content='{"order": [2, 3]}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(rerankers, "completion", completion)
+    chunks = [chunk("a"), chunk("b"), chunk("c")]
+    assert [c.page_content for c in LLMReranker("test-reranker").rerank("Who?", chunks)] == ["b", "c", "a"]
+
+
+def test_cosine_reranker_orders_by_similarity():
+    reranker = CosineReranker(lambda question: [1.0, 0.0])
+    chunks = [chunk("far", [0.0, 1.0]), chunk("near", [2.0, 0.1]), chunk("middle", [1.0, 1.0])]
+    assert [c.page_content for c in reranker.rerank("Who?", chunks)] == ["near", "middle", "far"]
+    assert reranker.rerank("Who?", []) == []
+
+
+def test_no_reranker_keeps_the_retrieval_order():
+    chunks = [chunk("a"), chunk("b")]
+    assert NoReranker().rerank("Who?", chunks) == chunks
+    assert asyncio.run(NoReranker().arerank("Who?", chunks)) == chunks
+
+
+def test_cosine_reranker_says_when_embeddings_are_missing(capsys):
+    reranker = CosineReranker(lambda question: [1.0, 0.0])
+    chunks = [chunk("far", [0.0, 1.0]), chunk("near")]
+    assert reranker.rerank("Who?", chunks) == chunks
+    assert "1 of 2 chunks have no embedding" in capsys.readouterr().out
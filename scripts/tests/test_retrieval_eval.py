@@ -0,0 +1,23 @@
+"""
+The offline retrieval suite as a regression check: both pipelines against the local stand-in, compared with
+benchmarks/baselines/offline.json. Latency depends on the machine, so only quality and token counts gate here.
+"""
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+SCRIPTS_PATH = Path(__file__).parent.parent
+
+pytestmark = pytest.mark.usefixtures("tiktoken_encodings")
+
+
+def test_offline_eval_matches_baseline():
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.retrieval_eval", "--offline", "--latency-tolerance", "1000"],
+        cwd=SCRIPTS_PATH,
+        capture_output=True,
+        text=True,
+        timeout=600,
+    )
+    assert completed.returncode == 0, completed.stdout[-4000:] + completed.stderr[-4000:]
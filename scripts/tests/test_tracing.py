@@ -0,0 +1,90 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import tracing
+from tracing import NO_SPAN, breakdown, configure, current, load_traces, propagate, span, traced
+
+
+@pytest.fixture(params=["traces.jsonl", "traces.db"])
+def trace_path(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_sink", tracing._unset)
+    path = tmp_path / request.param
+    configure(path)
+    yield path
+    configure(None)
+
+
+def test_tracing_is_off_without_a_sink(monkeypatch):
+    monkeypatch.setattr(tracing, "_sink", tracing._unset)
+    monkeypatch.delenv("RAG_TRACE", raising=False)
+    assert span("request") is NO_SPAN
+    assert current() is NO_SPAN
+    fn = lambda: None
+    assert propagate(fn) is fn
+
+
+def test_nested_spans_form_one_trace(trace_path):
+    with span("request", question="q") as root:
+        with span("retrieve") as child:
+            child.add("retries")
+            child.add("retries")
+        root.set(answer_tokens=5)
+    (spans,) = load_traces(trace_path)
+    by_name = {s["name"]: s for s in spans}
+    assert by_name["retrieve"]["parent_id"] == by_name["request"]["span_id"]
+    assert by_name["request"]["parent_id"] is None
+    assert by_name["retrieve"]["attributes"] == {"retries": 2}
+    assert by_name["request"]["attributes"] == {"question": "q", "answer_tokens": 5}
+
+
+def test_errors_are_recorded(trace_path):
+    with pytest.raises(ValueError):
+        with span("request"):
+            raise ValueError
+    assert load_traces(trace_path)[0][0]["attributes"] == {"error": "ValueError"}
+
+
+def test_traced_functions_and_thread_pools_join_the_current_span(trace_path):
+    @traced("embed")
+    def embed():
+        return current().name
+
+    @traced("answer")
+    async def answer():
+        with ThreadPoolExecutor() as pool:
+            return await asyncio.to_thread(embed), pool.submit(propagate(embed)).result()
+
+    with span("request"):
+        assert asyncio.run(answer()) == ("embed", "embed")
+    (spans,) = load_traces(trace_path)
+    names = {s["span_id"]: s["name"] for s in spans}
+    assert sorted((s["name"], names.get(s["parent_id"])) for s in spans) == [
+        ("answer", "request"),
+        ("embed", "answer"),
+        ("embed", "answer"),
+        ("request", None),
+    ]
+
+
+def test_breakdown_per_stage(trace_path):
+    for _ in range(3):
+        with span("request"):
+            with span("generate") as s:
+                s.add("prompt_tokens", 10)
+                s.add("completion_tokens", 2)
+    traces = load_traces(trace_path)
+    assert len(traces) == 3 and len(load_traces(trace_path, last=2)) == 2
+    rows = {row[0]: row for row in breakdown(traces)}
+    assert rows["request"][1] == rows["generate"][1] == 3
+    assert rows["request"][5] == pytest.approx(1.0)
+    assert rows["generate"][6] == 12
+
+
+def test_reconfiguring_closes_the_previous_sink(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_sink", tracing._unset)
+    configure(tmp_path / "traces.db")
+    previous = tracing.sink()
+    configure(None)
+    with pytest.raises(sqlite3.ProgrammingError):
+        previous.conn.execute("SELECT 1")
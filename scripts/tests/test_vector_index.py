@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from pro_implementation.vector_index import NumpyCollection, Storage, truncate
+
+
+def vectors(count, dimensions=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def filled(path, storage=None, count=500):
+    collection = NumpyCollection(path, storage)
+    ids = [f"doc{i}" for i in range(count)]
+    metadatas = [{"type": "even" if i % 2 == 0 else "odd"} for i in range(count)]
+    collection.upsert(ids, vectors(count).tolist(), [f"text {i}" for i in range(count)], metadatas)
+    collection.flush()
+    return collection
+
+
+def exact(queries, embeddings, k):
+    distances = np.square(queries[:, None, :] - embeddings[None, :, :]).sum(axis=2)
+    return np.argsort(distances, axis=1)[:, :k], np.sort(distances, axis=1)[:, :k]
+
+
+def test_search_matches_exact(tmp_path):
+    collection = filled(tmp_path)
+    queries = vectors(20, seed=1)
+    indices, distances = collection.search(queries, 10)
+    expected_indices, expected_distances = exact(queries, vectors(500), 10)
+    assert np.array_equal(indices, expected_indices)
+    assert np.allclose(distances, expected_distances, atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "storage, min_overlap",
+    [
+        (Storage(dtype="float16"), 0.95),
+        (Storage(dtype="int8"), 0.8),
+        (Storage(dtype="int8", rescore=4), 0.95),
+    ],
+)
+def test_quantized_search_is_close_to_exact(tmp_path, storage, min_overlap):
+    collection = filled(tmp_path, storage)
+    queries = vectors(20, seed=1)
+    indices, distances = collection.search(queries, 10)
+    expected, _ = exact(queries, vectors(500), 10)
+    overlap = np.mean([len(set(found) & set(want)) / 10 for found, want in zip(indices.tolist(), expected.tolist())])
+    assert overlap >= min_overlap
+    assert np.all(np.diff(distances, axis=1) >= 0)
+
+
+def test_rescored_distances_are_exact(tmp_path):
+    collection = filled(tmp_path, Storage(dtype="int8", rescore=4))
+    queries = vectors(5, seed=1)
+    indices, distances = collection.search(queries, 5)
+    expected = np.square(queries[:, None, :] - vectors(500)[indices]).sum(axis=2)
+    assert np.allclose(distances, expected, atol=1e-5)
+
+
+def test_where_filter_only_searches_matching_rows(tmp_path):
+    collection = filled(tmp_path, Storage(dtype="int8"))
+    results = collection.query(vectors(3, seed=1).tolist(), n_results=5, where={"type": "odd"})
+    assert all(metadata["type"] == "odd" for row in results["metadatas"] for metadata in row)
+    assert all(int(id[3:]) % 2 == 1 for row in results["ids"] for id in row)
+
+
+def test_truncation_renormalizes():
+    truncated = truncate(vectors(10), 16)
+    assert truncated.shape == (10, 16)
+    assert np.allclose(np.linalg.norm(truncated, axis=1), 1.0, atol=1e-5)
+
+
+def test_upsert_delete_flush_and_reload(tmp_path):
+    collection = filled(tmp_path, Storage(dtype="int8", rescore=2), count=50)
+    replacement = vectors(1, seed=2)
+    collection.upsert(["doc3"], replacement.tolist(), ["new text 3"], [{"type": "odd"}])
+    collection.delete(["doc0", "doc1", "missing"])
+    assert collection.count() == 48
+    collection.flush()
+
+    reopened = NumpyCollection(tmp_path)
+    assert reopened.storage == Storage(dtype="int8", rescore=2)
+    assert reopened.count() == 48
+    assert reopened.get(["doc0", "doc3"])["documents"] == ["new text 3"]
+    assert reopened.get(["doc4"])["metadatas"] == [{"type": "even"}]
+    results = reopened.query(replacement.tolist(), n_results=1, include=("documents", "distances"))
+    assert results["ids"] == [["doc3"]]
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_batched_writes_are_visible_before_flush(tmp_path):
+    collection = NumpyCollection(tmp_path)
+    embeddings = vectors(30)
+    for start in range(0, 30, 10):
+        ids = [f"doc{i}" for i in range(start, start + 10)]
+        collection.upsert(ids, embeddings[start : start + 10].tolist(), ids, [{"type": "any"}] * 10)
+    collection.delete(["doc5"])
+    assert collection.count() == 29
+    results = collection.query(embeddings[[5, 25]].tolist(), n_results=1)
+    assert results["ids"][0] != ["doc5"] and results["ids"][1] == ["doc25"]
+
+
+def test_reader_sees_another_writers_flush(tmp_path):
+    filled(tmp_path, count=10)
+    reader = NumpyCollection(tmp_path)
+    writer = NumpyCollection(tmp_path)
+    writer.delete(["doc0"])
+    writer.flush()
+    assert reader.get(["doc0", "doc1"])["ids"] == ["doc1"]
@@ -0,0 +1,304 @@
+"""
+Lightweight tracing for the RAG pipelines: each request is a trace of nested spans, each with its duration and
+attributes such as token usage and retry counts, written as it ends to a local JSONL file or SQLite database.
+Tracing is off unless RAG_TRACE names the sink, in the environment or in .env, e.g. RAG_TRACE=traces.jsonl or
+RAG_TRACE=traces.db; while it is off, span() hands back a shared no-op and a traced function is called directly.
+
+Aggregate the traces into a per-stage latency breakdown, from the scripts folder:
+  python tracing.py traces.jsonl
+  python tracing.py traces.db --last 100 --slowest
+"""
+import argparse
+import contextlib
+import contextvars
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from functools import partial, wraps
+from pathlib import Path
+
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+_current = contextvars.ContextVar("span", default=None)
+_unset = object()
+_sink = _unset
+
+
+class JSONLSink:
+    """One JSON object per span, appended to the file"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record) + "\n"
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def close(self):
+        """Nothing to do, each write opens and closes the file"""
+
+
+class SQLiteSink:
+    """One row per span, so traces can also be queried with SQL; one connection is shared by every thread that writes"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spans (
+                    trace_id TEXT NOT NULL,
+                    span_id TEXT PRIMARY KEY,
+                    parent_id TEXT,
+                    name TEXT NOT NULL,
+                    start REAL NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    attributes TEXT NOT NULL
+                )
+                """
+            )
+
+    def write(self, record):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record["trace_id"],
+                    record["span_id"],
+                    record["parent_id"],
+                    record["name"],
+                    record["start"],
+                    record["duration_ms"],
+                    json.dumps(record["attributes"]),
+                ),
+            )
+
+    def read(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT trace_id, span_id, parent_id, name, start, duration_ms, attributes FROM spans").fetchall()
+        keys = ["trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "attributes"]
+        return [{**dict(zip(keys, row)), "attributes": json.loads(row[-1])} for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_sink(path):
+    return SQLiteSink(path) if Path(path).suffix in SQLITE_SUFFIXES else JSONLSink(path)
+
+
+def configure(path):
+    """Write spans to path, SQLite for a .db or .sqlite file and JSONL otherwise; None turns tracing off"""
+    global _sink
+    if _sink not in (None, _unset):
+        _sink.close()
+    _sink = open_sink(path) if path else None
+
+
+def sink():
+    """The configured sink, taken from RAG_TRACE on first use; None while tracing is off"""
+    if _sink is _unset:
+        configure(os.getenv("RAG_TRACE"))
+    return _sink
+
+
+class Span:
+    def __init__(self, sink, name, attributes):
+        self.sink = sink
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name, amount=1):
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self.trace_id = self.parent.trace_id if self.parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start = time.time()
+        self.started = time.perf_counter()
+        _current.set(self)
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        duration = time.perf_counter() - self.started
+        if kind is not None:
+            self.attributes["error"] = kind.__name__
+        # Set rather than reset: an async generator may resume in another context than it started in
+        _current.set(self.parent)
+        self.sink.write(
+            {
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent.span_id if self.parent else None,
+                "name": self.name,
+                "start": self.start,
+                "duration_ms": duration * 1000,
+                "attributes": self.attributes,
+            }
+        )
+
+
+class NoSpan:
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, amount=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NO_SPAN = NoSpan()
+
+
+def span(name, **attributes):
+    """A span named `name`, nested in the current one: use as `with span("rerank") as s: ... s.set(k=v)`"""
+    target = sink()
+    return NO_SPAN if target is None else Span(target, name, attributes)
+
+
+def traced(name):
+    """Decorate a sync or async function to run in a span named `name`"""
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if sink() is None:
+                    return await fn(*args, **kwargs)
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+        else:
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if sink() is None:
+                    return fn(*args, **kwargs)
+                with span(name):
+                    return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current():
+    """The innermost open span, or the no-op when there is none or tracing is off"""
+    return _current.get() or NO_SPAN
+
+
+def record_usage(response):
+    """Add a completion or embeddings response's token usage to the current span"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        current().add("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+        current().add("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+def propagate(fn):
+    """fn bound to the current span, for work handed to a thread pool, which does not carry it over by itself"""
+    if sink() is None:
+        return fn
+    return partial(contextvars.copy_context().run, fn)
+
+
+def load_traces(path, last=None):
+    """The spans grouped by trace, oldest trace first, keeping only the last `last` traces"""
+    traces = defaultdict(list)
+    with contextlib.closing(open_sink(path)) as traces_sink:
+        records = traces_sink.read()
+    for record in records:
+        traces[record["trace_id"]].append(record)
+    ordered = sorted(traces.values(), key=lambda spans: min(s["start"] for s in spans))
+    return ordered[-last:] if last else ordered
+
+
+def breakdown(traces):
+    """Per span name: calls, p50/p95/p99 ms, share of the total root time, mean tokens per call and retries"""
+    import numpy as np
+
+    durations = defaultdict(list)
+    tokens = defaultdict(int)
+    retries = defaultdict(int)
+    root_total = 0.0
+    for spans in traces:
+        for s in spans:
+            durations[s["name"]].append(s["duration_ms"])
+            tokens[s["name"]] += s["attributes"].get("prompt_tokens", 0) + s["attributes"].get("completion_tokens", 0)
+            retries[s["name"]] += s["attributes"].get("retries", 0)
+            if s["parent_id"] is None:
+                root_total += s["duration_ms"]
+    rows = []
+    for name, values in durations.items():
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        share = sum(values) / root_total if root_total else 0.0
+        rows.append((name, len(values), p50, p95, p99, share, tokens[name] / len(values), retries[name]))
+    return sorted(rows, key=lambda row: -row[5])
+
+
+def root_ms(spans):
+    return max((s["duration_ms"] for s in spans if s["parent_id"] is None), default=0.0)
+
+
+def print_tree(spans):
+    children = defaultdict(list)
+    for s in sorted(spans, key=lambda s: s["start"]):
+        children[s["parent_id"]].append(s)
+
+    def show(s, depth):
+        attributes = " ".join(f"{k}={v}" for k, v in s["attributes"].items())
+        print(f"  {'  ' * depth}{s['name']:<{32 - 2 * depth}} {s['duration_ms']:>9.1f} ms  {attributes}")
+        for child in children[s["span_id"]]:
+            show(child, depth + 1)
+
+    for root in children[None]:
+        show(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, help="a JSONL file or SQLite database written with RAG_TRACE")
+    parser.add_argument("--last", type=int, help="only the most recent traces")
+    parser.add_argument("--slowest", action="store_true", help="also print the slowest trace as a tree")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path, args.last)
+    if not traces:
+        print(f"No traces in {args.path}")
+        return
+    print(f"\n{len(traces)} traces from {args.path}\n")
+    print(f"{'span':<24} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'share':>6} {'tokens':>7} {'retries':>7}")
+    for name, calls, p50, p95, p99, share, tokens, retries in breakdown(traces):
+        print(f"{name:<24} {calls:>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {share:>6.0%} {tokens:>7.0f} {retries:>7}")
+    if args.slowest:
+        slowest = max(traces, key=root_ms)
+        print(f"\nSlowest trace {slowest[0]['trace_id']}:")
+        print_tree(slowest)
+
+
+if __name__ == "__main__":
+    main()